@@ -0,0 +1,108 @@
+"""Throughput of the pooled AsyncOpenAI client against a local mock provider.
+
+Starts an OpenAI-compatible /chat/completions server on localhost that answers
+after a fixed latency, then fires concurrent requests through
+  - the old setup: a sync openai.OpenAI client called via asyncio.to_thread
+  - the bot's setup: openai.AsyncOpenAI with APIUtils' httpx pool limits
+
+Usage: python bench/llm_pool_bench.py [--requests 500] [--concurrency 100] [--latency 0.2]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cogs.api_utils import APIUtils
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "bench",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}).encode()
+
+class MockProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+    latency = 0.2
+    connections = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        MockProvider.connections.add(self.client_address)
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen() backlog, so a burst of new connections isn't refused
+
+def start_server(latency):
+    MockProvider.latency = latency
+    server = MockServer(("127.0.0.1", 0), MockProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+async def run_sync_client(base_url, requests, concurrency):
+    client = openai.OpenAI(base_url=base_url, api_key="bench", max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await asyncio.to_thread(client.chat.completions.create, model="bench", messages=[{"role": "user", "content": "ping"}])
+
+    try:
+        await asyncio.gather(*(one() for _ in range(requests)))
+    finally:
+        client.close()
+
+async def run_async_client(base_url, requests, concurrency):
+    client = openai.AsyncOpenAI(
+        base_url=base_url, api_key="bench", http_client=APIUtils(bot=None)._build_http_client(), max_retries=0
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.chat.completions.create(model="bench", messages=[{"role": "user", "content": "ping"}])
+
+    try:
+        await asyncio.gather(*(one() for _ in range(requests)))
+    finally:
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock provider response time in seconds")
+    args = parser.parse_args()
+    server, base_url = start_server(args.latency)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.latency * 1000:.0f}ms provider latency")
+    ideal = args.requests / args.concurrency * args.latency
+    for name, runner in (("sync client + to_thread", run_sync_client), ("AsyncOpenAI pool", run_async_client)):
+        MockProvider.connections = set()
+        started = time.perf_counter()
+        asyncio.run(runner(base_url, args.requests, args.concurrency))
+        elapsed = time.perf_counter() - started
+        print(f"{name:>24}: {args.requests / elapsed:7.1f} req/s, {elapsed:.2f}s (ideal {ideal:.2f}s),"
+              f" {len(MockProvider.connections)} connection(s)")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
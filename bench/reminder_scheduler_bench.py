@@ -0,0 +1,116 @@
+"""Measure ReminderScheduler at 100k-1M pending reminders.
+
+Reports build time, pop_due latency on idle and busy ticks, cancel cost, and how
+often the reminder loop wakes up while nothing is due, next to the 1s polling
+scan the scheduler replaced.
+
+Usage: python bench/reminder_scheduler_bench.py [--sizes 100000,300000,1000000] [--idle-seconds 5]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reminder_scheduler import ReminderScheduler
+
+# Pending reminders are spread over this many seconds from now
+HORIZON = 30 * 24 * 3600
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def build(size, now):
+    scheduler = ReminderScheduler()
+    dues = {}
+    started = time.perf_counter()
+    for key in range(size):
+        due = now + random.uniform(60, HORIZON)
+        dues[key] = due
+        scheduler.schedule(key, due)
+    return scheduler, dues, time.perf_counter() - started
+
+def bench_pop_due(scheduler, now, ticks=2000):
+    """Latency of one loop tick when nothing is due and when the next ~size/HORIZON reminders are"""
+    idle = []
+    for _ in range(ticks):
+        started = time.perf_counter()
+        scheduler.pop_due(now)
+        idle.append(time.perf_counter() - started)
+    busy, fired = [], 0
+    tick = now
+    for _ in range(ticks):
+        # Jump straight to the next due time, as the loop does after waking
+        tick = scheduler.next_due()
+        started = time.perf_counter()
+        fired += len(scheduler.pop_due(tick))
+        busy.append(time.perf_counter() - started)
+    return idle, busy, fired
+
+def bench_cancel(scheduler, dues, count=10000):
+    keys = random.sample(list(dues), count)
+    started = time.perf_counter()
+    for key in keys:
+        scheduler.cancel(key)
+    return (time.perf_counter() - started) / count
+
+def bench_legacy_scan(dues, now, ticks=5):
+    """The old loop scanned every reminder once a second"""
+    samples = []
+    for _ in range(ticks):
+        started = time.perf_counter()
+        [due for due in dues.values() if due <= now]
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+async def count_idle_wakeups(scheduler, seconds):
+    """Run the reminder loop's wait/pop cycle for ``seconds`` with nothing due"""
+    wakeups = 0
+    cpu_started = time.process_time()
+
+    async def loop():
+        nonlocal wakeups
+        while True:
+            await scheduler.wait()
+            wakeups += 1
+            scheduler.pop_due(time.time())
+
+    task = asyncio.create_task(loop())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return wakeups, time.process_time() - cpu_started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,300000,1000000", help="comma separated reminder counts")
+    parser.add_argument("--idle-seconds", type=float, default=5.0, help="how long to watch the idle loop")
+    args = parser.parse_args()
+    random.seed(0)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        now = time.time()
+        scheduler, dues, build_time = build(size, now)
+        legacy_tick = bench_legacy_scan(dues, now)
+        idle, busy, fired = bench_pop_due(scheduler, now)
+        cancel_time = bench_cancel(scheduler, dues)
+        wakeups, cpu = asyncio.run(count_idle_wakeups(scheduler, args.idle_seconds))
+
+        print(f"{size:,} reminders")
+        print(f"  build:              {build_time:.2f}s ({build_time / size * 1e6:.2f} us/schedule)")
+        print(f"  pop_due idle tick:  p50 {percentile(idle, 0.5) * 1e6:.2f} us, p99 {percentile(idle, 0.99) * 1e6:.2f} us")
+        print(f"  pop_due busy tick:  p50 {percentile(busy, 0.5) * 1e6:.2f} us, p99 {percentile(busy, 0.99) * 1e6:.2f} us ({fired} fired)")
+        print(f"  cancel:             {cancel_time * 1e6:.2f} us")
+        print(f"  legacy 1s scan:     {legacy_tick * 1e3:.2f} ms per tick")
+        print(f"  idle wakeups:       {wakeups} in {args.idle_seconds:.0f}s, {cpu * 1e3:.1f} ms CPU"
+              f" (legacy: {args.idle_seconds:.0f} wakeups, ~{legacy_tick * args.idle_seconds * 1e3:.0f} ms CPU)")
+
+if __name__ == "__main__":
+    main()
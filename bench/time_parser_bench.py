@@ -0,0 +1,115 @@
+"""Compare time_parser.parse_time with the if/elif chain it replaced.
+
+Usage: python bench/time_parser_bench.py [--number N]
+"""
+import os
+import sys
+import timeit
+import argparse
+from datetime import datetime, timedelta
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from time_parser import parse_time
+
+TIMEZONE = "America/New_York"
+CORPUS = [
+    "in 90 minutes", "in 2 hours", "in 3 days", "in 1 week", "in 1 month", "tomorrow", "tonight", "noon",
+    "midnight", "tomorrow at 9:30am", "tomorrow 5pm", "friday", "next sunday", "friday at 3pm",
+    "in 90 min", "2h30m", "at 5pm", "5pm tomorrow", "next week", "2025-12-31 14:30", "whenever",
+]
+
+def legacy_parse(time_str: str, now: datetime):
+    """The reminders cog's original parser, minus the Discord responses"""
+    time_str = time_str.lower().strip()
+    target_dt = None
+    if time_str == "tomorrow":
+        target_dt = (now + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    elif time_str == "tonight":
+        target_dt = now.replace(hour=20, minute=0, second=0, microsecond=0)
+    elif time_str == "noon" or time_str == "midday":
+        if now.hour >= 12:
+            target_dt = (now + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+        else:
+            target_dt = now.replace(hour=12, minute=0, second=0, microsecond=0)
+    elif time_str == "midnight":
+        target_dt = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif time_str.startswith("in "):
+        parts = time_str[3:].split()
+        if len(parts) >= 2:
+            try:
+                amount = int(parts[0])
+                unit = parts[1].lower()
+                if unit.startswith("minute"):
+                    target_dt = now + timedelta(minutes=amount)
+                elif unit.startswith("hour"):
+                    target_dt = now + timedelta(hours=amount)
+                elif unit.startswith("day"):
+                    target_dt = now + timedelta(days=amount)
+                elif unit.startswith("week"):
+                    target_dt = now + timedelta(weeks=amount)
+                elif unit.startswith("month"):
+                    target_dt = now + timedelta(days=30*amount)
+            except ValueError:
+                pass
+    elif "tomorrow" in time_str and ("at" in time_str or ":" in time_str):
+        time_part = time_str.split("at")[-1].strip() if "at" in time_str else time_str.split("tomorrow")[-1].strip()
+        time_part = time_part.replace("am", " AM").replace("pm", " PM")
+        for fmt in ["%I:%M %p", "%I:%M%p", "%I %p", "%H:%M"]:
+            try:
+                parsed_time = datetime.strptime(time_part, fmt)
+            except ValueError:
+                continue
+            target_dt = (now + timedelta(days=1)).replace(hour=parsed_time.hour, minute=parsed_time.minute, second=0, microsecond=0)
+            break
+    elif any(day in time_str for day in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]):
+        day_mapping = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+        target_day = next(num for day, num in day_mapping.items() if day in time_str)
+        days_ahead = (target_day - now.weekday()) % 7
+        if days_ahead == 0 and ("next" in time_str or now.hour >= 12):
+            days_ahead = 7
+        target_date = now + timedelta(days=days_ahead)
+        target_time = "9:00 AM"
+        if "at" in time_str:
+            time_part = time_str.split("at")[-1].strip().replace("am", " AM").replace("pm", " PM")
+            for fmt in ["%I:%M %p", "%I:%M%p", "%I %p", "%H:%M"]:
+                try:
+                    target_time = datetime.strptime(time_part, fmt).strftime("%H:%M")
+                    break
+                except ValueError:
+                    continue
+        try:
+            # As in the original, the "9:00 AM" default fails to parse here, so a bare day name gives None
+            hour, minute = map(int, target_time.split(":")[:2])
+            target_dt = target_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        except ValueError:
+            pass
+    return target_dt
+
+def legacy_entry(time_str: str):
+    # The cog looked the timezone up on every call
+    return legacy_parse(time_str, datetime.now(pytz.timezone(TIMEZONE)))
+
+def new_entry(time_str: str):
+    return parse_time(time_str, TIMEZONE)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="passes over the corpus per measurement")
+    args = parser.parse_args()
+
+    print(f"{len(CORPUS)} inputs, {args.number} passes")
+    for name, entry in (("if/elif chain", legacy_entry), ("table-driven", new_entry)):
+        parsed = sum(entry(text) is not None for text in CORPUS)
+        best = min(timeit.repeat(lambda: [entry(text) for text in CORPUS], number=args.number, repeat=5))
+        per_call = best / (args.number * len(CORPUS)) * 1e6
+        print(f"{name:>14}: {per_call:6.2f} us/parse, understood {parsed}/{len(CORPUS)}")
+
+    print("\nInputs only one parser understands:")
+    for text in CORPUS:
+        old, new = legacy_entry(text), new_entry(text)
+        if (old is None) != (new is None):
+            print(f"  {text!r}: old={old and old.isoformat(timespec='minutes')} new={new and new.isoformat(timespec='minutes')}")
+
+if __name__ == "__main__":
+    main()
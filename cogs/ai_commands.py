@@ -1,13 +1,20 @@
+import os
 import time
 import logging
 import discord
 from discord import app_commands, Interaction, Embed, Attachment
 from discord.ext import commands
 from typing import Optional, Literal
-from embed_utils import send_embed
+from embed_utils import send_embed, StreamingEmbedRenderer
 
 logger = logging.getLogger(__name__)
 
+# Stream completions into progressively edited embeds for /chat and AI Reply
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() not in ("0", "false", "no")
+
+# Order the AI Reply web search button cycles through
+WEB_SEARCH_MODES = ("off", "on", "auto")
+
 MODEL_CONFIG = {
     "gpt-4o-mini": {
         "name": "GPT-4o-mini by OpenAI",
@@ -15,7 +22,8 @@ MODEL_CONFIG = {
         "default_footer": "gpt-4o-mini",
         "api_model": "openai/gpt-4o-mini",
         "supports_images": True,
-        "api": "openrouter"
+        "api": "openrouter",
+        "cache_responses": True
     },
     "gpt-o3-mini": {
         "name": "GPT-o3-mini by OpenAI",
@@ -23,7 +31,9 @@ MODEL_CONFIG = {
         "default_footer": "o3-mini | CoT",
         "api_model": "openai/o3-mini",
         "supports_images": False,
-        "api": "openrouter"
+        "api": "openrouter",
+        "max_concurrency": 2,
+        "fallback": "gpt-4o-mini"
     },
     "deepseek-v3": {
         "name": "DeepSeek v3 by DeepSeek",
@@ -31,7 +41,8 @@ MODEL_CONFIG = {
         "default_footer": "Deepseek-v3",
         "api_model": "deepseek/deepseek-chat",
         "supports_images": False,
-        "api": "openrouter"
+        "api": "openrouter",
+        "fallback": "gpt-4o-mini"
     },
     "claude-3.7-sonnet": {
         "name": "Claude 3.7 Sonnet by Anthropic",
@@ -39,7 +50,9 @@ MODEL_CONFIG = {
         "default_footer": "Claude 3.7 Sonnet",
         "api_model": "anthropic/claude-3.7-sonnet:beta",
         "supports_images": False,
-        "api": "openrouter"
+        "api": "openrouter",
+        "max_concurrency": 3,
+        "fallback": "gpt-4o-mini"
     },
     "claude-3.7-sonnet:thinking": {
         "name": "Claude 3.7 Sonnet (Thinking) by Anthropic",
@@ -47,7 +60,9 @@ MODEL_CONFIG = {
         "default_footer": "Claude 3.7 Sonnet (Thinking)",
         "api_model": "anthropic/claude-3.7-sonnet:thinking",
         "supports_images": False,
-        "api": "openrouter"
+        "api": "openrouter",
+        "max_concurrency": 2,
+        "fallback": "claude-3.7-sonnet"
     },
     "gemini-2.0-flash-lite": {
         "name": "Gemini 2.0 Flash Lite by Google",
@@ -55,7 +70,8 @@ MODEL_CONFIG = {
         "default_footer": "Gemini 2.0 Flash Lite",
         "api_model": "google/gemini-2.0-flash-lite-001",
         "supports_images": False,
-        "api": "openrouter"
+        "api": "openrouter",
+        "cache_responses": True
     },
     "grok-2": {
         "name": "Grok 2 by X-AI",
@@ -79,7 +95,7 @@ class AICommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
     
-    async def _process_ai_request(self, prompt, model_key, ctx=None, interaction=None, attachments=None, reference_message=None, image_url=None, reply_msg: Optional[discord.Message] = None, fun: bool = False, web_search: bool = False, reply_user=None):
+    async def _process_ai_request(self, prompt, model_key, ctx=None, interaction=None, attachments=None, reference_message=None, image_url=None, reply_msg: Optional[discord.Message] = None, fun: bool = False, web_search: str = "off", reply_user=None):
         config = MODEL_CONFIG[model_key]
         channel = ctx.channel if ctx else interaction.channel
         api_cog = self.bot.get_cog("APIUtils")
@@ -97,9 +113,9 @@ class AICommands(commands.Cog):
                 await interaction.followup.send(embed=error_embed)
             return
 
+        from generic_chat import process_attachments, perform_chat_query
         if not image_url:
-            from generic_chat import process_attachments, perform_chat_query
-            final_prompt, img_url = await process_attachments(prompt, attachments or [], is_slash=(interaction is not None))
+            final_prompt, img_url = await process_attachments(prompt, attachments or [], self.bot.session_manager.session, is_slash=(interaction is not None))
         else:
             final_prompt = prompt
             img_url = image_url
@@ -108,36 +124,69 @@ class AICommands(commands.Cog):
         model = config["api_model"]
         footer = config["default_footer"]
         api = config.get("api", "openai")
+
+        fallback_config = MODEL_CONFIG.get(config.get("fallback"))
+        if fallback_config and img_url and not fallback_config.get("supports_images", False):
+            fallback_config = None
+            
+        attribution_text = None
+        if reply_user and reply_msg:
+            if hasattr(reply_msg, 'guild') and reply_msg.guild:
+                message_link = f"https://discord.com/channels/{reply_msg.guild.id}/{reply_msg.channel.id}/{reply_msg.id}"
+            else:
+                message_link = f"https://discord.com/channels/@me/{reply_msg.channel.id}/{reply_msg.id}"
+            attribution_text = f"### {reply_user.mention} used AI Reply > {message_link}"
+
+        renderer = None
+        if STREAM_RESPONSES:
+            if ctx or reply_msg:
+                renderer = StreamingEmbedRenderer(color=config["color"], reply_to=ctx.message if ctx else reply_msg, content=attribution_text)
+            else:
+                renderer = StreamingEmbedRenderer(color=config["color"], interaction=interaction, content=attribution_text)
+
+        queue_message = {"shown": False, "closed": False}
+
+        async def show_queue_position(position: int):
+            # Replaces the "thinking" spinner until the reply starts rendering
+            if interaction is None or queue_message["closed"]:
+                return
+            if renderer is None or renderer.first_visible_at is None:
+                queue_message["shown"] = True
+                await interaction.edit_original_response(content=f"⏳ Queued for {config['name']}, position {position}")
+
+        async def clear_queue_position():
+            # Replies go out as followups, which would leave the queue message behind
+            queue_message["closed"] = True
+            if not queue_message["shown"] or reply_msg is not None:
+                return
+            if renderer is not None and renderer.first_visible_at is not None:
+                return
+            try:
+                await interaction.delete_original_response()
+            except discord.HTTPException as e:
+                logger.warning(f"Could not delete queue message: {e}")
             
         try:
-            if ctx:
-                result, elapsed, footer_with_stats = await perform_chat_query(
-                    prompt=cleaned_prompt,
-                    api_cog=api_cog,
-                    channel=channel,
-                    duck_cog=duck_cog,
-                    image_url=img_url,
-                    reference_message=reference_message,
-                    model=model,
-                    reply_footer=footer,
-                    api=api,
-                    use_fun=fun,
-                    web_search=web_search
-                )
-            else:   
-                result, elapsed, footer_with_stats = await perform_chat_query(
-                    prompt=cleaned_prompt,
-                    api_cog=api_cog,
-                    channel=channel,
-                    duck_cog=duck_cog,
-                    image_url=img_url,
-                    reference_message=reference_message,
-                    model=model,
-                    reply_footer=footer,
-                    api=api,
-                    use_fun=fun,
-                    web_search=web_search
-                )
+            result, elapsed, footer_with_stats = await perform_chat_query(
+                prompt=cleaned_prompt,
+                api_cog=api_cog,
+                channel=channel,
+                duck_cog=duck_cog,
+                image_url=img_url,
+                reference_message=reference_message,
+                model=model,
+                reply_footer=footer,
+                api=api,
+                use_fun=fun,
+                web_search=web_search,
+                renderer=renderer,
+                use_cache=config.get("cache_responses", False),
+                user_id=(ctx.author if ctx else interaction.user).id,
+                max_concurrency=config.get("max_concurrency"),
+                on_queue_update=show_queue_position,
+                fallback_model=fallback_config["api_model"] if fallback_config else None,
+                fallback_api=fallback_config.get("api", "openai") if fallback_config else "openai"
+            )
             
             final_footer = footer_with_stats
                 
@@ -148,31 +197,31 @@ class AICommands(commands.Cog):
             if ctx:
                 return await ctx.reply(embed=error_embed)
             else:
+                await clear_queue_position()
                 return await interaction.followup.send(embed=error_embed)
+
+        if renderer is not None:
+            # The first streamed message is an edit of the original response, which replaces the queue message
+            queue_message["closed"] = True
+            await renderer.finish(final_footer)
+            return
             
         embed = discord.Embed(title="", description=result, color=config["color"])
         embed.set_footer(text=final_footer)
-        
-        attribution_text = None
-        if reply_user and reply_msg:
-            if hasattr(reply_msg, 'guild') and reply_msg.guild:
-                message_link = f"https://discord.com/channels/{reply_msg.guild.id}/{reply_msg.channel.id}/{reply_msg.id}"
-            else:
-                message_link = f"https://discord.com/channels/@me/{reply_msg.channel.id}/{reply_msg.id}"
-            attribution_text = f"### {reply_user.mention} used AI Reply > {message_link}"
 
         if ctx or reply_msg:
             channel = ctx.channel if ctx else reply_msg.channel
             message_to_reply = ctx.message if ctx else reply_msg
             await send_embed(channel, embed, reply_to=message_to_reply, content=attribution_text)
         else:
+            await clear_queue_position()
             await send_embed(interaction.channel, embed, interaction=interaction, content=attribution_text)
 
     @app_commands.command(name="chat", description="Select a model and provide a prompt")
     @app_commands.describe(
         model="Model to use for the response",
         fun="Toggle fun mode",
-        web_search="Toggle web search",
+        web_search="Web search: off, on, or auto (search only when the prompt seems to need it)",
         prompt="Your query or instructions",
         attachment="Optional attachment (image or text file)"
     )
@@ -184,7 +233,7 @@ class AICommands(commands.Cog):
                         "gemini-2.0-flash-lite", "grok-2", "mistral-large"],
         prompt: str, 
         fun: bool = False,
-        web_search: bool = False,
+        web_search: Literal["off", "on", "auto"] = "off",
         attachment: Optional[Attachment] = None
     ):
         await interaction.response.defer(thinking=True)
@@ -237,7 +286,8 @@ class AIContextMenus(commands.Cog):
         async def on_submit(self, interaction: discord.Interaction):
             additional_text = self.additional_input.value or ""
             username = interaction.user.name
-            formatted_prompt = f"{username}: {additional_text}"
+            # Leave the prompt empty without extra input so identical AI Replies can be coalesced
+            formatted_prompt = f"{username}: {additional_text}" if additional_text.strip() else ""
 
             view = ModelSelectionView(
                 has_image=self.has_image,
@@ -262,7 +312,7 @@ class ModelSelectionView(discord.ui.View):
         self.additional_text = additional_text
         self.selected_model = "gpt-4o-mini" if has_image else "gpt-o3-mini"
         self.fun = False
-        self.web_search = False
+        self.web_search = "off"
         
         self._create_dropdown()
         self._create_buttons()
@@ -340,7 +390,7 @@ class ModelSelectionView(discord.ui.View):
         self.add_item(fun_button)
         
         web_search_button = discord.ui.Button(
-            label=f"Web Search: {'ON' if self.web_search else 'OFF'}", 
+            label=f"Web Search: {self.web_search.upper()}", 
             style=discord.ButtonStyle.secondary, 
             custom_id="toggle_web_search"
         )
@@ -374,7 +424,7 @@ class ModelSelectionView(discord.ui.View):
         await interaction.response.edit_message(view=self)
     
     async def toggle_web_search(self, interaction: discord.Interaction):
-        self.web_search = not self.web_search
+        self.web_search = WEB_SEARCH_MODES[(WEB_SEARCH_MODES.index(self.web_search) + 1) % len(WEB_SEARCH_MODES)]
         self.clear_items()
         self._create_dropdown()
         self._create_buttons()
@@ -1,40 +1,190 @@
 import os
+import re
+import time
 import asyncio
 import logging
 import openai
 import discord
 from discord.ext import commands
 import base64
-import aiohttp
-import io
-from PIL import Image
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from urllib.parse import urlparse
+from ttl_cache import TTLCache
+from image_processing import preprocess_image
+from resilience import CircuitBreaker, PROVIDER_FAILURES, RETRYABLE_ERRORS, stop_at_deadline, wait_retry_after
+from single_flight import SingleFlight
+from request_scheduler import RequestScheduler
+from search_context import _estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# Connection pool settings for the LLM provider clients (one pool per provider)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "300"))
+
+# Retry and circuit breaker policy for completion requests
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_MAX_RETRY_WAIT = float(os.getenv("LLM_MAX_RETRY_WAIT", "20"))
+LLM_FIRST_CHUNK_TIMEOUT = float(os.getenv("LLM_FIRST_CHUNK_TIMEOUT", "120"))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "60"))
+# Don't start another attempt with less than this much of the caller's timeout left
+LLM_MIN_ATTEMPT_TIME = float(os.getenv("LLM_MIN_ATTEMPT_TIME", "5"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Look up OpenRouter /generation stats in the background after each reply (logging only)
+OPENROUTER_GENERATION_STATS = os.getenv("OPENROUTER_GENERATION_STATS", "false").lower() in ("1", "true", "yes")
+
+# Response cache for models that opt in via MODEL_CONFIG["cache_responses"]
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# Fun mode only sends the guild emojis most relevant to the prompt, within this budget
+EMOJI_MAX_COUNT = int(os.getenv("EMOJI_MAX_COUNT", "40"))
+EMOJI_TOKEN_BUDGET = int(os.getenv("EMOJI_TOKEN_BUDGET", "400"))
+
+# Preprocessed images are cached by Discord attachment ID (or content hash)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "64"))
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", "3600"))
+
+_ATTACHMENT_ID_RE = re.compile(r"/attachments/\d+/(\d+)/")
+_WORD_RE = re.compile(r"[a-z]+|[0-9]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+def _emoji_name_tokens(name: str) -> frozenset:
+    return frozenset(token.lower() for token in _CAMEL_RE.findall(name))
+
+def _stage_timeout(limit: float, deadline: float = None) -> float:
+    """Timeout for one stage of an attempt, cut short by the request's deadline (a time.monotonic() value)"""
+    if deadline is None:
+        return limit
+    return max(0.0, min(limit, deadline - time.monotonic()))
+
 class APIUtils(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.OAICLIENT = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.OPENROUTERCLIENT = openai.OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY")
-        )
+        self.OAICLIENT = None
+        self.OPENROUTERCLIENT = None
         self.SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", "You are a helpful assistant.")
         self.BOT_TAG = os.getenv("BOT_TAG", "")
         self.FUN_SYSTEM_PROMPT = os.getenv("FUN_PROMPT", "Write an amusing and sarcastic!")
+        self._background_tasks = set()
+        self.response_cache = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, name="responses")
+        self.in_flight = SingleFlight(name="completions")
+        self.scheduler = RequestScheduler()
+        self.breakers = {}  # {model: CircuitBreaker}
+        self._emoji_cache = {}  # {guild_id: ([(name_tokens, emoji_tag)], full_list_tokens)}
+        self.emoji_tokens_sent = 0
+        self.emoji_tokens_saved = 0
+        self._image_pool = None
+        self.image_cache = TTLCache(IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL, name="images")
+
+    def _build_http_client(self) -> openai.DefaultAsyncHttpxClient:
+        # Limits and timeouts come from openai's own types, so they match the httpx build the client uses
+        return openai.DefaultAsyncHttpxClient(
+            limits=type(openai.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=openai.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+
+    async def cog_load(self):
+        self.OAICLIENT = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=self._build_http_client(),
+            max_retries=0
+        )
+        self.OPENROUTERCLIENT = openai.AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            http_client=self._build_http_client(),
+            max_retries=0
+        )
+        self._image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        logger.info(
+            "API clients opened (max connections: %d, keepalive: %d, keepalive expiry: %ss)",
+            LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY
+        )
+
+    async def cog_unload(self):
+        for task in list(self._background_tasks):
+            task.cancel()
+        for client in (self.OAICLIENT, self.OPENROUTERCLIENT):
+            if client is not None:
+                await client.close()
+        self.OAICLIENT = None
+        self.OPENROUTERCLIENT = None
+        if self._image_pool is not None:
+            self._image_pool.shutdown(wait=False, cancel_futures=True)
+            self._image_pool = None
+        logger.info("API clients closed")
+
+    @commands.Cog.listener()
+    async def on_guild_emojis_update(self, guild: discord.Guild, before, after):
+        self._emoji_cache.pop(guild.id, None)
+        logger.info(f"Invalidated emoji cache for guild {guild.id}")
+
+    def _guild_emojis(self, guild: discord.Guild) -> tuple:
+        cached = self._emoji_cache.get(guild.id)
+        if cached is None:
+            entries = []
+            for emoji in guild.emojis:
+                if emoji.animated:
+                    tag = f"<a:{emoji.name}:{emoji.id}>"
+                else:
+                    tag = f"<:{emoji.name}:{emoji.id}>"
+                entries.append((_emoji_name_tokens(emoji.name), tag))
+            cached = (entries, _estimate_tokens(",".join(tag for _, tag in entries)))
+            self._emoji_cache[guild.id] = cached
+            logger.info(f"Cached {len(entries)} emojis for guild {guild.id}")
+        return cached
 
-    async def get_guild_emoji_list(self, guild: discord.Guild) -> str:
+    async def get_guild_emoji_list(self, guild: discord.Guild, prompt: str = "") -> str:
         if not guild or not guild.emojis:
             logger.info("No guild or no emojis found in guild")
             return ""
-        emoji_list = []
-        for emoji in guild.emojis:
-            if emoji.animated:
-                emoji_list.append(f"<a:{emoji.name}:{emoji.id}>")
-            else:
-                emoji_list.append(f"<:{emoji.name}:{emoji.id}>")
-        emoji_string = ",".join(emoji_list)
-        logger.info(f"Compiled emoji list with {len(emoji_list)} emojis")
+        emojis, full_tokens = self._guild_emojis(guild)
+        prompt_tokens = set(_WORD_RE.findall(prompt.lower()))
+
+        def relevance(entry):
+            name_tokens = entry[0]
+            exact = len(name_tokens & prompt_tokens)
+            partial = sum(
+                1 for token in name_tokens if len(token) >= 3 and token not in prompt_tokens
+                and any(token in word or word in token for word in prompt_tokens if len(word) >= 3)
+            )
+            return exact + 0.5 * partial
+
+        # Stable sort keeps the guild's own emoji order among equally relevant ones
+        ranked = sorted(emojis, key=relevance, reverse=True) if prompt_tokens else emojis
+        selected = []
+        budget = EMOJI_TOKEN_BUDGET
+        for _, tag in ranked:
+            if len(selected) >= EMOJI_MAX_COUNT:
+                break
+            cost = _estimate_tokens(tag) + 1
+            if cost > budget:
+                break
+            selected.append(tag)
+            budget -= cost
+
+        emoji_string = ",".join(selected)
+        sent_tokens = _estimate_tokens(emoji_string)
+        self.emoji_tokens_sent += sent_tokens
+        self.emoji_tokens_saved += full_tokens - sent_tokens
+        logger.info(
+            f"Selected {len(selected)}/{len(emojis)} emojis (~{sent_tokens} of ~{full_tokens} tokens, "
+            f"saved ~{full_tokens - sent_tokens}; total saved ~{self.emoji_tokens_saved})"
+        )
         return emoji_string
     
     async def fetch_generation_stats(self, generation_id: str) -> dict:
@@ -42,32 +192,32 @@ class APIUtils(commands.Cog):
         max_retries = 3
         retry_delay = 0.5
         
+        session = self.bot.session_manager.session
+        headers = {"Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}"}
+        url = f"https://openrouter.ai/api/v1/generation?id={generation_id}"
+        
         for attempt in range(max_retries):
             try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {"Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}"}
-                    url = f"https://openrouter.ai/api/v1/generation?id={generation_id}"
-                    
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            stats = await response.json()
-                            logger.info(f"Successfully retrieved generation stats: {stats}")
-                            return stats.get("data", {})
-                        elif response.status == 404:
-                            error_text = await response.text()
-                            logger.warning(f"Generation stats not found on attempt {attempt+1}/{max_retries}: {error_text}")
-                            
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
-                                continue
-                            else:
-                                logger.warning(f"Failed to fetch generation stats after {max_retries} attempts")
-                                return {}
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        stats = await response.json()
+                        logger.info(f"Successfully retrieved generation stats: {stats}")
+                        return stats.get("data", {})
+                    elif response.status == 404:
+                        error_text = await response.text()
+                        logger.warning(f"Generation stats not found on attempt {attempt+1}/{max_retries}: {error_text}")
+                        
+                        if attempt < max_retries - 1:
+                            await asyncio.sleep(retry_delay)
+                            retry_delay *= 2
+                            continue
                         else:
-                            error_text = await response.text()
-                            logger.error(f"Failed to fetch generation stats: HTTP {response.status}, {error_text}")
+                            logger.warning(f"Failed to fetch generation stats after {max_retries} attempts")
                             return {}
+                    else:
+                        error_text = await response.text()
+                        logger.error(f"Failed to fetch generation stats: HTTP {response.status}, {error_text}")
+                        return {}
             except Exception as e:
                 logger.exception(f"Error fetching generation stats on attempt {attempt+1}: {e}")
                 if attempt < max_retries - 1:
@@ -77,6 +227,114 @@ class APIUtils(commands.Cog):
                 return {}
         
         return {}
+
+    def _usage_stats(self, usage) -> dict:
+        """Map the usage block of a completion response to the footer stats keys"""
+        if usage is None:
+            return {}
+        stats = {
+            "tokens_prompt": getattr(usage, "prompt_tokens", 0) or 0,
+            "tokens_completion": getattr(usage, "completion_tokens", 0) or 0,
+        }
+        # OpenRouter usage accounting reports the cost in credits (USD)
+        cost = getattr(usage, "cost", None)
+        if cost is not None:
+            stats["total_cost"] = cost
+        return stats
+
+    def _completion_kwargs(self, api: str, stream: bool) -> dict:
+        kwargs = {}
+        if api == "openrouter":
+            kwargs["extra_body"] = {"usage": {"include": True}}
+        if stream:
+            kwargs["stream"] = True
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
+
+    async def _image_data_url(self, image_url: str) -> str:
+        """Download, preprocess and base64-encode a Discord image, caching the result"""
+        match = _ATTACHMENT_ID_RE.search(image_url)
+        attachment_key = f"attachment:{match.group(1)}" if match else None
+        if attachment_key:
+            cached = self.image_cache.get(attachment_key)
+            if cached is not None:
+                logger.info(f"Image cache hit for {attachment_key}")
+                return cached
+
+        async with self.bot.session_manager.session.get(image_url) as response:
+            if response.status != 200:
+                logger.warning(f"Failed to download image: {image_url} with status {response.status}")
+                return None
+            image_bytes = await response.read()
+
+        content_key = f"sha256:{hashlib.sha256(image_bytes).hexdigest()}"
+        data_url = self.image_cache.get(content_key)
+        if data_url is None:
+            try:
+                loop = asyncio.get_running_loop()
+                processed, mime_type = await loop.run_in_executor(self._image_pool, preprocess_image, image_bytes)
+                logger.info(f"Preprocessed image from {len(image_bytes)} to {len(processed)} bytes")
+            except Exception as e:
+                logger.exception(f"Image preprocessing failed, sending original: {e}")
+                processed, mime_type = image_bytes, self._guess_mime_type(image_url)
+            data_url = f"data:{mime_type};base64,{base64.b64encode(processed).decode('utf-8')}"
+            self.image_cache.set(content_key, data_url)
+
+        if attachment_key:
+            self.image_cache.set(attachment_key, data_url)
+        return data_url
+
+    def _guess_mime_type(self, image_url: str) -> str:
+        path = urlparse(image_url).path.lower()
+        if path.endswith('.png'):
+            return 'image/png'
+        elif path.endswith(('.jpg', '.jpeg')):
+            return 'image/jpeg'
+        elif path.endswith('.webp'):
+            return 'image/webp'
+        elif path.endswith('.gif'):
+            return 'image/gif'
+        return 'image/jpeg'
+
+    def _cache_key(self, model: str, messages_input: list) -> str:
+        """Hash the full request, replacing inline image data with its digest"""
+        normalized = []
+        for message in messages_input:
+            content = message["content"]
+            if isinstance(content, list):
+                content = [
+                    {"type": "image_digest", "digest": hashlib.sha256(part["image_url"]["url"].encode()).hexdigest()}
+                    if part.get("type") == "image_url" else part
+                    for part in content
+                ]
+            normalized.append({"role": message["role"], "content": content})
+        payload = json.dumps({"model": model, "messages": normalized}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cached_response(self, cache_key: str):
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            logger.info("Response cache miss (%s)", self.response_cache.stats())
+            return None
+        content, stats = cached
+        logger.info("Response cache hit (%s)", self.response_cache.stats())
+        return content, {**stats, "total_cost": 0, "cached": True}
+
+    async def _replay(self, content: str):
+        yield content
+
+    async def _replay_in_flight(self, future, generation_stats: dict):
+        content, stats = await self.in_flight.wait(future)
+        generation_stats.update(stats)
+        yield content
+
+    def _enrich_generation_stats(self, generation_id: str) -> None:
+        """Fetch OpenRouter generation stats without blocking the reply"""
+        if not OPENROUTER_GENERATION_STATS:
+            return
+        task = asyncio.create_task(self.fetch_generation_stats(generation_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
     
     async def send_request(
         self,
@@ -87,8 +345,21 @@ class APIUtils(commands.Cog):
         use_fun: bool = False,
         api: str = "openai",
         use_emojis: bool = False,
-        emoji_channel: discord.TextChannel = None
+        emoji_channel: discord.TextChannel = None,
+        stream: bool = False,
+        cache: bool = False,
+        guild_id: int = None,
+        user_id: int = None,
+        max_concurrency: int = None,
+        on_queue_update=None,
+        timeout: float = None
     ) -> tuple:
+        """Send a chat completion request.
+
+        ``timeout`` bounds the time spent queueing, retrying and waiting for the provider to start
+        answering; once a stream is flowing it is bounded by LLM_STREAM_IDLE_TIMEOUT instead.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
         if api == "openrouter":
             api_client = self.OPENROUTERCLIENT
             logger.info(f"Using OpenRouter API for model: {model}")
@@ -106,7 +377,7 @@ class APIUtils(commands.Cog):
         messages_input = [{"role": "system", "content": f"{system_used}"}]
         
         if use_emojis and emoji_channel:
-            emoji_list = await self.get_guild_emoji_list(emoji_channel.guild)
+            emoji_list = await self.get_guild_emoji_list(emoji_channel.guild, f"{reference_message or ''} {message_content}")
             if emoji_list:
                 messages_input.append({"role": "system", "content": f"List of available custom emojis: {emoji_list}"})
         
@@ -114,76 +385,220 @@ class APIUtils(commands.Cog):
             messages_input.append({"role": "user", "content": reference_message})
         
         if image_url is None:
-            messages_input.append({"role": "user", "content": message_content})
+            # An AI Reply without additional input only needs the referenced message
+            if message_content.strip() or not reference_message:
+                messages_input.append({"role": "user", "content": message_content})
         else:
             try:
                 content_list = [{"type": "text", "text": message_content}]
                 
                 if image_url and ("cdn.discordapp.com" in image_url or "media.discordapp.net" in image_url):
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(image_url) as response:
-                            if response.status == 200:
-                                image_bytes = await response.read()
-                                if image_url.lower().endswith('.png'):
-                                    mime_type = 'image/png'
-                                elif image_url.lower().endswith(('.jpg', '.jpeg')):
-                                    mime_type = 'image/jpeg'
-                                elif image_url.lower().endswith('.webp'):
-                                    mime_type = 'image/webp'
-                                elif image_url.lower().endswith('.gif'):
-                                    mime_type = 'image/gif'
-                                else:
-                                    mime_type = 'image/jpeg'
-                                
-                                base64_image = base64.b64encode(image_bytes).decode('utf-8')
-                                content_list.append({
-                                    "type": "image_url", 
-                                    "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}
-                                })
+                    data_url = await self._image_data_url(image_url)
+                    if data_url:
+                        content_list.append({
+                            "type": "image_url", 
+                            "image_url": {"url": data_url}
+                        })
                     
                 messages_input.append({"role": "user", "content": content_list})
             except Exception as e:
                 logger.exception(f"Error processing image: {e}")
                 messages_input.append({"role": "user", "content": message_content})
         
-        logger.info("Sending API request with payload: %s", messages_input)
+        request_key = self._cache_key(model, messages_input)
+        cache_key = request_key if cache else None
+        if cache:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                content, stats = cached
+                return (self._replay(content) if stream else content), stats
+
+        # Identical requests already in flight share that call's result
         generation_stats = {}
-        
-        try:
-            response = await asyncio.to_thread(
-                api_client.chat.completions.create,
-                model=model,
-                messages=messages_input,
-            )
+        in_flight = self.in_flight.get(request_key)
+        if in_flight is not None:
+            if stream:
+                return self._replay_in_flight(in_flight, generation_stats), generation_stats
+            content, stats = await self.in_flight.wait(in_flight)
+            return content, dict(stats)
+
+        # Fail fast while the model's provider is known to be down. Checked only by callers that
+        # will really hit the provider, so coalesced followers never take the half-open probe.
+        self._breaker(model).before_call()
+
+        logger.info("Sending API request with payload: %s", messages_input)
+        slot = self.scheduler.slot(
+            model, api,
+            guild_id=guild_id,
+            user_id=user_id,
+            model_limit=max_concurrency,
+            on_queue_update=on_queue_update
+        )
+
+        if stream:
+            # The stats dict is filled in once the caller has drained the stream
+            return self._stream_completion(api_client, api, model, messages_input, generation_stats, cache_key, request_key, slot, deadline), generation_stats
+
+        return await self.in_flight.do(
+            request_key,
+            lambda: self._complete(api_client, api, model, messages_input, cache_key, slot, deadline)
+        )
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model, LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET)
+            self.breakers[model] = breaker
+        return breaker
+
+    def _retrying(self, deadline: float = None) -> AsyncRetrying:
+        return AsyncRetrying(
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            wait=wait_retry_after(wait_exponential(min=1, max=10), max_wait=LLM_MAX_RETRY_WAIT),
+            stop=stop_after_attempt(LLM_MAX_ATTEMPTS) | stop_at_deadline(deadline, LLM_MIN_ATTEMPT_TIME),
+            before_sleep=lambda state: logger.warning(
+                "Retrying API request (attempt %d): %s", state.attempt_number, state.outcome.exception()
+            ),
+            reraise=True,
+        )
+
+    async def _complete(self, api_client, api: str, model: str, messages_input: list, cache_key: str = None, slot=None, deadline: float = None) -> tuple:
+        breaker = self._breaker(model)
+        async with slot:
+            self._check_deadline(deadline)
+            try:
+                async for attempt in self._retrying(deadline):
+                    with attempt:
+                        response = await asyncio.wait_for(
+                            api_client.chat.completions.create(
+                                model=model,
+                                messages=messages_input,
+                                **self._completion_kwargs(api, stream=False)
+                            ),
+                            _stage_timeout(LLM_REQUEST_TIMEOUT, deadline)
+                        )
+            except (asyncio.CancelledError, *PROVIDER_FAILURES):
+                # A caller giving up on a hung provider counts against it too
+                breaker.record_failure()
+                raise
+            except Exception:
+                # Any other error (e.g. a 400) still means the provider is up
+                breaker.record_success()
+                raise
+            breaker.record_success()
             
-            if not response:
-                logger.error("API returned None response")
-                return "I'm sorry, I received an empty response from the API. Please try again.", {}
-                
-            if not hasattr(response, 'choices') or not response.choices:
-                logger.error("API response missing choices: %s", response)
-                return "I'm sorry, the API response was missing expected content. Please try again.", {}
-                
-            if not hasattr(response.choices[0], 'message') or not response.choices[0].message:
-                logger.error("API response missing message in first choice: %s", response.choices[0])
-                return "I'm sorry, the API response structure was unexpected. Please try again.", {}
-                
-            if not hasattr(response.choices[0].message, 'content'):
-                logger.error("API response missing content in message: %s", response.choices[0].message)
-                return "I'm sorry, the response content was missing. Please try again.", {}
+        if not response:
+            logger.error("API returned None response")
+            return "I'm sorry, I received an empty response from the API. Please try again.", {}
+            
+        if not hasattr(response, 'choices') or not response.choices:
+            logger.error("API response missing choices: %s", response)
+            return "I'm sorry, the API response was missing expected content. Please try again.", {}
             
-            content = response.choices[0].message.content
+        if not hasattr(response.choices[0], 'message') or not response.choices[0].message:
+            logger.error("API response missing message in first choice: %s", response.choices[0])
+            return "I'm sorry, the API response structure was unexpected. Please try again.", {}
             
-            if api == "openrouter" and hasattr(response, 'id'):
-                generation_id = response.id
+        if not hasattr(response.choices[0].message, 'content'):
+            logger.error("API response missing content in message: %s", response.choices[0].message)
+            return "I'm sorry, the response content was missing. Please try again.", {}
+        
+        content = response.choices[0].message.content
+        generation_stats = self._usage_stats(getattr(response, 'usage', None))
+        
+        if api == "openrouter" and hasattr(response, 'id'):
+            logger.info(f"OpenRouter generation ID: {response.id}")
+            self._enrich_generation_stats(response.id)
+
+        if cache_key and content:
+            self.response_cache.set(cache_key, (content, generation_stats))
+            
+        return content, generation_stats
+
+    @staticmethod
+    def _check_deadline(deadline: float = None) -> None:
+        # Time spent queueing for a slot comes out of the same budget
+        if deadline is not None and deadline - time.monotonic() <= 0:
+            raise asyncio.TimeoutError("Timed out waiting for a request slot")
+
+    async def _open_stream(self, api_client, api: str, model: str, messages_input: list, deadline: float = None):
+        """Start a stream and wait for its first chunk; safe to retry up to this point"""
+        response = await asyncio.wait_for(
+            api_client.chat.completions.create(
+                model=model,
+                messages=messages_input,
+                **self._completion_kwargs(api, stream=True)
+            ),
+            _stage_timeout(LLM_FIRST_CHUNK_TIMEOUT, deadline)
+        )
+        try:
+            first_chunk = await asyncio.wait_for(response.__anext__(), _stage_timeout(LLM_FIRST_CHUNK_TIMEOUT, deadline))
+        except StopAsyncIteration:
+            first_chunk = None
+        except BaseException:
+            await response.close()
+            raise
+        return response, first_chunk
+
+    async def _stream_completion(self, api_client, api: str, model: str, messages_input: list, generation_stats: dict, cache_key: str = None, request_key: str = None, slot=None, deadline: float = None):
+        breaker = self._breaker(model)
+        generation_id = None
+        parts = []
+        error = None
+        # Registered on first iteration, so a stream that is never started can't leave followers waiting
+        flight = self.in_flight.begin(request_key) if request_key is not None else None
+        try:
+            # The scheduler slot is held until the stream has been fully consumed
+            async with slot:
+                self._check_deadline(deadline)
+                response = None
+                try:
+                    async for attempt in self._retrying(deadline):
+                        with attempt:
+                            response, chunk = await self._open_stream(api_client, api, model, messages_input, deadline)
+                    while chunk is not None:
+                        if generation_id is None and getattr(chunk, 'id', None):
+                            generation_id = chunk.id
+                        # The usage block arrives on the final chunk, which has no choices
+                        if getattr(chunk, 'usage', None):
+                            generation_stats.update(self._usage_stats(chunk.usage))
+                        if chunk.choices:
+                            delta = chunk.choices[0].delta
+                            if delta is not None and delta.content:
+                                parts.append(delta.content)
+                                yield delta.content
+                        try:
+                            chunk = await asyncio.wait_for(response.__anext__(), LLM_STREAM_IDLE_TIMEOUT)
+                        except StopAsyncIteration:
+                            chunk = None
+                except (asyncio.CancelledError, *PROVIDER_FAILURES):
+                    breaker.record_failure()
+                    raise
+                except Exception:
+                    breaker.record_success()
+                    raise
+                else:
+                    breaker.record_success()
+                finally:
+                    if response is not None:
+                        await response.close()
+
+            if api == "openrouter" and generation_id:
                 logger.info(f"OpenRouter generation ID: {generation_id}")
-                generation_stats = await self.fetch_generation_stats(generation_id)
-                
-            return content, generation_stats
-        except Exception as e:
-            logger.exception("Error in API request: %s", e)
-            return f"I'm sorry, there was an error communicating with the AI service: {str(e)}", {}
+                self._enrich_generation_stats(generation_id)
+
+            if cache_key and parts:
+                self.response_cache.set(cache_key, ("".join(parts), dict(generation_stats)))
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Hand the outcome to identical requests waiting on this one
+            if flight is not None and not flight.done():
+                if error is not None:
+                    flight.set_exception(error if isinstance(error, Exception) else RuntimeError("Stream was cancelled"))
+                else:
+                    flight.set_result(("".join(parts), dict(generation_stats)))
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(APIUtils(bot))
\ No newline at end of file
@@ -1,19 +1,158 @@
 import os
+import json
 import asyncio
+import hashlib
 import logging
 from embed_utils import send_embed  
 from duckduckgo_search import DDGS
 import discord
 from discord.ext import commands
 import time
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+import query_extractor
+import search_context
+from page_fetcher import PageFetcher
+from search_gate import SearchGate
 
 logger = logging.getLogger(__name__)
 
+# "local" extracts search queries with keyword heuristics and only falls back to the
+# LLM for long or ambiguous prompts; "llm" always asks the model
+SEARCH_QUERY_EXTRACTOR = os.getenv("SEARCH_QUERY_EXTRACTOR", "local").lower()
+
+# Search results and summaries are cached per normalized query; set DDG_CACHE_FILE to
+# keep the cache across restarts
+DDG_CACHE_SIZE = int(os.getenv("DDG_CACHE_SIZE", "256"))
+DDG_CACHE_TTL = float(os.getenv("DDG_CACHE_TTL", "900"))
+DDG_CACHE_FILE = os.getenv("DDG_CACHE_FILE")
+
+# "local" ranks and packs search snippets with BM25; "llm" summarizes them with gpt-4o-mini
+SEARCH_CONTEXT_BUILDER = os.getenv("SEARCH_CONTEXT_BUILDER", "local").lower()
+SEARCH_CONTEXT_TOKENS = int(os.getenv("SEARCH_CONTEXT_TOKENS", "700"))
+
+# Searches fan out to every backend and query variant at once; whatever has returned
+# by the deadline is merged and the stragglers are dropped
+DDG_SEARCH_BACKENDS = [b.strip() for b in os.getenv("DDG_SEARCH_BACKENDS", "text,news").split(",") if b.strip()]
+DDG_SEARCH_DEADLINE = float(os.getenv("DDG_SEARCH_DEADLINE", "6"))
+DDG_MAX_RESULTS = int(os.getenv("DDG_MAX_RESULTS", "10"))
+
+# Deep search replaces the snippets of the top-ranked results with text extracted from the pages
+DEEP_SEARCH = os.getenv("DEEP_SEARCH", "false").lower() in ("1", "true", "yes")
+DEEP_SEARCH_PAGES = int(os.getenv("DEEP_SEARCH_PAGES", "3"))
+DEEP_SEARCH_CONCURRENCY = int(os.getenv("DEEP_SEARCH_CONCURRENCY", "3"))
+DEEP_SEARCH_MAX_BYTES = int(os.getenv("DEEP_SEARCH_MAX_BYTES", str(512 * 1024)))
+DEEP_SEARCH_BUDGET = float(os.getenv("DEEP_SEARCH_BUDGET", "5"))
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "128"))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# "auto" web search only runs when the gate scores the prompt above its guild's threshold
+SEARCH_GATE_THRESHOLD = float(os.getenv("SEARCH_GATE_THRESHOLD", "0.5"))
+SEARCH_GATE_FILE = os.getenv("SEARCH_GATE_FILE")
+
+def _normalize(text: str) -> str:
+    return " ".join(text.strip().strip('"').strip().lower().split())
+
+def _query_variants(query: str) -> list:
+    """The query without surrounding quotes, plus a looser unquoted form when it contains exact phrases"""
+    query = query.strip()
+    main = query.strip('"').strip()
+    if '"' not in main:
+        return [main]
+    # Quoted phrases inside, e.g. '"borrow checker" rust': stripping the ends would unbalance them
+    return [query, " ".join(query.replace('"', " ").split())]
+
 class DuckDuckGo(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.in_flight = SingleFlight(name="ddg")
+        self.cache = TTLCache(DDG_CACHE_SIZE, DDG_CACHE_TTL, name="ddg")
+        self.backend_stats = {}
+        self.gate = SearchGate(SEARCH_GATE_THRESHOLD)
+        self.page_fetcher = PageFetcher(DEEP_SEARCH_CONCURRENCY, DEEP_SEARCH_MAX_BYTES, PAGE_CACHE_SIZE, PAGE_CACHE_TTL)
+
+    async def cog_load(self):
+        if DDG_CACHE_FILE:
+            try:
+                restored = await asyncio.to_thread(self._load_cache, DDG_CACHE_FILE)
+                logger.info("Restored %d cached search entries from %s", restored, DDG_CACHE_FILE)
+            except Exception as e:
+                logger.exception("Failed to restore search cache: %s", e)
+        if SEARCH_GATE_FILE:
+            try:
+                restored = await asyncio.to_thread(self._load_json, SEARCH_GATE_FILE)
+                if restored:
+                    self.gate.restore(restored)
+                    logger.info("Restored search gate thresholds for %d guild(s)", len(restored))
+            except Exception as e:
+                logger.exception("Failed to restore search gate thresholds: %s", e)
+
+    async def cog_unload(self):
+        if DDG_CACHE_FILE:
+            try:
+                await asyncio.to_thread(self._save_cache, DDG_CACHE_FILE, self.cache.snapshot())
+            except Exception as e:
+                logger.exception("Failed to persist search cache: %s", e)
+        if SEARCH_GATE_FILE:
+            try:
+                await asyncio.to_thread(self._save_json, SEARCH_GATE_FILE, self.gate.snapshot())
+            except Exception as e:
+                logger.exception("Failed to persist search gate thresholds: %s", e)
+        logger.info("Search cache stats: %s", self.cache.stats())
+        logger.info("Search gate stats: %s", self.gate.stats())
+        logger.info("Search backend stats: %s", self.search_stats())
+        if DEEP_SEARCH:
+            logger.info("Page fetcher stats: %s", self.page_fetcher.stats())
+
+    def _load_cache(self, path: str) -> int:
+        entries = self._load_json(path)
+        return self.cache.restore(entries) if entries else 0
+
+    def _save_cache(self, path: str, entries: list) -> None:
+        self._save_json(path, entries)
+        logger.info("Persisted %d cached search entries to %s", len(entries), path)
+
+    @staticmethod
+    def _load_json(path: str):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _save_json(path: str, data) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def should_search(self, user_message: str, mode: str, guild_id: int = None) -> bool:
+        """Resolve a web search mode ("off", "on" or "auto") for one prompt"""
+        if mode == "on":
+            self.gate.record_explicit(user_message, guild_id)
+            return True
+        if mode == "auto":
+            return self.gate.decide(user_message, guild_id)
+        return False
 
     async def extract_search_query(self, user_message: str) -> str:
+        return await self.in_flight.do(
+            ("extract", _normalize(user_message)),
+            lambda: self._extract_search_query(user_message)
+        )
+
+    async def _extract_search_query(self, user_message: str) -> str:
+        if SEARCH_QUERY_EXTRACTOR != "llm":
+            start = time.perf_counter()
+            query = query_extractor.extract_search_query(user_message)
+            elapsed_us = (time.perf_counter() - start) * 1e6
+            if not query_extractor.needs_llm_extraction(user_message, query):
+                logger.info("Extracted search query locally in %.0fus: %s", elapsed_us, query)
+                return query
+            logger.info("Local search query '%s' looks unreliable; falling back to the LLM extractor", query)
+        return await self._extract_search_query_llm(user_message)
+
+    async def _extract_search_query_llm(self, user_message: str) -> str:
         logger.info("Extracting search query for message: %s", user_message)
         api_utils = self.bot.get_cog("APIUtils")
         if not api_utils:
@@ -28,7 +167,8 @@ class DuckDuckGo(commands.Cog):
                     "address the following user message. Focus on extracting key terms, topics, names, or questions. "
                     "Return only the search query text, nothing else.\n\n"
                     f"User message: {user_message}"
-                )
+                ),
+                cache=True
             )
             
             extracted_query = extracted_result[0] if isinstance(extracted_result, tuple) else extracted_result
@@ -40,34 +180,166 @@ class DuckDuckGo(commands.Cog):
             logger.exception("Error extracting search query: %s", e)
             return ""
 
-    async def perform_ddg_search(self, query: str) -> str:
+    async def build_web_context(self, user_message: str, guild_id: int = None, learn: bool = False) -> str:
+        """Search for the prompt and return the text to inject into it, or "" if nothing useful was found.
+
+        With ``learn`` set (auto mode), whether the results were relevant trains the guild's search gate.
+        Failed query extraction and empty results (usually rate limiting) teach it nothing.
+        """
+        start = time.perf_counter()
+        try:
+            context, relevant = await self._build_web_context(user_message)
+        finally:
+            self.gate.record_search_latency(time.perf_counter() - start)
+        if learn and relevant is not None:
+            if relevant:
+                self.gate.record_hit(user_message, guild_id)
+            else:
+                self.gate.record_miss(user_message, guild_id)
+        return context
+
+    async def _build_web_context(self, user_message: str) -> tuple:
+        """The context, and whether the results were relevant (None if there were none to judge)"""
+        search_query = await self.extract_search_query(user_message)
+        if not search_query:
+            return "", None
+        results = await self.search(search_query)
+        if not results:
+            return "", None
+        if DEEP_SEARCH:
+            results = await self._with_page_text(user_message, search_query, results)
+        relevant = search_context.any_relevant(user_message, search_query, results)
+        if not relevant:
+            logger.info("None of the %d results for '%s' share a term with the prompt", len(results), search_query)
+        if SEARCH_CONTEXT_BUILDER == "llm":
+            formatted = f"Search query: {search_query}\n\n" + "".join(
+                f"{i} -- {result['title']}: {result['body']}\n\n" for i, result in enumerate(results, start=1)
+            )
+            return await self.summarize_search_results(formatted), relevant
+        start = time.perf_counter()
+        context = search_context.build_context(user_message, search_query, results, SEARCH_CONTEXT_TOKENS)
+        logger.info("Ranked search results locally in %.1fms", (time.perf_counter() - start) * 1000)
+        return context, relevant
+
+    async def _with_page_text(self, user_message: str, search_query: str, results: list) -> list:
+        ranked = search_context.rank_results(user_message, search_query, results)
+        urls = [r["href"] for r in ranked[:DEEP_SEARCH_PAGES] if r["href"]]
+        pages = await self.page_fetcher.fetch_many(self.bot.session_manager.session, urls, DEEP_SEARCH_BUDGET)
+        # Leave room in the context budget for every fetched page plus some plain snippets
+        max_chars = SEARCH_CONTEXT_TOKENS * 4 // (DEEP_SEARCH_PAGES + 1)
+        enriched = []
+        for result in ranked:
+            page_text = pages.get(result["href"], "")
+            if len(page_text) > len(result["body"]):
+                if len(page_text) > max_chars:
+                    page_text = page_text[:max_chars].rsplit(" ", 1)[0]
+                result = dict(result, body=" ".join(page_text.split()))
+            enriched.append(result)
+        return enriched
+
+    async def search(self, query: str) -> list:
+        cache_key = f"hits:{_normalize(query)}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Search cache hit for query: %s (%s)", query, self.cache.stats())
+            return cached
+        results = await self.in_flight.do(cache_key, lambda: self._search(query))
+        # Empty results are usually rate limiting, so they aren't cached
+        if results:
+            self.cache.set(cache_key, results)
+        return results
+
+    async def _search(self, query: str) -> list:
         logger.info("Performing DDG search for query: %s", query)
         if not query.strip():
             logger.info("Blank query provided. Skipping DDG search.")
-            return ""
-        def _ddg_search(q):
-            try:
-                proxy = os.getenv("DUCK_PROXY")
-                duck = DDGS(proxy=proxy) if proxy else DDGS()
-                results = duck.text(q.strip('"').strip(), max_results=10)
-                logger.info("DDG search results retrieved for query '%s': %s", q, results)
-                return results
-            except Exception as e:
-                logger.exception("Error during DDG search: %s", e)
-                return None
-        results = await asyncio.to_thread(_ddg_search, query)
-        if not results:
-            logger.info("No results returned from DDG for query: %s", query)
-            return ""
-        concat_result = f"Search query: {query}\n\n"
-        for i, result in enumerate(results, start=1):
-            title = result.get("title", "")
-            description = result.get("body", "")
-            concat_result += f"{i} -- {title}: {description}\n\n"
-        logger.info("Formatted DDG search results for query: %s", query)
-        return concat_result
+            return []
+        start = time.perf_counter()
+        jobs = {}
+        for backend in DDG_SEARCH_BACKENDS:
+            self._backend_stats(backend)
+            for variant in _query_variants(query):
+                task = asyncio.create_task(asyncio.to_thread(self._run_backend, backend, variant))
+                jobs[task] = (backend, variant)
+        done, pending = await asyncio.wait(jobs, timeout=DDG_SEARCH_DEADLINE)
+        # The worker threads can't be interrupted; they finish on their own within the DDGS timeout
+        for task in pending:
+            task.cancel()
+            backend, variant = jobs[task]
+            self._backend_stats(backend)["timeouts"] += 1
+            logger.warning("DDG %s search for '%s' missed the %.1fs deadline", backend, variant, DDG_SEARCH_DEADLINE)
+
+        # Merge in backend order so ranking ties favour the primary backend
+        results = []
+        seen_urls = set()
+        for task in jobs:
+            if task not in done or task.exception() is not None:
+                continue
+            for result in task.result():
+                if result["href"] and result["href"] in seen_urls:
+                    continue
+                seen_urls.add(result["href"])
+                results.append(result)
+        logger.info(
+            "DDG search for '%s' merged %d results from %d/%d calls in %.2fs",
+            query, len(results), len(done), len(jobs), time.perf_counter() - start
+        )
+        return results
+
+    def _run_backend(self, backend: str, query: str) -> list:
+        stats = self._backend_stats(backend)
+        start = time.perf_counter()
+        try:
+            proxy = os.getenv("DUCK_PROXY")
+            duck = DDGS(proxy=proxy, timeout=DDG_SEARCH_DEADLINE) if proxy else DDGS(timeout=DDG_SEARCH_DEADLINE)
+            if backend == "news":
+                raw = duck.news(query, max_results=DDG_MAX_RESULTS)
+            else:
+                raw = duck.text(query, max_results=DDG_MAX_RESULTS)
+        except Exception as e:
+            stats["errors"] += 1
+            logger.exception("Error during DDG %s search: %s", backend, e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats["calls"] += 1
+            stats["total_latency"] += elapsed
+            stats["max_latency"] = max(stats["max_latency"], elapsed)
+        logger.info("DDG %s results retrieved for query '%s' in %.2fs: %s", backend, query, elapsed, raw)
+        return [
+            {"title": r.get("title", ""), "body": r.get("body", ""), "href": r.get("href") or r.get("url", "")}
+            for r in raw or []
+        ]
+
+    def _backend_stats(self, backend: str) -> dict:
+        if backend not in self.backend_stats:
+            self.backend_stats[backend] = {"calls": 0, "errors": 0, "timeouts": 0, "total_latency": 0.0, "max_latency": 0.0}
+        return self.backend_stats[backend]
+
+    def search_stats(self) -> dict:
+        return {
+            backend: {
+                "calls": s["calls"],
+                "errors": s["errors"],
+                "timeouts": s["timeouts"],
+                "avg_latency": round(s["total_latency"] / s["calls"], 3) if s["calls"] else 0.0,
+                "max_latency": round(s["max_latency"], 3),
+            }
+            for backend, s in self.backend_stats.items()
+        }
 
     async def summarize_search_results(self, search_results: str) -> str:
+        cache_key = f"summary:{hashlib.sha256(search_results.encode()).hexdigest()}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Search summary cache hit (%s)", self.cache.stats())
+            return cached
+        summary = await self._summarize_search_results(search_results)
+        if summary and summary != search_results:
+            self.cache.set(cache_key, summary)
+        return summary
+
+    async def _summarize_search_results(self, search_results: str) -> str:
         logger.info("Summarizing search results")
         api_utils = self.bot.get_cog("APIUtils")
         if not api_utils:
@@ -81,7 +353,8 @@ class DuckDuckGo(commands.Cog):
                     "Please summarize the following DuckDuckGo search results. "
                     "Extract and present only the key information in a concise summary, and return just the summary.\n\n"
                     f"{search_results}"
-                )
+                ),
+                cache=True
             )
             
             summary = summary_result[0] if isinstance(summary_result, tuple) else summary_result
@@ -6,7 +6,6 @@ import logging
 from discord.ext import commands
 from discord import app_commands
 from typing import Literal
-import aiohttp
 import io
 
 logger = logging.getLogger(__name__)
@@ -76,13 +75,12 @@ class ImageGen(commands.Cog):
 
         for idx, url in enumerate(result_urls):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as resp:
-                        if resp.status != 200:
-                            logger.error("Failed to fetch image from URL: %s", url)
-                            await interaction.followup.send("Failed to retrieve image!")
-                            continue
-                        image_data = await resp.read()
+                async with self.bot.session_manager.session.get(url) as resp:
+                    if resp.status != 200:
+                        logger.error("Failed to fetch image from URL: %s", url)
+                        await interaction.followup.send("Failed to retrieve image!")
+                        continue
+                    image_data = await resp.read()
             except Exception as e:
                 logger.exception("Error downloading image from URL: %s", url)
                 await interaction.followup.send(f"Error downloading image: {e}")
@@ -1,8 +1,7 @@
+import os
 import asyncio
 import time
 import logging
-import json
-import os
 from datetime import datetime, timedelta
 import discord
 from discord import app_commands, ui
@@ -10,6 +9,12 @@ from discord.ext import commands
 from collections import defaultdict
 import pytz
 from typing import Dict, Optional
+from reminder_scheduler import ReminderScheduler
+from reminder_store import create_store, Reminder
+from reminder_index import UserReminderIndex
+from reminder_delivery import ReminderDelivery
+from reminder_recurrence import describe_rule, next_occurrence, parse_rule
+from time_parser import get_timezone, parse_time
 
 # Set up enhanced logging
 logging.basicConfig(
@@ -24,8 +29,10 @@ logger = logging.getLogger(__name__)
 
 # Constants
 MAX_REMINDERS_PER_USER = 25
-MIN_REMINDER_INTERVAL = 60  # Minimum 60 seconds between reminders
+MIN_REMINDER_INTERVAL = 300  # Repeating reminders can't fire more often than every 5 minutes
 DEFAULT_TIMEZONE = "Pacific/Auckland"  # New Zealand timezone (GMT+13)
+# Reminders missed by more than this many seconds while the bot was offline are dropped, not delivered late
+REMINDER_MAX_LATENESS = float(os.getenv("REMINDER_MAX_LATENESS", "86400"))
 
 class ReminderModal(ui.Modal, title="Set a Reminder"):
     reminder_text = ui.TextInput(
@@ -36,7 +43,7 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
     )
     
     reminder_date = ui.TextInput(
-        label="Date (YYYY-MM-DD)",
+        label="Date (YYYY-MM-DD, or e.g. tomorrow, Friday)",
         placeholder="2023-12-31",
         required=True
     )
@@ -47,6 +54,12 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
         required=True
     )
     
+    reminder_repeat = ui.TextInput(
+        label="Repeat (optional)",
+        placeholder="daily, weekdays, weekly mon,thu, monthly or cron 0 9 * * 1-5",
+        required=False
+    )
+    
     def __init__(self, cog, user_timezone):
         super().__init__()
         self.cog = cog
@@ -54,14 +67,16 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
     
     async def on_submit(self, interaction: discord.Interaction):
         try:
-            # Combine date and time inputs
+            # Combine date and time inputs; the shared parser also accepts days like "tomorrow"
             date_str = self.reminder_date.value
             time_str = self.reminder_time.value
-            datetime_str = f"{date_str} {time_str}:00"
+            datetime_str = f"{date_str} {time_str}"
             
             # Parse datetime in user's timezone
-            local_tz = pytz.timezone(self.user_timezone)
-            local_dt = local_tz.localize(datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S"))
+            local_tz = get_timezone(self.user_timezone)
+            local_dt = parse_time(datetime_str, self.user_timezone)
+            if local_dt is None:
+                raise ValueError(f"Unrecognised date and time '{datetime_str}'")
             # Convert to UTC for storage
             utc_dt = local_dt.astimezone(pytz.UTC)
             trigger_time = utc_dt.timestamp()
@@ -77,9 +92,19 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
                 )
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
             
+            # A repeating reminder starts at the first occurrence of its rule from the chosen time
+            rule = None
+            if self.reminder_repeat.value:
+                try:
+                    rule, trigger_time = self.cog._first_occurrence(self.reminder_repeat.value, local_dt, self.user_timezone)
+                except ValueError as e:
+                    return await interaction.response.send_message(embed=self.cog._invalid_repeat_embed(e), ephemeral=True)
+                local_dt = datetime.fromtimestamp(trigger_time, tz=pytz.UTC).astimezone(local_tz)
+                utc_dt = local_dt.astimezone(pytz.UTC)
+                datetime_str = local_dt.strftime("%Y-%m-%d %H:%M:%S")
+            
             # Check rate limiting for this user
-            user_reminders = [r for t, (uid, r, _) in self.cog.reminders.items() if uid == interaction.user.id]
-            if len(user_reminders) >= MAX_REMINDERS_PER_USER:
+            if self.cog.user_index.count(interaction.user.id) >= MAX_REMINDERS_PER_USER:
                 logger.warning(f"User {interaction.user.id} hit max reminders limit ({MAX_REMINDERS_PER_USER})")
                 embed = self.cog._create_embed(
                     "Too Many Reminders", 
@@ -89,7 +114,7 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
             
             # Check if there's already a reminder at this exact time for this user
-            if trigger_time in self.cog.reminders and self.cog.reminders[trigger_time][0] == interaction.user.id:
+            if self.cog.user_index.has_due(interaction.user.id, trigger_time):
                 logger.warning(f"User {interaction.user.id} attempted to set duplicate reminder at {datetime_str}")
                 embed = self.cog._create_embed(
                     "Duplicate Reminder", 
@@ -99,8 +124,7 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
             
             # All checks passed, add the reminder
-            self.cog.reminders[trigger_time] = (interaction.user.id, self.reminder_text.value, self.user_timezone)
-            self.cog._save_reminders()
+            self.cog._add_reminder(interaction.user.id, self.reminder_text.value, self.user_timezone, trigger_time, rule)
             
             # Display times in the user's timezone
             local_readable_time = local_dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -116,7 +140,7 @@ class ReminderModal(ui.Modal, title="Set a Reminder"):
             embed = self.cog._create_embed(
                 "Reminder Set ✅",
                 f"Your reminder has been set for **{local_dt.strftime('%A, %B %d at %I:%M %p')}** ({time_until}).\n\n"
-                f"**Reminder:** {self.reminder_text.value}",
+                f"**Reminder:** {self.reminder_text.value}" + (f"\n**Repeats:** {describe_rule(rule)}" if rule else ""),
                 color=discord.Color.green()
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -161,7 +185,7 @@ class TimezoneSelect(ui.Select):
         # Create options with current time in description
         options = []
         for tz_name, label in self.timezone_options:
-            tz = pytz.timezone(tz_name)
+            tz = get_timezone(tz_name)
             current_time = datetime.now(tz).strftime("%H:%M")
             options.append(
                 discord.SelectOption(
@@ -182,11 +206,10 @@ class TimezoneSelect(ui.Select):
         timezone_str = self.values[0]
         
         # Save the user's timezone preference
-        self.cog.user_timezones[interaction.user.id] = timezone_str
-        self.cog._save_user_timezones()
+        self.cog._set_user_timezone(interaction.user.id, timezone_str)
         
         # Format the current time in the user's timezone
-        local_time = datetime.now(pytz.timezone(timezone_str)).strftime("%Y-%m-%d %H:%M:%S")
+        local_time = datetime.now(get_timezone(timezone_str)).strftime("%Y-%m-%d %H:%M:%S")
         
         embed = self.cog._create_embed(
             "Timezone Set",
@@ -227,7 +250,7 @@ class CustomTimezoneModal(ui.Modal, title="Set Custom Timezone"):
             
             # Validate timezone
             try:
-                _ = pytz.timezone(timezone_str)
+                _ = get_timezone(timezone_str)
             except pytz.exceptions.UnknownTimeZoneError:
                 embed = self.cog._create_embed(
                     "Invalid Timezone",
@@ -238,11 +261,10 @@ class CustomTimezoneModal(ui.Modal, title="Set Custom Timezone"):
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
             
             # Save the user's timezone preference
-            self.cog.user_timezones[interaction.user.id] = timezone_str
-            self.cog._save_user_timezones()
+            self.cog._set_user_timezone(interaction.user.id, timezone_str)
             
             # Format the current time in the user's timezone
-            local_time = datetime.now(pytz.timezone(timezone_str)).strftime("%Y-%m-%d %H:%M:%S")
+            local_time = datetime.now(get_timezone(timezone_str)).strftime("%Y-%m-%d %H:%M:%S")
             
             embed = self.cog._create_embed(
                 "Timezone Set",
@@ -278,37 +300,33 @@ class CancelReminderView(ui.View):
         
         # Get user's preferred timezone
         user_timezone = self.cog.user_timezones.get(self.user_id, DEFAULT_TIMEZONE)
-        local_tz = pytz.timezone(user_timezone)
-        
-        # Get user's reminders
-        user_reminders = sorted(
-            [(ts, msg, tz) for ts, (uid, msg, tz) in self.cog.reminders.items() if uid == self.user_id],
-            key=lambda x: x[0]
-        )
+        local_tz = get_timezone(user_timezone)
         
-        if not user_reminders:
+        reminder_count = self.cog.user_index.count(self.user_id)
+        if not reminder_count:
             return
         
         # Calculate pages
-        total_pages = (len(user_reminders) - 1) // self.reminders_per_page + 1
+        total_pages = (reminder_count - 1) // self.reminders_per_page + 1
+        self.page = min(self.page, total_pages - 1)
         start_idx = self.page * self.reminders_per_page
-        end_idx = min(start_idx + self.reminders_per_page, len(user_reminders))
         
         # Add reminder cancel buttons for this page
-        for i in range(start_idx, end_idx):
-            ts, msg, _ = user_reminders[i]
+        for reminder_id in self.cog.user_index.page(self.user_id, start_idx, start_idx + self.reminders_per_page):
+            reminder = self.cog.reminders[reminder_id]
+            msg = reminder.message
             
             # Convert UTC timestamp to user's timezone
-            utc_dt = datetime.utcfromtimestamp(ts).replace(tzinfo=pytz.UTC)
+            utc_dt = datetime.utcfromtimestamp(reminder.due).replace(tzinfo=pytz.UTC)
             local_dt = utc_dt.astimezone(local_tz)
             time_str = local_dt.strftime("%Y-%m-%d %H:%M")
             
             # Truncate message if too long
             display_msg = msg if len(msg) <= 30 else msg[:27] + "..."
-            button_label = f"{time_str} - {display_msg}"
+            button_label = f"{'🔁 ' if reminder.recurrence else ''}{time_str} - {display_msg}"
             
-            button = ui.Button(style=discord.ButtonStyle.danger, label=button_label, custom_id=f"cancel_{ts}")
-            button.callback = self.make_callback(ts)
+            button = ui.Button(style=discord.ButtonStyle.danger, label=button_label, custom_id=f"cancel_{reminder_id}")
+            button.callback = self.make_callback(reminder_id)
             self.add_item(button)
         
         # Add navigation buttons if needed
@@ -342,7 +360,7 @@ class CancelReminderView(ui.View):
             next_button.callback = self.next_page
             self.add_item(next_button)
     
-    def make_callback(self, timestamp):
+    def make_callback(self, reminder_id):
         async def callback(interaction: discord.Interaction):
             if interaction.user.id != self.user_id:
                 embed = self.cog._create_embed(
@@ -353,8 +371,7 @@ class CancelReminderView(ui.View):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
             
-            self.cog.reminders.pop(timestamp, None)
-            self.cog._save_reminders()
+            self.cog._remove_reminders([reminder_id])
             
             # Re-render the view with updated buttons
             self._update_buttons()
@@ -400,8 +417,7 @@ class CancelReminderView(ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
             
-        user_reminders = [r for t, (uid, r, _) in self.cog.reminders.items() if uid == self.user_id]
-        total_pages = (len(user_reminders) - 1) // self.reminders_per_page + 1
+        total_pages = (self.cog.user_index.count(self.user_id) - 1) // self.reminders_per_page + 1
         
         self.page = min(total_pages - 1, self.page + 1)
         self._update_buttons()
@@ -410,14 +426,17 @@ class CancelReminderView(ui.View):
 class Reminders(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.reminders = {}  # {timestamp: (user_id, message, timezone)}
+        self.reminders: Dict[int, Reminder] = {}  # {reminder_id: Reminder}
+        self._next_id = 1
         self.user_timezones = {}  # {user_id: timezone_string}
         self.task = None
-        self.reminders_file = "reminders.json"
-        self.timezones_file = "user_timezones.json"
-        self.dm_failed_users = set()  # Track users with failed DMs
-        self._load_user_timezones()
-        self._load_reminders()
+        self.catch_up_task = None
+        self._overdue = []  # IDs of reminders that came due while the bot was offline
+        self.delivery = ReminderDelivery(bot, self._build_reminder_embed)
+        self.scheduler = ReminderScheduler()
+        self.store = create_store()
+        self.user_index = UserReminderIndex()
+        self._pending_writes = set()
 
     def _create_embed(self, title, description, color=discord.Color.blue()):
         """Create a standardized embed for responses"""
@@ -428,80 +447,104 @@ class Reminders(commands.Cog):
         )
         return embed
 
-    def _load_user_timezones(self):
-        """Load user timezones from disk"""
-        if os.path.exists(self.timezones_file):
-            try:
-                with open(self.timezones_file, 'r') as f:
-                    # User IDs need to be converted from strings to integers
-                    data = json.load(f)
-                    self.user_timezones = {
-                        int(uid): tz for uid, tz in data.items()
-                    }
-                logger.info(f"Loaded {len(self.user_timezones)} user timezone preferences")
-            except Exception as e:
-                logger.error(f"Failed to load user timezones: {e}", exc_info=True)
-                self.user_timezones = {}
-        else:
-            self.user_timezones = {}
-
-    def _save_user_timezones(self):
-        """Save user timezones to disk"""
+    async def _load(self):
+        """Load timezones and reminders from the store"""
+        await self.store.open()
+        try:
+            self.user_timezones = await self.store.load_timezones()
+            logger.info(f"Loaded {len(self.user_timezones)} user timezone preferences")
+        except Exception as e:
+            logger.error(f"Failed to load user timezones: {e}", exc_info=True)
         try:
-            # Convert the dictionary to a format that can be JSON serialized
-            data = {
-                str(uid): tz for uid, tz in self.user_timezones.items()
-            }
-            with open(self.timezones_file, 'w') as f:
-                json.dump(data, f)
-            logger.info(f"Saved {len(self.user_timezones)} user timezone preferences")
+            reminders, self._next_id = await self.store.load_reminders()
+            self.reminders = {r.id: r for r in reminders}
+            logger.info(f"Loaded {len(self.reminders)} reminders from the store")
         except Exception as e:
-            logger.error(f"Failed to save user timezones: {e}", exc_info=True)
+            logger.error(f"Failed to load reminders: {e}", exc_info=True)
 
-    def _load_reminders(self):
-        """Load reminders from disk"""
-        if os.path.exists(self.reminders_file):
-            try:
-                with open(self.reminders_file, 'r') as f:
-                    # JSON can't store numbers as keys, so we convert back from strings
-                    data = json.load(f)
-                    self.reminders = {
-                        float(ts): (int(uid), msg, tz) 
-                        for ts, (uid, msg, tz) in data.items()
-                    }
-                logger.info(f"Loaded {len(self.reminders)} reminders from disk")
-                
-                # Clean up past reminders that might have been missed while the bot was offline
-                now = time.time()
-                expired = [ts for ts in self.reminders if float(ts) <= now]
-                for ts in expired:
-                    logger.warning(f"Removing expired reminder from load: {datetime.utcfromtimestamp(float(ts))}")
-                    self.reminders.pop(float(ts), None)
-                
-                if expired:
-                    self._save_reminders()
-                    logger.info(f"Cleaned up {len(expired)} expired reminders")
-                
-            except Exception as e:
-                logger.error(f"Failed to load reminders: {e}", exc_info=True)
-                self.reminders = {}
-        else:
-            self.reminders = {}
+        now = time.time()
+        expired = []
+        for r in sorted(self.reminders.values(), key=lambda r: r.due):
+            self.user_index.add(r.user_id, r.due, r.id)
+            if r.due > now:
+                self.scheduler.schedule(r.id, r.due)
+            elif now - r.due <= REMINDER_MAX_LATENESS:
+                # Missed while the bot was offline; delivered late once it's connected
+                self._overdue.append(r.id)
+            elif not (r.recurrence and self._reschedule(r, now)):
+                # Too stale to be useful; repeating ones skip ahead to their next occurrence instead
+                logger.warning(f"Removing expired reminder {r.id} from load: {datetime.utcfromtimestamp(r.due)}")
+                expired.append(r.id)
+        if expired:
+            self._remove_reminders(expired)
+            logger.info(f"Cleaned up {len(expired)} expired reminders")
+
+    def _persist(self, coro):
+        """Run a store write in the background; cog_unload waits for outstanding ones"""
+        task = asyncio.create_task(coro)
+        self._pending_writes.add(task)
+        task.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, task):
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to persist reminder change: {task.exception()}", exc_info=task.exception())
+
+    def _set_user_timezone(self, user_id, timezone_str):
+        self.user_timezones[user_id] = timezone_str
+        self._persist(self.store.set_timezone(user_id, timezone_str))
 
-    def _save_reminders(self):
-        """Save reminders to disk"""
+    def _add_reminder(self, user_id, message, user_tz, due, recurrence=None) -> Reminder:
+        """Create a reminder, schedule it and persist it"""
+        reminder = Reminder(self._next_id, user_id, message, user_tz, due, time.time(), recurrence)
+        self._next_id += 1
+        self.reminders[reminder.id] = reminder
+        self.user_index.add(user_id, due, reminder.id)
+        self.scheduler.schedule(reminder.id, due)
+        self._persist(self.store.save_reminder(reminder))
+        return reminder
+
+    def _remove_reminders(self, reminder_ids):
+        """Drop reminders from memory and the schedule, and persist the change"""
+        reminder_ids = list(reminder_ids)
+        for reminder_id in reminder_ids:
+            self.scheduler.cancel(reminder_id)
+            self._forget(reminder_id)
+        self._persist(self.store.delete_reminders(reminder_ids))
+
+    def _reschedule(self, reminder, after) -> bool:
+        """Move a repeating reminder to its next occurrence after ``after``; False if the rule has none"""
         try:
-            # Convert the dictionary to a format that can be JSON serialized
-            # JSON keys must be strings, so convert the timestamps
-            data = {
-                str(ts): [uid, msg, tz] 
-                for ts, (uid, msg, tz) in self.reminders.items()
-            }
-            with open(self.reminders_file, 'w') as f:
-                json.dump(data, f)
-            logger.info(f"Saved {len(self.reminders)} reminders to disk")
-        except Exception as e:
-            logger.error(f"Failed to save reminders: {e}", exc_info=True)
+            due = next_occurrence(reminder.recurrence, reminder.timezone, after)
+        except ValueError as e:
+            logger.warning(f"Reminder {reminder.id} will not repeat again: {e}")
+            return False
+        self.user_index.remove(reminder.user_id, reminder.due, reminder.id)
+        reminder.due = due
+        self.user_index.add(reminder.user_id, due, reminder.id)
+        self.scheduler.schedule(reminder.id, due)
+        self._persist(self.store.save_reminder(reminder))
+        return True
+
+    def _first_occurrence(self, repeat, local_dt, user_timezone):
+        """Canonical rule for the user's repeat text and its first occurrence at or after ``local_dt``"""
+        rule = parse_rule(repeat, local_dt, MIN_REMINDER_INTERVAL)
+        return rule, next_occurrence(rule, user_timezone, local_dt.timestamp() - 1)
+
+    def _invalid_repeat_embed(self, error):
+        return self._create_embed(
+            "Invalid Repeat",
+            f"{error}.\n\nUse `daily`, `weekdays`, `weekly`, `weekly mon,thu`, `monthly`, "
+            f"or a cron expression such as `cron 0 9 * * 1-5`.",
+            color=discord.Color.red()
+        )
+
+    def _forget(self, reminder_id) -> Optional[Reminder]:
+        """Drop a reminder from memory and the per-user index"""
+        reminder = self.reminders.pop(reminder_id, None)
+        if reminder:
+            self.user_index.remove(reminder.user_id, reminder.due, reminder.id)
+        return reminder
 
     def _format_time_until(self, target_dt):
         """Format the time difference between now and target datetime in a human-readable format"""
@@ -589,73 +632,80 @@ class Reminders(commands.Cog):
         else:
             return f"{months} month{'s' if months != 1 else ''} ago"
 
+    def _build_reminder_embed(self, reminder: Reminder, late: bool = False) -> discord.Embed:
+        embed = self._create_embed(
+            "Reminder ⏰",
+            f"**{reminder.message}**",
+            color=discord.Color.gold()
+        )
+        # Reminders migrated from the timestamp-keyed format don't know when they were set
+        if reminder.created_at is not None:
+            user_timezone = get_timezone(reminder.timezone)
+            reminder_set_time_local = datetime.fromtimestamp(reminder.created_at, tz=pytz.UTC).astimezone(user_timezone)
+            time_since = self._format_time_since(reminder_set_time_local)
+            readable_set_date = reminder_set_time_local.strftime("%Y-%m-%d at %I:%M %p")
+            embed.description += f"\n\nSet {time_since} on {readable_set_date}"
+        if reminder.recurrence:
+            embed.description += f"\n🔁 Repeats {describe_rule(reminder.recurrence)}"
+        if late:
+            due_local = datetime.fromtimestamp(reminder.due, tz=pytz.UTC).astimezone(get_timezone(reminder.timezone))
+            embed.description += (
+                f"\n\n⌛ **Late:** this was due {self._format_time_since(due_local)} "
+                f"({due_local.strftime('%Y-%m-%d at %I:%M %p')}), while the bot was offline"
+            )
+        return embed
+
     async def cog_load(self):
+        await self._load()
+        self.delivery.start()
         self.task = asyncio.create_task(self.reminder_loop())
+        if self._overdue:
+            self.catch_up_task = asyncio.create_task(self._catch_up(self._overdue))
+            self._overdue = []
         logger.info("Reminder Cog loaded and reminder loop started")
 
+    async def _catch_up(self, reminder_ids):
+        """Deliver reminders that came due while the bot was offline, once it can reach Discord.
+
+        They go through the normal rate-limited delivery pool, queued behind reminders due now.
+        """
+        await self.bot.wait_until_ready()
+        logger.info(f"Catching up on {len(reminder_ids)} reminders missed while offline")
+        self._fire(reminder_ids, time.time(), catch_up=True)
+
+    def _fire(self, reminder_ids, now, catch_up=False):
+        """Hand reminders to the delivery workers; repeating ones move on to their next occurrence"""
+        now_readable = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        finished = []
+        for reminder_id in reminder_ids:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is None:  # Cancelled while waiting to catch up
+                continue
+            trigger_readable = datetime.utcfromtimestamp(reminder.due).strftime("%Y-%m-%d %H:%M:%S")
+            logger.info(f"Triggering reminder {reminder.id} - User: {reminder.user_id}, Current time: {now_readable}, Reminder time: {trigger_readable} UTC, Text: '{reminder.message}'")
+            if reminder.recurrence:
+                # Deliver a copy while the original moves to its next occurrence
+                self.delivery.submit(Reminder.from_row(reminder.to_row()), catch_up)
+                if self._reschedule(reminder, max(now, reminder.due)):
+                    continue
+            else:
+                self.delivery.submit(reminder, catch_up)
+            # Finished reminders leave the store up front so skipped deliveries don't linger
+            self._forget(reminder_id)
+            finished.append(reminder_id)
+        if finished:
+            self._persist(self.store.delete_reminders(finished))
+
     async def reminder_loop(self):
-        """Main loop to check and trigger reminders"""
+        """Main loop to trigger reminders as they come due"""
         logger.info("Reminder loop started")
         while True:
             try:
+                # Sleeps until the next reminder is due, or until one is added or cancelled
+                await self.scheduler.wait()
+                # The delivery workers send them, so a burst doesn't hold up the schedule
                 current_time = time.time()
-                now_readable = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Find reminders that need to be triggered
-                to_trigger = []
-                for trigger_time, (user_id, message, user_tz) in self.reminders.items():
-                    if trigger_time <= current_time:
-                        to_trigger.append((trigger_time, user_id, message, user_tz))
-                
-                # Process triggered reminders
-                for trigger_time, user_id, message, user_tz in to_trigger:
-                    trigger_readable = datetime.utcfromtimestamp(trigger_time).strftime("%Y-%m-%d %H:%M:%S")
-                    logger.info(f"Triggering reminder - User: {user_id}, Current time: {now_readable}, Reminder time: {trigger_readable} UTC, Text: '{message}'")
-                    
-                    try:
-                        # Skip sending DM if user previously had DM failures
-                        if user_id in self.dm_failed_users:
-                            logger.warning(f"Skipping DM for user {user_id} (previous failures)")
-                            continue
-                            
-                        user = await self.bot.fetch_user(user_id)
-                        
-                        # Format reminder time in user's timezone
-                        trigger_time_utc = datetime.utcfromtimestamp(trigger_time).replace(tzinfo=pytz.UTC)
-                        user_timezone = pytz.timezone(user_tz)
-                        local_time = trigger_time_utc.astimezone(user_timezone).strftime("%Y-%m-%d %H:%M:%S")
-                        
-                        # Create embed for the reminder with info about when it was set
-                        # Use the user's timezone for displaying set time
-                        reminder_set_time_utc = datetime.utcfromtimestamp(trigger_time - 10).replace(tzinfo=pytz.UTC)  # Approximate time when reminder was set
-                        reminder_set_time_local = reminder_set_time_utc.astimezone(user_timezone)
-                        time_since = self._format_time_since(reminder_set_time_local)
-                        readable_set_date = reminder_set_time_local.strftime("%Y-%m-%d at %I:%M %p")
-                        
-                        embed = self._create_embed(
-                            "Reminder ⏰",
-                            f"**{message}**\n\nSet {time_since} on {readable_set_date}",
-                            color=discord.Color.gold()
-                        )
-                        await user.send(embed=embed)
-                        logger.info(f"Successfully sent reminder to user {user_id} ({user.name})")
-                        
-                    except discord.Forbidden:
-                        logger.warning(f"Cannot send DM to user {user_id} (forbidden - likely has DMs disabled)")
-                        self.dm_failed_users.add(user_id)  # Track this user as having DM issues
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to send reminder to user {user_id}: {e}", exc_info=True)
-                    
-                    # Remove the triggered reminder
-                    self.reminders.pop(trigger_time, None)
-                
-                # Save if any reminders were triggered
-                if to_trigger:
-                    self._save_reminders()
-                
-                # Sleep briefly before next check
-                await asyncio.sleep(1)
+                self._fire(self.scheduler.pop_due(current_time), current_time)
                 
             except Exception as e:
                 logger.error(f"Error in reminder loop: {e}", exc_info=True)
@@ -670,16 +720,16 @@ class Reminders(commands.Cog):
     @reminder.command(name="add", description="Add a reminder with natural language time")
     @app_commands.describe(
         reminder_text="What you want to be reminded about",
-        time="When you want to be reminded (e.g., 'tomorrow at 3pm', 'in 2 hours', 'Friday 9am')"
+        time="When you want to be reminded (e.g., 'tomorrow at 3pm', 'in 2 hours', 'Friday 9am')",
+        repeat="Repeat it: daily, weekdays, weekly, weekly mon,thu, monthly, or cron 0 9 * * 1-5"
     )
-    async def add_reminder(self, interaction: discord.Interaction, reminder_text: str, time: str = None):
+    async def add_reminder(self, interaction: discord.Interaction, reminder_text: str, time: str = None, repeat: str = None):
         """Add a reminder with natural language time parsing"""
         # Log the attempt
         logger.info(f"User {interaction.user.id} ({interaction.user.name}) is adding a reminder with text: '{reminder_text}' and time: '{time}'")
         
         # Check if user has too many reminders
-        user_reminders = [r for t, (uid, r, _) in self.reminders.items() if uid == interaction.user.id]
-        if len(user_reminders) >= MAX_REMINDERS_PER_USER:
+        if self.user_index.count(interaction.user.id) >= MAX_REMINDERS_PER_USER:
             logger.warning(f"User {interaction.user.id} hit max reminders limit ({MAX_REMINDERS_PER_USER})")
             embed = self._create_embed(
                 "Too Many Reminders", 
@@ -690,137 +740,23 @@ class Reminders(commands.Cog):
         
         # Get user's timezone
         user_timezone = self.get_user_timezone(interaction.user.id)
-        local_tz = pytz.timezone(user_timezone)
+        local_tz = get_timezone(user_timezone)
         
         # If time is provided, try to parse it directly
         if time:
-            await self._process_natural_language_time(interaction, reminder_text, time, user_timezone)
+            await self._process_natural_language_time(interaction, reminder_text, time, user_timezone, repeat)
         else:
             # If no time is provided, use the modal with improved defaults
-            await self._show_reminder_modal(interaction, reminder_text, user_timezone)
+            await self._show_reminder_modal(interaction, reminder_text, user_timezone, repeat)
             
-    async def _process_natural_language_time(self, interaction, reminder_text, time_str, user_timezone):
+    async def _process_natural_language_time(self, interaction, reminder_text, time_str, user_timezone, repeat=None):
         """Process natural language time input"""
         try:
             # Get current time in user's timezone to use as reference
-            local_tz = pytz.timezone(user_timezone)
+            local_tz = get_timezone(user_timezone)
             now = datetime.now(local_tz)
             
-            # Handle special keywords
-            time_str = time_str.lower().strip()
-            target_dt = None
-            
-            # Handle common time expressions
-            if time_str == "tomorrow":
-                target_dt = (now + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
-            elif time_str == "tonight":
-                target_dt = now.replace(hour=20, minute=0, second=0, microsecond=0)
-            elif time_str == "noon" or time_str == "midday":
-                if now.hour >= 12:  # If it's already past noon, use tomorrow
-                    target_dt = (now + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
-                else:
-                    target_dt = now.replace(hour=12, minute=0, second=0, microsecond=0)
-            elif time_str == "midnight":
-                target_dt = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            elif time_str.startswith("in "):
-                # Handle "in X minutes/hours/days/weeks/months"
-                parts = time_str[3:].split()
-                if len(parts) >= 2:
-                    try:
-                        amount = int(parts[0])
-                        unit = parts[1].lower()
-                        if unit.startswith("minute"):
-                            target_dt = now + timedelta(minutes=amount)
-                        elif unit.startswith("hour"):
-                            target_dt = now + timedelta(hours=amount)
-                        elif unit.startswith("day"):
-                            target_dt = now + timedelta(days=amount)
-                        elif unit.startswith("week"):
-                            target_dt = now + timedelta(weeks=amount)
-                        elif unit.startswith("month"):
-                            # Approximate a month as 30 days
-                            target_dt = now + timedelta(days=30*amount)
-                    except ValueError:
-                        pass
-            elif "tomorrow" in time_str and ("at" in time_str or ":" in time_str):
-                # Handle "tomorrow at X:YY" or "tomorrow X:YY"
-                time_part = time_str.split("at")[-1].strip() if "at" in time_str else time_str.split("tomorrow")[-1].strip()
-                time_part = time_part.replace("am", " AM").replace("pm", " PM")
-                try:
-                    # Try different time formats
-                    time_formats = ["%I:%M %p", "%I:%M%p", "%I %p", "%H:%M"]
-                    parsed_time = None
-                    
-                    for fmt in time_formats:
-                        try:
-                            parsed_time = datetime.strptime(time_part, fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if parsed_time:
-                        tomorrow = now + timedelta(days=1)
-                        target_dt = tomorrow.replace(
-                            hour=parsed_time.hour, 
-                            minute=parsed_time.minute, 
-                            second=0, 
-                            microsecond=0
-                        )
-                except ValueError:
-                    pass
-            elif any(day in time_str.lower() for day in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]):
-                # Handle day names (e.g., "Friday at 3pm", "next Sunday")
-                day_mapping = {
-                    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, 
-                    "friday": 4, "saturday": 5, "sunday": 6
-                }
-                
-                # Determine which day was mentioned
-                target_day = None
-                for day, day_num in day_mapping.items():
-                    if day in time_str.lower():
-                        target_day = day_num
-                        break
-                
-                if target_day is not None:
-                    # Calculate days until the next occurrence of this day
-                    current_day = now.weekday()
-                    days_ahead = (target_day - current_day) % 7
-                    
-                    # Check if "next" is explicitly mentioned
-                    is_next_mentioned = "next" in time_str.lower()
-                    
-                    # Enhanced handling for day references
-                    if days_ahead == 0:  # If today is the mentioned day
-                        if is_next_mentioned or now.hour >= 12:
-                            # If "next" is mentioned or it's afternoon, interpret as next week
-                            days_ahead = 7
-                    
-                    # Default time is 9 AM
-                    target_date = now + timedelta(days=days_ahead)
-                    target_time = "9:00 AM"
-                    
-                    # Try to extract a time if specified
-                    if "at" in time_str:
-                        time_part = time_str.split("at")[-1].strip()
-                        time_part = time_part.replace("am", " AM").replace("pm", " PM")
-                        
-                        # Try different time formats
-                        time_formats = ["%I:%M %p", "%I:%M%p", "%I %p", "%H:%M"]
-                        for fmt in time_formats:
-                            try:
-                                parsed_time = datetime.strptime(time_part, fmt)
-                                target_time = parsed_time.strftime("%H:%M")
-                                break
-                            except ValueError:
-                                continue
-                    
-                    # Parse the time part
-                    try:
-                        hour, minute = map(int, target_time.split(":")[:2])
-                        target_dt = target_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                    except ValueError:
-                        pass
+            target_dt = parse_time(time_str, user_timezone, now)
             
             # If we successfully parsed the time
             if target_dt:
@@ -833,13 +769,21 @@ class Reminders(commands.Cog):
                     )
                     return await interaction.response.send_message(embed=embed, ephemeral=True)
                 
+                # A repeating reminder starts at the first occurrence of its rule from the parsed time
+                rule = None
+                if repeat:
+                    try:
+                        rule, trigger_time = self._first_occurrence(repeat, target_dt, user_timezone)
+                    except ValueError as e:
+                        return await interaction.response.send_message(embed=self._invalid_repeat_embed(e), ephemeral=True)
+                    target_dt = datetime.fromtimestamp(trigger_time, tz=pytz.UTC).astimezone(local_tz)
+                
                 # Store in UTC
                 utc_dt = target_dt.astimezone(pytz.UTC)
                 trigger_time = utc_dt.timestamp()
                 
                 # Save the reminder
-                self.reminders[trigger_time] = (interaction.user.id, reminder_text, user_timezone)
-                self._save_reminders()
+                self._add_reminder(interaction.user.id, reminder_text, user_timezone, trigger_time, rule)
                 
                 # Format for display
                 readable_time = target_dt.strftime("%A, %B %d at %I:%M %p")
@@ -851,19 +795,19 @@ class Reminders(commands.Cog):
                 embed = self._create_embed(
                     "Reminder Set ✅",
                     f"Your reminder has been set for **{readable_time}** ({time_until}).\n\n"
-                    f"**Reminder:** {reminder_text}",
+                    f"**Reminder:** {reminder_text}" + (f"\n**Repeats:** {describe_rule(rule)}" if rule else ""),
                     color=discord.Color.green()
                 )
                 await interaction.response.send_message(embed=embed, ephemeral=True)
             else:
                 # If we couldn't parse the time, show the modal
-                await self._show_reminder_modal(interaction, reminder_text, user_timezone)
+                await self._show_reminder_modal(interaction, reminder_text, user_timezone, repeat)
         except Exception as e:
             logger.error(f"Error processing natural language time: {e}", exc_info=True)
             # If there's an error, fall back to the date picker modal
-            await self._show_reminder_modal(interaction, reminder_text, user_timezone)
+            await self._show_reminder_modal(interaction, reminder_text, user_timezone, repeat)
     
-    async def _show_reminder_modal(self, interaction, reminder_text, user_timezone):
+    async def _show_reminder_modal(self, interaction, reminder_text, user_timezone, repeat=None):
         """Show the reminder modal with improved defaults"""
         # Get user's timezone
         user_timezone = self.get_user_timezone(interaction.user.id)
@@ -871,9 +815,10 @@ class Reminders(commands.Cog):
         # Create and send modal directly
         modal = ReminderModal(self, user_timezone)
         modal.reminder_text.default = reminder_text
+        modal.reminder_repeat.default = repeat
         
         # Get the user's local timezone
-        user_tz = pytz.timezone(user_timezone)
+        user_tz = get_timezone(user_timezone)
         
         # Pre-populate with tomorrow's date in user's timezone
         tomorrow = datetime.now(user_tz) + timedelta(days=1)
@@ -890,13 +835,11 @@ class Reminders(commands.Cog):
         
         user_id = interaction.user.id
         user_timezone = self.get_user_timezone(user_id)
-        local_tz = pytz.timezone(user_timezone)
+        local_tz = get_timezone(user_timezone)
         
-        user_reminders = [
-            (ts, msg, tz) for ts, (uid, msg, tz) in self.reminders.items() if uid == user_id
-        ]
+        reminder_count = self.user_index.count(user_id)
         
-        if not user_reminders:
+        if not reminder_count:
             logger.info(f"No reminders found for user {interaction.user.id}")
             embed = self._create_embed(
                 "No Reminders",
@@ -905,28 +848,28 @@ class Reminders(commands.Cog):
             )
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        # Sort reminders by time
-        user_reminders.sort(key=lambda x: x[0])
-        
-        # Format the output
+        # Only the reminders that are shown get formatted
         lines = []
-        for ts, msg, _ in user_reminders:
+        for reminder_id in self.user_index.page(user_id, 0, 5):
+            reminder = self.reminders[reminder_id]
+            msg = reminder.message
             # Convert UTC timestamp to user's timezone
-            utc_dt = datetime.utcfromtimestamp(ts).replace(tzinfo=pytz.UTC)
+            utc_dt = datetime.utcfromtimestamp(reminder.due).replace(tzinfo=pytz.UTC)
             local_dt = utc_dt.astimezone(local_tz)
             readable_time = local_dt.strftime("%A, %B %d at %I:%M %p")
             time_until = self._format_time_until(utc_dt.replace(tzinfo=None))
-            lines.append(f"⏰ **{readable_time}** ({time_until})\n> {msg}")
+            repeats = f" 🔁 {describe_rule(reminder.recurrence)}" if reminder.recurrence else ""
+            lines.append(f"⏰ **{readable_time}** ({time_until}){repeats}\n> {msg}")
         
         # Create embed for better formatting
         embed = self._create_embed(
             "Your Reminders",
-            f"You have {len(user_reminders)} upcoming reminder{'s' if len(user_reminders) != 1 else ''} (Timezone: {user_timezone})",
+            f"You have {reminder_count} upcoming reminder{'s' if reminder_count != 1 else ''} (Timezone: {user_timezone})",
             color=discord.Color.blue()
         )
         
         # Split into fields if there are many reminders
-        if len(user_reminders) <= 5:
+        if reminder_count <= 5:
             embed.description += ":\n\n" + "\n\n".join(lines)
         else:
             embed.description += f". Here are your next 5 reminders:"
@@ -936,8 +879,8 @@ class Reminders(commands.Cog):
                     value=line,
                     inline=False
                 )
-            if len(lines) > 5:
-                embed.set_footer(text=f"+ {len(lines) - 5} more reminders. Use /reminder list_all to see all.")
+            if reminder_count > 5:
+                embed.set_footer(text=f"+ {reminder_count - 5} more reminders. Use /reminder list_all to see all.")
         
         # Make this response ephemeral so only the user can see it
         await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -948,11 +891,7 @@ class Reminders(commands.Cog):
         logger.info(f"User {interaction.user.id} opening cancel reminder menu")
         
         user_id = interaction.user.id
-        user_reminders = [
-            (ts, msg) for ts, (uid, msg, _) in self.reminders.items() if uid == user_id
-        ]
-        
-        if not user_reminders:
+        if not self.user_index.count(user_id):
             logger.info(f"No reminders found for user {interaction.user.id} to cancel")
             embed = self._create_embed(
                 "No Reminders",
@@ -977,9 +916,7 @@ class Reminders(commands.Cog):
         logger.info(f"User {interaction.user.id} clearing all reminders")
         
         user_id = interaction.user.id
-        user_reminders = [
-            ts for ts, (uid, _, _) in self.reminders.items() if uid == user_id
-        ]
+        user_reminders = self.user_index.page(user_id)
         
         if not user_reminders:
             logger.info(f"No reminders found for user {interaction.user.id} to clear")
@@ -1008,9 +945,7 @@ class Reminders(commands.Cog):
                     await confirm_interaction.response.send_message(embed=embed, ephemeral=True)
                     return
                     
-                for ts in self.user_reminders:
-                    self.cog.reminders.pop(ts, None)
-                self.cog._save_reminders()
+                self.cog._remove_reminders(self.user_reminders)
                 
                 logger.info(f"User {interaction.user.id} cleared {len(self.user_reminders)} reminders")
                 embed = self.cog._create_embed(
@@ -1053,13 +988,11 @@ class Reminders(commands.Cog):
         
         user_id = interaction.user.id
         user_timezone = self.get_user_timezone(user_id)
-        local_tz = pytz.timezone(user_timezone)
+        local_tz = get_timezone(user_timezone)
         
-        user_reminders = [
-            (ts, msg, tz) for ts, (uid, msg, tz) in self.reminders.items() if uid == user_id
-        ]
+        next_id = self.user_index.first(user_id)
         
-        if not user_reminders:
+        if next_id is None:
             logger.info(f"No reminders found for user {interaction.user.id}")
             embed = self._create_embed(
                 "No Reminders",
@@ -1068,19 +1001,19 @@ class Reminders(commands.Cog):
             )
             return await interaction.response.send_message(embed=embed, ephemeral=True)
         
-        # Get the earliest reminder
-        next_reminder = min(user_reminders, key=lambda x: x[0])
-        ts, msg, _ = next_reminder
+        reminder = self.reminders[next_id]
+        msg = reminder.message
         
         # Convert UTC time to user's timezone
-        utc_dt = datetime.utcfromtimestamp(ts).replace(tzinfo=pytz.UTC)
+        utc_dt = datetime.utcfromtimestamp(reminder.due).replace(tzinfo=pytz.UTC)
         local_dt = utc_dt.astimezone(local_tz)
         readable_time = local_dt.strftime("%A, %B %d at %I:%M %p")
         time_until = self._format_time_until(utc_dt.replace(tzinfo=None))
         
         embed = self._create_embed(
             "Your Next Reminder ⏰",
-            f"**{readable_time}** ({time_until})\n\n> {msg}",
+            f"**{readable_time}** ({time_until})\n\n> {msg}"
+            + (f"\n\n🔁 Repeats {describe_rule(reminder.recurrence)}" if reminder.recurrence else ""),
             color=discord.Color.green()
         )
         
@@ -1115,7 +1048,7 @@ class Reminders(commands.Cog):
         
         try:
             # Format the current time in the user's timezone
-            local_tz = pytz.timezone(user_timezone)
+            local_tz = get_timezone(user_timezone)
             local_time = datetime.now(local_tz).strftime("%Y-%m-%d %H:%M:%S")
             
             embed = self._create_embed(
@@ -1136,11 +1069,16 @@ class Reminders(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
     async def cog_unload(self):
-        logger.info("Reminder Cog unloading, saving reminders...")
+        logger.info("Reminder Cog unloading, flushing pending writes...")
         if self.task:
             self.task.cancel()
-        self._save_reminders()
-        self._save_user_timezones()
+        if self.catch_up_task:
+            self.catch_up_task.cancel()
+        await self.delivery.stop()
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+        await self.store.close()
+        logger.info(f"Reminder store stats: {self.store.stats()}")
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Reminders(bot))
@@ -3,6 +3,7 @@ import asyncio
 import logging
 import discord
 from discord.ext import commands
+from http_session import HTTPSessionManager
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,8 +29,11 @@ async def load_cogs():
             logging.info(f"Loaded cog: {filename}")
 
 async def main():
-    await load_cogs()
-    await bot.start(os.getenv("BOT_API_TOKEN"))
+    async with HTTPSessionManager() as session_manager:
+        bot.session_manager = session_manager
+        async with bot:
+            await load_cogs()
+            await bot.start(os.getenv("BOT_API_TOKEN"))
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,9 +1,16 @@
+import os
+import time
 import discord
 from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Discord allows roughly 5 message edits per 5 seconds per channel, so stay under that
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+# Leave headroom below the 4096 description limit for the footer on the last embed
+STREAM_CHUNK_SIZE = 3900
+
 def get_embed_total_length(embed: discord.Embed) -> int:
     logger.debug("Calculating total length of embed.")
     total = 0
@@ -83,4 +90,73 @@ async def send_embed(destination, embed: discord.Embed, *, reply_to: Optional[di
             logger.info("Embed sent via interaction followup.")
         else:
             await destination.send(content=content, embed=embed)
-            logger.info("Embed sent to destination.")
\ No newline at end of file
+            logger.info("Embed sent to destination.")
+
+class StreamingEmbedRenderer:
+    """Progressively renders a streamed reply, editing messages at a throttled cadence.
+
+    Text that no longer fits in one embed rolls over into a new message. The first
+    message replaces the deferred interaction response, or replies to ``reply_to``.
+    """
+
+    def __init__(self, *, color, reply_to: Optional[discord.Message] = None, interaction: Optional[discord.Interaction] = None, content: Optional[str] = None, edit_interval: float = STREAM_EDIT_INTERVAL):
+        self.color = color
+        self.reply_to = reply_to
+        self.interaction = interaction
+        self.content = content
+        self.edit_interval = edit_interval
+        self.text = ""
+        self.first_visible_at: Optional[float] = None
+        self._messages = []
+        self._rendered = []
+        self._last_flush = 0.0
+
+    async def push(self, delta: str) -> None:
+        if not delta:
+            return
+        self.text += delta
+        if time.monotonic() - self._last_flush >= self.edit_interval:
+            await self._flush()
+
+    async def finish(self, footer: Optional[str] = None) -> None:
+        await self._flush(footer=footer)
+        logger.info("Streamed reply finished in %d message(s).", len(self._messages))
+
+    def _chunks(self) -> List[str]:
+        text = self.text
+        return [text[i:i+STREAM_CHUNK_SIZE] for i in range(0, len(text), STREAM_CHUNK_SIZE)] or [""]
+
+    async def _flush(self, footer: Optional[str] = None) -> None:
+        self._last_flush = time.monotonic()
+        if not self.text.strip() and footer is None:
+            return
+        chunks = self._chunks()
+        for idx, chunk in enumerate(chunks):
+            is_last = idx == len(chunks) - 1
+            if idx < len(self._rendered) and self._rendered[idx] == chunk and not (is_last and footer):
+                continue
+            embed = discord.Embed(title="", description=chunk, color=self.color)
+            if is_last and footer:
+                embed.set_footer(text=footer)
+            try:
+                if idx < len(self._messages):
+                    await self._messages[idx].edit(embed=embed)
+                    self._rendered[idx] = chunk
+                else:
+                    self._messages.append(await self._send_new(embed, first=(idx == 0)))
+                    self._rendered.append(chunk)
+                    if self.first_visible_at is None:
+                        self.first_visible_at = time.time()
+                        logger.debug("First streamed content visible.")
+            except discord.HTTPException as e:
+                logger.warning("Failed to render streamed embed part %d: %s", idx, e)
+                return
+
+    async def _send_new(self, embed: discord.Embed, first: bool):
+        if self.reply_to is not None:
+            if first:
+                return await self.reply_to.reply(content=self.content, embed=embed)
+            return await self.reply_to.channel.send(embed=embed)
+        if first:
+            return await self.interaction.edit_original_response(content=self.content, embed=embed)
+        return await self.interaction.followup.send(embed=embed, wait=True)
@@ -1,13 +1,21 @@
+import os
 import time
+import asyncio
 import logging
 import openai
 import discord
 import aiohttp
-from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from resilience import CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
-async def process_attachments(prompt: str, attachments: list, is_slash: bool = False) -> (str, str):
+# Overall deadline for one chat reply, and the budget for the web search stage within it
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "300"))
+SEARCH_STAGE_TIMEOUT = float(os.getenv("SEARCH_STAGE_TIMEOUT", "20"))
+# Part of the deadline the primary model may not use when there is a fallback model to try
+CHAT_FALLBACK_RESERVE = float(os.getenv("CHAT_FALLBACK_RESERVE", "90"))
+
+async def process_attachments(prompt: str, attachments: list, session: aiohttp.ClientSession, is_slash: bool = False) -> (str, str):
     image_url = None
     final_prompt = prompt
     if attachments:
@@ -19,12 +27,11 @@ async def process_attachments(prompt: str, attachments: list, is_slash: bool = F
                         file_bytes = await att.read()
                         final_prompt =  file_bytes.decode("utf-8")
                     else:
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(att.url) as response:
-                                if response.status == 200:
-                                    final_prompt = await response.text()
-                                else:
-                                    logger.warning(f"Failed to download attachment: {att.url} with status {response.status}")
+                        async with session.get(att.url) as response:
+                            if response.status == 200:
+                                final_prompt = await response.text()
+                            else:
+                                logger.warning(f"Failed to download attachment: {att.url} with status {response.status}")
                 except Exception as e:
                     logger.exception("Error processing text attachment: %s", e)
             elif filename.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")) and not image_url:
@@ -42,58 +49,119 @@ async def perform_chat_query(
     reply_footer: str = None,
     api: str = "openai",
     use_fun: bool = False,
-    web_search: bool = False
+    web_search: str = "off",
+    renderer=None,
+    use_cache: bool = False,
+    user_id: int = None,
+    max_concurrency: int = None,
+    on_queue_update=None,
+    fallback_model: str = None,
+    fallback_api: str = "openai"
 ) -> (str, float, str):
     start_time = time.time()
     original_prompt = prompt
     
-    ddg_summary = None
-    if duck_cog and web_search:
+    guild_id = channel.guild.id if getattr(channel, "guild", None) else None
+    if isinstance(web_search, bool):
+        web_search = "on" if web_search else "off"
+    searched = duck_cog is not None and duck_cog.should_search(original_prompt, web_search, guild_id)
+
+    search_context = None
+    if searched:
         try:
-            search_query = await duck_cog.extract_search_query(original_prompt)
-            if search_query:
-                ddg_summary = await duck_cog.perform_ddg_search(search_query)
-                if ddg_summary:
-                    summary_result = await duck_cog.summarize_search_results(ddg_summary)
-                    summary = summary_result[0] if isinstance(summary_result, tuple) else summary_result
-                    if summary:
-                        prompt = original_prompt + "\n\nSummary of Relevant Web Search Results:\n" + summary
+            search_context = await asyncio.wait_for(
+                duck_cog.build_web_context(original_prompt, guild_id, learn=web_search == "auto"), SEARCH_STAGE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Web search took longer than %ss; answering without it", SEARCH_STAGE_TIMEOUT)
         except Exception as e:
             logger.exception("Error during DuckDuckGo search: %s", e)
     
-    if ddg_summary:
-        summary_text = ddg_summary[0] if isinstance(ddg_summary, tuple) else ddg_summary
-        prompt = original_prompt + "\n\nSummary of Relevant Web Search Results:\n" + summary_text
+    if search_context:
+        prompt = original_prompt + "\n\nRelevant Web Search Results:\n" + search_context
+
+    async def run_request(request_model: str, request_api: str, concurrency: int, budget: float):
+        result, stats = await api_cog.send_request(
+            model=request_model,
+            message_content=prompt,
+            reference_message=reference_message,
+            image_url=image_url,
+            api=request_api,
+            use_emojis=True if use_fun else False,
+            emoji_channel=channel,
+            use_fun=use_fun,
+            stream=renderer is not None,
+            cache=use_cache,
+            guild_id=guild_id,
+            user_id=user_id,
+            max_concurrency=concurrency,
+            on_queue_update=on_queue_update,
+            timeout=budget
+        )
+        if renderer is not None:
+            async for delta in result:
+                await renderer.push(delta)
+            result = renderer.text
+        return result, stats
+
+    def remaining(reserve: float = 0.0) -> float:
+        return max(1.0, CHAT_DEADLINE - (time.time() - start_time) - reserve)
+
+    async def run_fallback(error: Exception):
+        logger.warning("Request to %s failed (%s); falling back to %s", model, error, fallback_model)
+        return await asyncio.wait_for(run_request(fallback_model, fallback_api, None, remaining()), remaining())
+
+    # Falling back is only possible while nothing has been shown to the user yet
+    def can_fall_back() -> bool:
+        return bool(fallback_model) and (renderer is None or not renderer.text)
+
+    used_fallback = False
+    try:
+        # The primary model's retries must give up in time for the fallback to have a go
+        primary_budget = remaining(CHAT_FALLBACK_RESERVE if fallback_model else 0.0)
+        result, stats = await asyncio.wait_for(run_request(model, api, max_concurrency, primary_budget), remaining())
+    except asyncio.TimeoutError as e:
+        if can_fall_back():
+            result, stats = await run_fallback(e)
+            used_fallback = True
+        elif renderer is not None and renderer.text:
+            # Keep what was streamed rather than throwing it away
+            logger.warning("Reply from %s hit the %ss deadline; returning partial output", model, CHAT_DEADLINE)
+            await renderer.push(f"\n\n*(Response cut off after {CHAT_DEADLINE:.0f} seconds)*")
+            result, stats = renderer.text, {}
+        else:
+            logger.exception("Error in perform_chat_query: %s", e)
+            raise
+    except (CircuitOpenError, openai.APIError) as e:
+        if not can_fall_back():
+            logger.exception("Error in perform_chat_query: %s", e)
+            raise
+        result, stats = await run_fallback(e)
+        used_fallback = True
 
     try:
-        async for attempt in AsyncRetrying(
-            retry=retry_if_exception_type((openai.APIError, openai.APIConnectionError, openai.RateLimitError)),
-            wait=wait_exponential(min=1, max=10),
-            stop=stop_after_attempt(5),
-            reraise=True,
-        ):
-            with attempt:
-                result, stats = await api_cog.send_request(
-                    model=model,
-                    message_content=prompt,
-                    reference_message=reference_message,
-                    image_url=image_url,
-                    api=api,
-                    use_emojis=True if use_fun else False,
-                    emoji_channel=channel,
-                    use_fun=use_fun
-                )
-                break
+        if renderer is not None:
+            if not result:
+                result = "I'm sorry, I received an empty response from the API. Please try again."
+                await renderer.push(result)
         elapsed = round(time.time() - start_time, 2)
 
         footer_first_line = [reply_footer]
         
         if use_fun:
             footer_first_line.append("Fun Mode")
-        if web_search:
-            footer_first_line.append("Web Search")
+        if searched:
+            footer_first_line.append("Web Search (Auto)" if web_search == "auto" else "Web Search")
+        if stats and stats.get("cached"):
+            footer_first_line.append("Cached")
+        if used_fallback:
+            footer_first_line.append(f"Fallback: {fallback_model}")
             
         footer_second_line = []
+
+        if renderer is not None and renderer.first_visible_at is not None:
+            first_token = round(renderer.first_visible_at - start_time, 2)
+            footer_second_line.append(f"{first_token}s to first token")
         
         if stats:
             tokens_prompt = stats.get('tokens_prompt', 0)
@@ -106,10 +174,13 @@ async def perform_chat_query(
             footer_second_line.append(f"{prompt_tokens_str} input tokens")
             footer_second_line.append(f"{tokens_completion_str} output tokens")
             
-            if total_cost:
+            if total_cost or stats.get("cached"):
                 footer_second_line.append(f"${total_cost:.2f}")
         
-        footer_second_line.append(f"{elapsed} seconds")
+        if renderer is not None:
+            footer_second_line.append(f"{elapsed}s total")
+        else:
+            footer_second_line.append(f"{elapsed} seconds")
         
         first_line = " | ".join(footer_first_line)
         second_line = " | ".join(footer_second_line)
@@ -0,0 +1,51 @@
+import io
+import os
+import logging
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Vision models downscale to fit 2048x2048 and then to 768px on the short side,
+# so anything larger only inflates the request body
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_side: int = IMAGE_MAX_SIDE,
+    max_short_side: int = IMAGE_MAX_SHORT_SIDE,
+    quality: int = IMAGE_QUALITY,
+    image_format: str = IMAGE_FORMAT
+) -> (bytes, str):
+    """Downscale, strip metadata and re-encode an image.
+
+    Runs in a worker process, so it must stay a plain module-level function.
+    Returns the encoded bytes and their MIME type.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Animated images are sent as their first frame
+        img.seek(0)
+        # Apply the EXIF orientation before the metadata is dropped
+        img = ImageOps.exif_transpose(img)
+
+        width, height = img.size
+        scale = min(1.0, max_side / max(width, height), max_short_side / min(width, height))
+        if scale < 1.0:
+            img = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+
+        if image_format == "JPEG" and img.mode != "RGB":
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+
+        out = io.BytesIO()
+        # Saving without exif/icc arguments drops the original metadata
+        img.save(out, format=image_format, quality=quality, optimize=True)
+
+    return out.getvalue(), _MIME_TYPES.get(image_format, "image/jpeg")
@@ -0,0 +1,156 @@
+import time
+import codecs
+import asyncio
+import logging
+from html.parser import HTMLParser
+from typing import Dict, List
+import aiohttp
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; discord-openai-bot)"
+READ_CHUNK_SIZE = 16384
+# Lines shorter than this (in words) are mostly menus, buttons and bylines
+MIN_LINE_WORDS = 6
+
+_SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer",
+    "aside", "form", "button", "select", "figure",
+})
+_BLOCK_TAGS = frozenset({
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "br", "tr", "td", "pre",
+    "blockquote", "dd", "dt", "h1", "h2", "h3", "h4", "h5", "h6",
+})
+_MAIN_TAGS = frozenset({"article", "main"})
+
+class _TextExtractor(HTMLParser):
+    """Incremental HTML-to-text parser that drops boilerplate and prefers <article>/<main>"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._lines: List[str] = []
+        self._main_lines: List[str] = []
+        self._current: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self._end_line()
+        if tag in _MAIN_TAGS:
+            self._main_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self._end_line()
+        if tag in _MAIN_TAGS:
+            self._main_depth = max(0, self._main_depth - 1)
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def _end_line(self):
+        words = "".join(self._current).split()
+        self._current = []
+        if len(words) < MIN_LINE_WORDS:
+            return
+        line = " ".join(words)
+        self._lines.append(line)
+        if self._main_depth:
+            self._main_lines.append(line)
+
+    def text(self) -> str:
+        self._end_line()
+        main_text = "\n".join(self._main_lines)
+        return main_text if len(main_text) >= 200 else "\n".join(self._lines)
+
+class PageFetcher:
+    """Fetches and extracts readable text from result pages with bounded concurrency.
+
+    Takes the aiohttp session per call so it can be pointed at any server.
+    """
+
+    def __init__(self, concurrency: int, max_bytes: int, cache_size: int, cache_ttl: float):
+        self.max_bytes = max_bytes
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.cache = TTLCache(cache_size, cache_ttl, name="pages")
+        self.fetched = 0
+        self.failed = 0
+        self.truncated = 0
+        self.dropped = 0
+
+    async def fetch_many(self, session: aiohttp.ClientSession, urls: List[str], budget: float) -> Dict[str, str]:
+        """Fetch pages concurrently; pages not finished within ``budget`` seconds are dropped"""
+        start = time.perf_counter()
+        tasks = {asyncio.create_task(self.fetch(session, url, budget)): url for url in urls}
+        if not tasks:
+            return {}
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.dropped += len(pending)
+
+        pages = {}
+        for task in done:
+            if task.exception() is None and task.result():
+                pages[tasks[task]] = task.result()
+        logger.info(
+            "Fetched %d/%d pages in %.2fs (%d over budget)",
+            len(pages), len(urls), time.perf_counter() - start, len(pending)
+        )
+        return pages
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, timeout: float) -> str:
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        async with self._semaphore:
+            try:
+                text = await self._fetch(session, url, timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError) as e:
+                self.failed += 1
+                logger.info("Failed to fetch %s: %s", url, e)
+                return ""
+        self.fetched += 1
+        if text:
+            self.cache.set(url, text)
+        return text
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, timeout: float) -> str:
+        async with session.get(
+            url,
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            if response.status != 200 or "html" not in response.headers.get("Content-Type", ""):
+                logger.info("Skipping %s (status %d, %s)", url, response.status, response.headers.get("Content-Type"))
+                return ""
+            decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+            parser = _TextExtractor()
+            received = 0
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                chunk = chunk[:self.max_bytes - received]
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if received >= self.max_bytes:
+                    self.truncated += 1
+                    break
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+            return parser.text()
+
+    def stats(self) -> dict:
+        return {
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "truncated": self.truncated,
+            "dropped": self.dropped,
+            "cache": self.cache.stats(),
+        }
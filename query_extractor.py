@@ -0,0 +1,111 @@
+import re
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompts longer than this (in words) go to the LLM extractor instead
+MAX_LOCAL_WORDS = 60
+MAX_QUERY_TERMS = 8
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are aren't as at be because been before being below
+between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down during each
+few for from further had hadn't has hasn't have haven't having he he'd he'll he's her here here's hers herself
+him himself his how how's i i'd i'll i'm i've if in into is isn't it it's its itself let's me more most mustn't
+my myself no nor not of off on once only or other ought our ours ourselves out over own same shan't she she'd
+she'll she's should shouldn't so some such than that that's the their theirs them themselves then there
+there's these they they'd they'll they're they've this those through to too under until up very was wasn't we
+we'd we'll we're we've were weren't what what's when when's where where's which while who who's whom why why's
+with won't would wouldn't you you'd you'll you're you've your yours yourself yourselves
+please tell explain know think want need give find show help could would like really just also get got
+anyone someone something anything thing things lot lots bit kind sort maybe pretty quite
+hey hi hello thanks thank ok okay yeah yes
+""".split())
+
+# Words that point back at earlier conversation; a query built without that context is unreliable
+_CONTEXT_REFERENCES = frozenset({"it", "this", "that", "these", "those", "he", "she", "they", "him", "her", "them", "above", "previous"})
+
+_USER_PREFIX_RE = re.compile(r"^[\w.]{2,32}:\s*")
+_MENTION_RE = re.compile(r"<[@#:a-zA-Z!&]*\d+>")
+_URL_RE = re.compile(r"https?://\S+")
+_QUOTED_RE = re.compile(r"\"([^\"]{2,80})\"|“([^”]{2,80})”")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9.+#'&-]*")
+
+def clean_prompt(text: str) -> str:
+    """Strip the "username:" prefix, mentions and URLs from a prompt"""
+    text = _USER_PREFIX_RE.sub("", text.strip(), count=1)
+    text = _MENTION_RE.sub(" ", text)
+    return _URL_RE.sub(" ", text)
+
+def _scored_terms(text: str) -> List[Tuple[float, int, str]]:
+    """Score candidate terms; returns (score, position, term) tuples"""
+    terms = []
+
+    # Quoted phrases are kept verbatim and rank highest
+    for match in _QUOTED_RE.finditer(text):
+        phrase = (match.group(1) or match.group(2)).strip()
+        terms.append((5.0, match.start(), f'"{phrase}"'))
+    # Blank the phrases out in place so token positions still line up with theirs
+    text = _QUOTED_RE.sub(lambda m: " " * len(m.group(0)), text)
+
+    tokens = [(m.group(0).strip(".'-"), m.start()) for m in _TOKEN_RE.finditer(text)]
+    seen = set()
+    i = 0
+    while i < len(tokens):
+        token, position = tokens[i]
+        lower = token.lower()
+        if not token or lower in STOPWORDS:
+            i += 1
+            continue
+
+        # Runs of capitalized words (not at sentence start alone) look like named entities
+        if token[0].isupper() and (i > 0 or (i + 1 < len(tokens) and tokens[i + 1][0][:1].isupper())):
+            run = [token]
+            j = i + 1
+            while j < len(tokens) and tokens[j][0][:1].isupper() and tokens[j][0].lower() not in STOPWORDS:
+                run.append(tokens[j][0])
+                j += 1
+            phrase = " ".join(run)
+            if phrase.lower() not in seen:
+                seen.add(phrase.lower())
+                terms.append((3.0 + 0.5 * (len(run) - 1), position, phrase))
+            i = j
+            continue
+
+        if lower not in seen:
+            seen.add(lower)
+            score = 1.0
+            if any(ch.isdigit() for ch in token):
+                score += 1.5  # years, versions, model numbers
+            if token.isupper() and len(token) > 1:
+                score += 1.5  # acronyms
+            if len(token) >= 7:
+                score += 0.5
+            terms.append((score, position, token))
+        i += 1
+    return terms
+
+def extract_search_query(text: str) -> str:
+    """Build a keyword search query from a chat prompt without calling a model"""
+    terms = _scored_terms(clean_prompt(text))
+    best = sorted(terms, key=lambda t: (-t[0], t[1]))[:MAX_QUERY_TERMS]
+    # Keep the original word order so the query still reads naturally
+    return " ".join(term for _, _, term in sorted(best, key=lambda t: t[1]))
+
+def needs_llm_extraction(text: str, query: str) -> bool:
+    """Whether the local query is likely to miss the point of the prompt"""
+    cleaned = clean_prompt(text)
+    words = cleaned.split()
+    if len(words) > MAX_LOCAL_WORDS:
+        return True
+    if not query.strip():
+        return True
+    query_terms = query.split()
+    # Short prompts that lean on earlier context ("what about that one?") lose too much
+    references = sum(1 for w in words if w.lower().strip("?!.,") in _CONTEXT_REFERENCES)
+    return len(query_terms) <= 1 and references > 0
+
+def scored_terms(text: str) -> List[Tuple[float, str]]:
+    """Candidate search terms in a prompt with their scores; 3.0 and up are names or quoted phrases"""
+    return [(score, term) for score, _, term in _scored_terms(clean_prompt(text))]
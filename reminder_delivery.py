@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from typing import Callable
+import discord
+from reminder_store import Reminder
+from resilience import retry_after_seconds
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REMINDER_DELIVERY_WORKERS = int(os.getenv("REMINDER_DELIVERY_WORKERS", "4"))
+# Stays under Discord's global limit of 50 requests per second
+REMINDER_DELIVERY_RATE = float(os.getenv("REMINDER_DELIVERY_RATE", "25"))
+REMINDER_DELIVERY_ATTEMPTS = 3
+DM_CHANNEL_CACHE_SIZE = int(os.getenv("DM_CHANNEL_CACHE_SIZE", "2048"))
+DM_CHANNEL_CACHE_TTL = 3600.0
+
+class _RateLimiter:
+    """Token bucket shared by all workers; pause() holds everyone back after a 429"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class ReminderDelivery:
+    """Delivers due reminders by DM from a bounded pool of workers.
+
+    Each worker has its own queue and every user is hashed to one of them, so a user's
+    reminders go out in order without racing on their DM channel, and a burst for one
+    person can only hold up their own shard. Users whose DMs are closed are remembered
+    and skipped. Catch-up deliveries of reminders missed while offline queue behind ones due now.
+    """
+
+    def __init__(self, bot, build_embed: Callable[[Reminder, bool], discord.Embed], workers: int = REMINDER_DELIVERY_WORKERS):
+        self.bot = bot
+        self.build_embed = build_embed
+        self.workers = workers
+        self._queues = [asyncio.PriorityQueue() for _ in range(workers)]
+        self._sequence = itertools.count()
+        self._tasks = []
+        self._limiter = _RateLimiter(REMINDER_DELIVERY_RATE)
+        self._dm_channels = TTLCache(DM_CHANNEL_CACHE_SIZE, DM_CHANNEL_CACHE_TTL, name="dm_channels")
+        self.dm_failed_users = set()
+        self.delivered = 0
+        self.caught_up = 0
+        self.failed = 0
+        self.skipped = 0
+        self.rate_limited = 0
+        self._total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Give queued reminders a chance to go out, then stop the workers"""
+        if self._tasks and self._queued():
+            try:
+                await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping reminder delivery with %d reminder(s) still queued", self._queued())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Reminder delivery stats: %s", self.stats())
+
+    def submit(self, reminder: Reminder, catch_up: bool = False) -> None:
+        queue = self._queues[hash(reminder.user_id) % len(self._queues)]
+        queue.put_nowait((int(catch_up), next(self._sequence), reminder))
+
+    def _queued(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def _worker(self, queue: asyncio.PriorityQueue):
+        while True:
+            catch_up, _, reminder = await queue.get()
+            try:
+                await self._deliver(reminder, bool(catch_up))
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to send reminder {reminder.id} to user {reminder.user_id}: {e}", exc_info=True)
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, reminder: Reminder, catch_up: bool):
+        user_id = reminder.user_id
+        # Skip sending DM if user previously had DM failures
+        if user_id in self.dm_failed_users:
+            self.skipped += 1
+            logger.warning(f"Skipping DM for user {user_id} (previous failures)")
+            return
+
+        embed = self.build_embed(reminder, catch_up)
+        for attempt in range(1, REMINDER_DELIVERY_ATTEMPTS + 1):
+            await self._limiter.acquire()
+            try:
+                channel = await self._dm_channel(user_id)
+                await channel.send(embed=embed)
+                break
+            except discord.Forbidden:
+                self.failed += 1
+                logger.warning(f"Cannot send DM to user {user_id} (forbidden - likely has DMs disabled)")
+                self.dm_failed_users.add(user_id)  # Track this user as having DM issues
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == REMINDER_DELIVERY_ATTEMPTS:
+                    raise
+                # discord.py already retried this route; back everyone off before trying again
+                self.rate_limited += 1
+                delay = retry_after_seconds(e) or 2.0 ** attempt
+                logger.warning(f"Rate limited delivering reminder {reminder.id}; pausing deliveries for {delay:.1f}s")
+                self._limiter.pause(delay)
+
+        latency = time.time() - reminder.due
+        if catch_up:
+            # Kept out of the latency figures, which measure the live scheduler
+            self.caught_up += 1
+            logger.info(f"Delivered overdue reminder {reminder.id} to user {user_id} ({latency:.0f}s late)")
+            return
+        self.delivered += 1
+        self._total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        logger.info(f"Successfully sent reminder {reminder.id} to user {user_id} ({latency:.2f}s after due)")
+
+    async def _dm_channel(self, user_id: int) -> discord.DMChannel:
+        channel = self._dm_channels.get(user_id)
+        if channel is not None:
+            return channel
+        # Members of shared guilds are already cached; only strangers cost a REST call
+        user = self.bot.get_user(user_id)
+        if user is None:
+            await self._limiter.acquire()
+            user = await self.bot.fetch_user(user_id)
+        channel = user.dm_channel
+        if channel is None:
+            await self._limiter.acquire()
+            channel = await user.create_dm()
+        self._dm_channels.set(user_id, channel)
+        return channel
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queued(),
+            "delivered": self.delivered,
+            "caught_up": self.caught_up,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "rate_limited": self.rate_limited,
+            "avg_latency": round(self._total_latency / self.delivered, 3) if self.delivered else 0.0,
+            "max_latency": round(self.max_latency, 3),
+            "dm_channel_cache": self._dm_channels.stats(),
+        }
@@ -0,0 +1,36 @@
+from bisect import bisect_left, insort
+from typing import Dict, Hashable, List, Optional, Tuple
+
+class UserReminderIndex:
+    """Each user's reminder keys kept sorted by due time, alongside the main store"""
+
+    def __init__(self):
+        self._by_user: Dict[int, List[Tuple[float, Hashable]]] = {}
+
+    def add(self, user_id: int, due: float, key: Hashable) -> None:
+        insort(self._by_user.setdefault(user_id, []), (due, key))
+
+    def remove(self, user_id: int, due: float, key: Hashable) -> None:
+        entries = self._by_user.get(user_id)
+        if not entries:
+            return
+        i = bisect_left(entries, (due, key))
+        if i < len(entries) and entries[i] == (due, key):
+            del entries[i]
+            if not entries:
+                del self._by_user[user_id]
+
+    def count(self, user_id: int) -> int:
+        return len(self._by_user.get(user_id, ()))
+
+    def first(self, user_id: int) -> Optional[Hashable]:
+        entries = self._by_user.get(user_id)
+        return entries[0][1] if entries else None
+
+    def page(self, user_id: int, start: int = 0, stop: Optional[int] = None) -> List[Hashable]:
+        return [key for _, key in self._by_user.get(user_id, [])[start:stop]]
+
+    def has_due(self, user_id: int, due: float) -> bool:
+        entries = self._by_user.get(user_id, [])
+        i = bisect_left(entries, (due,))
+        return i < len(entries) and entries[i][0] == due
@@ -0,0 +1,164 @@
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import List, Set
+import pytz
+from time_parser import get_timezone, localize
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# A cron expression that matches nothing (e.g. February 30th) gives up after this many days
+MAX_SEARCH_DAYS = 366 * 4 + 1
+
+_WEEKLY_RE = re.compile(r"^weekly(?:\s+(?:on\s+)?(?P<days>[a-z, ]+))?$")
+_DAY_NAMES = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+
+def parse_rule(text: str, first: datetime, min_interval: float = 0) -> str:
+    """Turn user input into a canonical rule string anchored at ``first`` (an aware local datetime).
+
+    Accepts ``daily``, ``weekdays``, ``weekly`` (on the first reminder's day), ``weekly mon,thu``,
+    ``monthly`` and five-field cron expressions like ``cron 30 8 * * 1-5``. Raises ValueError,
+    including for cron expressions that can fire less than ``min_interval`` seconds apart.
+    """
+    text = " ".join(text.lower().split())
+    at = first.strftime("%H:%M")
+    if text in ("daily", "every day"):
+        return f"daily {at}"
+    if text in ("weekdays", "every weekday"):
+        return f"weekdays {at}"
+    if text == "monthly":
+        return f"monthly {first.day} {at}"
+    if text.startswith("cron "):
+        expr = text[5:]
+        minutes, hours, _ = _parse_cron(expr)
+        if _min_cron_gap(minutes, hours) < min_interval:
+            raise ValueError(f"Repeats must be at least {min_interval / 60:g} minutes apart")
+        return f"cron {expr}"
+    match = _WEEKLY_RE.match(text)
+    if match:
+        days = {first.weekday()}
+        if match.group("days"):
+            try:
+                days = {_DAY_NAMES[d] for d in re.split(r"[\s,]+", match.group("days")) if d and d != "and"}
+            except KeyError as e:
+                raise ValueError(f"Unknown day {e}") from None
+        return f"weekly {','.join(WEEKDAYS[d] for d in sorted(days))} {at}"
+    raise ValueError(f"Unrecognised repeat rule '{text}'")
+
+def describe_rule(rule: str) -> str:
+    """Short human-readable form of a canonical rule"""
+    kind, _, rest = rule.partition(" ")
+    if kind == "cron":
+        return f"cron `{rest}`"
+    *args, at = rest.split(" ")
+    at = datetime.strptime(at, "%H:%M").strftime("%I:%M %p")
+    if kind == "daily":
+        return f"daily at {at}"
+    if kind == "weekdays":
+        return f"weekdays at {at}"
+    if kind == "weekly":
+        days = ", ".join(d.capitalize() for d in args[0].split(","))
+        return f"every {days} at {at}"
+    if kind == "monthly":
+        return f"monthly on day {args[0]} at {at}"
+    return rule
+
+def next_occurrence(rule: str, timezone: str, after: float) -> float:
+    """UTC timestamp of the first occurrence of ``rule`` strictly after ``after``.
+
+    Occurrences are computed on the local wall clock, so a 9am reminder stays at 9am
+    across DST changes.
+    """
+    tz = get_timezone(timezone)
+    start = datetime.fromtimestamp(after, tz=pytz.UTC).astimezone(tz)
+    kind, _, rest = rule.partition(" ")
+    if kind == "cron":
+        minutes, hours, matches_day = _parse_cron(rest)
+    else:
+        *args, at = rest.split(" ")
+        hour, minute = map(int, at.split(":"))
+        minutes, hours = [minute], [hour]
+        matches_day = _day_matcher(kind, args)
+
+    day = start.date()
+    for _ in range(MAX_SEARCH_DAYS):
+        if matches_day(day):
+            for hour in hours:
+                for minute in minutes:
+                    candidate = localize(tz, datetime(day.year, day.month, day.day, hour, minute))
+                    if candidate.timestamp() > after:
+                        return candidate.timestamp()
+        day += timedelta(days=1)
+    raise ValueError(f"Rule '{rule}' has no upcoming occurrence")
+
+def _day_matcher(kind: str, args: List[str]):
+    if kind == "daily":
+        return lambda day: True
+    if kind == "weekdays":
+        return lambda day: day.weekday() < 5
+    if kind == "weekly":
+        days = {WEEKDAYS.index(d) for d in args[0].split(",")}
+        return lambda day: day.weekday() in days
+    if kind == "monthly":
+        # Months without that day fire on their last day instead
+        wanted = int(args[0])
+        return lambda day: day.day == min(wanted, _days_in_month(day.year, day.month))
+    raise ValueError(f"Unknown rule kind '{kind}'")
+
+def _days_in_month(year: int, month: int) -> int:
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    return (next_month - timedelta(days=1)).day
+
+def _parse_cron(expr: str):
+    """Parse ``minute hour day-of-month month day-of-week`` into sorted minutes, hours and a day predicate"""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError("Cron expressions need five fields: minute hour day month weekday")
+    minutes = sorted(_cron_field(fields[0], 0, 59))
+    hours = sorted(_cron_field(fields[1], 0, 23))
+    month_days = _cron_field(fields[2], 1, 31)
+    months = _cron_field(fields[3], 1, 12)
+    # Cron counts weekdays from Sunday = 0 (7 is also Sunday); Python from Monday = 0
+    week_days = {(d - 1) % 7 for d in _cron_field(fields[4], 0, 7)}
+    any_month_day = fields[2] == "*"
+    any_week_day = fields[4] == "*"
+
+    def matches_day(day) -> bool:
+        if day.month not in months:
+            return False
+        # As in cron, a restricted day-of-month and day-of-week match if either does
+        if any_month_day or any_week_day:
+            return day.day in month_days and day.weekday() in week_days
+        return day.day in month_days or day.weekday() in week_days
+
+    return minutes, hours, matches_day
+
+def _min_cron_gap(minutes: List[int], hours: List[int]) -> int:
+    """Smallest gap in seconds between two times of day the cron fields allow, including
+    from the last one of a day to the first of the next"""
+    times = sorted(hour * 60 + minute for hour in hours for minute in minutes)
+    gaps = [b - a for a, b in zip(times, times[1:])] + [24 * 60 - times[-1] + times[0]]
+    return min(gaps) * 60
+
+def _cron_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        base, _, step = part.partition("/")
+        if base == "*":
+            start, stop = low, high
+        elif "-" in base:
+            start, stop = (int(v) for v in base.split("-", 1))
+        else:
+            start = stop = int(base)
+            if step:
+                stop = high
+        step = int(step) if step else 1
+        if not (low <= start <= stop <= high) or step < 1:
+            raise ValueError(f"Cron field '{field}' is out of range {low}-{high}")
+        values.update(range(start, stop + 1, step))
+    return values
@@ -0,0 +1,69 @@
+import time
+import heapq
+import asyncio
+import logging
+from typing import Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single sleep so wall-clock jumps (NTP, suspend) are noticed promptly
+MAX_SLEEP = 60.0
+
+class ReminderScheduler:
+    """Min-heap of due times that sleeps until the earliest one.
+
+    Cancelled or rescheduled entries are left in the heap and skipped when they
+    reach the top; the heap is rebuilt once stale entries outnumber live ones.
+    """
+
+    def __init__(self):
+        self._heap = []  # [(due, key)]
+        self._due = {}  # {key: due}
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, key: Hashable, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+        # Only an entry that became the new head changes how long the loop should sleep
+        if self._heap[0] == (due, key):
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        if self._due.pop(key, None) is None:
+            return
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, k) for k, due in self._due.items()]
+            heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def next_due(self) -> Optional[float]:
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Remove and return the keys of every entry due at or before ``now``, earliest first"""
+        due_keys = []
+        while True:
+            due = self.next_due()
+            if due is None or due > now:
+                return due_keys
+            _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            due_keys.append(key)
+
+    async def wait(self) -> None:
+        """Sleep until the earliest entry is due, or until the schedule changes"""
+        due = self.next_due()
+        timeout = MAX_SLEEP if due is None else min(MAX_SLEEP, due - time.time())
+        if timeout <= 0:
+            return
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
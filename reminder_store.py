@@ -0,0 +1,362 @@
+import os
+import abc
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "sqlite" writes each change incrementally; "json" rewrites two small files and suits tiny deployments
+REMINDER_STORE = os.getenv("REMINDER_STORE", "sqlite").lower()
+REMINDER_DB_FILE = os.getenv("REMINDER_DB_FILE", "reminders.db")
+REMINDERS_FILE = "reminders.json"
+TIMEZONES_FILE = "user_timezones.json"
+# The JSON backend coalesces changes made within this many seconds into one write
+REMINDER_FLUSH_DELAY = float(os.getenv("REMINDER_FLUSH_DELAY", "2"))
+
+class Reminder:
+    """One reminder. ``due`` and ``created_at`` are UTC timestamps; ``created_at`` is None
+    for reminders carried over from the old timestamp-keyed format. ``recurrence`` is a
+    rule from reminder_recurrence, or None for one-off reminders."""
+
+    __slots__ = ("id", "user_id", "message", "timezone", "due", "created_at", "recurrence")
+
+    def __init__(self, id: int, user_id: int, message: str, timezone: str, due: float, created_at: Optional[float],
+                 recurrence: Optional[str] = None):
+        self.id = id
+        self.user_id = user_id
+        self.message = message
+        self.timezone = timezone
+        self.due = due
+        self.created_at = created_at
+        self.recurrence = recurrence
+
+    def to_row(self) -> tuple:
+        return (self.id, self.user_id, self.message, self.timezone, self.due, self.created_at, self.recurrence)
+
+    @classmethod
+    def from_row(cls, row) -> "Reminder":
+        # Rows written before recurring reminders have no rule
+        id, user_id, message, timezone, due, created_at, *rest = row
+        return cls(int(id), int(user_id), message, timezone, float(due), created_at, rest[0] if rest else None)
+
+def _reminders_from_json(data: dict) -> Tuple[List[Reminder], int]:
+    """Parse reminders.json, including the old {timestamp: [user_id, message, tz]} layout"""
+    if isinstance(data.get("reminders"), list):
+        reminders = [Reminder.from_row(row) for row in data["reminders"]]
+        next_id = data.get("next_id", 1)
+    else:
+        reminders = [
+            Reminder(i, int(uid), msg, tz, float(ts), None)
+            for i, (ts, (uid, msg, tz)) in enumerate(sorted(data.items(), key=lambda item: float(item[0])), start=1)
+        ]
+        next_id = 1
+    return reminders, max([next_id] + [r.id + 1 for r in reminders])
+
+class ReminderStore(abc.ABC):
+    """Persistence for reminders and user timezones. All methods run off the event loop."""
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def load_reminders(self) -> Tuple[List[Reminder], int]:
+        """All stored reminders, plus the next unused reminder ID"""
+
+    @abc.abstractmethod
+    async def load_timezones(self) -> Dict[int, str]:
+        """Every user's timezone name"""
+
+    @abc.abstractmethod
+    async def save_reminder(self, reminder: Reminder) -> None:
+        """Insert or update a reminder"""
+
+    @abc.abstractmethod
+    async def delete_reminders(self, reminder_ids: Iterable[int]) -> None:
+        """Delete reminders by ID; unknown IDs are ignored"""
+
+    @abc.abstractmethod
+    async def set_timezone(self, user_id: int, timezone: str) -> None:
+        """Insert or update a user's timezone"""
+
+    def stats(self) -> dict:
+        return {}
+
+class WriteBehindFile:
+    """Coalesces changes to one JSON file and rewrites it atomically off the event loop"""
+
+    def __init__(self, path: str, snapshot: Callable[[], Any], delay: float = REMINDER_FLUSH_DELAY):
+        self.path = path
+        self.snapshot = snapshot
+        self.delay = delay
+        self.dirty = 0
+        self.flushes = 0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self) -> None:
+        self.dirty += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        # Shielded so close() can cancel the wait without interrupting a write in progress
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.dirty:
+                return
+            changes, self.dirty = self.dirty, 0
+            # Snapshot on the loop so the writer thread never sees the data mid-update
+            data = self.snapshot()
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(_write_json_atomic, self.path, data)
+            except BaseException:
+                self.dirty += changes
+                raise
+            latency = time.perf_counter() - start
+            self.flushes += 1
+            self._total_flush_latency += latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            logger.debug("Flushed %d change(s) to %s in %.1fms", changes, self.path, latency * 1000)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "dirty": self.dirty,
+            "flushes": self.flushes,
+            "avg_flush_latency": round(self._total_flush_latency / self.flushes, 4) if self.flushes else 0.0,
+            "max_flush_latency": round(self.max_flush_latency, 4),
+        }
+
+class JsonReminderStore(ReminderStore):
+    """Keeps a copy of everything and periodically rewrites the files behind the scenes"""
+
+    def __init__(self, reminders_file: str = REMINDERS_FILE, timezones_file: str = TIMEZONES_FILE):
+        self.reminders_file = reminders_file
+        self.timezones_file = timezones_file
+        self._reminders: Dict[int, tuple] = {}
+        self._timezones: Dict[int, str] = {}
+        self._next_id = 1
+        self._reminder_writer = WriteBehindFile(
+            reminders_file, lambda: {"next_id": self._next_id, "reminders": list(self._reminders.values())}
+        )
+        self._timezone_writer = WriteBehindFile(
+            timezones_file, lambda: {str(uid): tz for uid, tz in self._timezones.items()}
+        )
+
+    async def close(self):
+        await self._reminder_writer.close()
+        await self._timezone_writer.close()
+
+    async def load_reminders(self):
+        data = await asyncio.to_thread(_read_json, self.reminders_file)
+        reminders, self._next_id = _reminders_from_json(data)
+        self._reminders = {r.id: r.to_row() for r in reminders}
+        return reminders, self._next_id
+
+    async def load_timezones(self):
+        data = await asyncio.to_thread(_read_json, self.timezones_file)
+        self._timezones = {int(uid): tz for uid, tz in data.items()}
+        return dict(self._timezones)
+
+    async def save_reminder(self, reminder):
+        self._reminders[reminder.id] = reminder.to_row()
+        self._next_id = max(self._next_id, reminder.id + 1)
+        self._reminder_writer.mark_dirty()
+
+    async def delete_reminders(self, reminder_ids):
+        for reminder_id in reminder_ids:
+            self._reminders.pop(reminder_id, None)
+        self._reminder_writer.mark_dirty()
+
+    async def set_timezone(self, user_id, timezone):
+        self._timezones[user_id] = timezone
+        self._timezone_writer.mark_dirty()
+
+    def stats(self):
+        return {"reminders": self._reminder_writer.stats(), "timezones": self._timezone_writer.stats()}
+
+class SqliteReminderStore(ReminderStore):
+    """SQLite in WAL mode; every statement runs on one dedicated thread"""
+
+    def __init__(self, path: str = REMINDER_DB_FILE, reminders_file: str = REMINDERS_FILE, timezones_file: str = TIMEZONES_FILE):
+        self.path = path
+        self.reminders_file = reminders_file
+        self.timezones_file = timezones_file
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reminder-db")
+        self._db = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=True)
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._upgrade_timestamp_keyed_table()
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    message TEXT NOT NULL,
+                    timezone TEXT NOT NULL,
+                    due_at REAL NOT NULL,
+                    created_at REAL,
+                    recurrence TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_reminders_user_due ON reminders (user_id, due_at);
+                CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (due_at);
+                CREATE TABLE IF NOT EXISTS user_timezones (
+                    user_id INTEGER PRIMARY KEY,
+                    timezone TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            self._add_recurrence_column()
+        self._migrate_json()
+
+    def _upgrade_timestamp_keyed_table(self):
+        """Databases created before reminders had IDs keyed them by trigger time"""
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(reminders)")]
+        if "trigger_time" not in columns:
+            return
+        self._db.executescript("""
+            DROP INDEX IF EXISTS idx_reminders_user;
+            ALTER TABLE reminders RENAME TO reminders_by_time;
+            CREATE TABLE reminders (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                timezone TEXT NOT NULL,
+                due_at REAL NOT NULL,
+                created_at REAL
+            );
+            INSERT INTO reminders (user_id, message, timezone, due_at, created_at)
+                SELECT user_id, message, timezone, trigger_time, NULL FROM reminders_by_time ORDER BY trigger_time;
+            DROP TABLE reminders_by_time;
+        """)
+        logger.info("Upgraded %s reminders table to ID-keyed rows", self.path)
+
+    def _add_recurrence_column(self):
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(reminders)")]
+        if "recurrence" not in columns:
+            self._db.execute("ALTER TABLE reminders ADD COLUMN recurrence TEXT")
+
+    def _migrate_json(self):
+        """Import the JSON files once, the first time the database is opened"""
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        reminders, next_id = _reminders_from_json(_read_json(self.reminders_file))
+        timezones = _read_json(self.timezones_file)
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO reminders (id, user_id, message, timezone, due_at, created_at, recurrence) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [r.to_row() for r in reminders]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO user_timezones (user_id, timezone) VALUES (?, ?)",
+                [(int(uid), tz) for uid, tz in timezones.items()]
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(next_id),))
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')")
+        if reminders or timezones:
+            logger.info("Migrated %d reminders and %d timezones from JSON into %s", len(reminders), len(timezones), self.path)
+
+    async def load_reminders(self):
+        return await self._run(self._load_reminders)
+
+    def _load_reminders(self):
+        reminders = [
+            Reminder.from_row(row)
+            for row in self._db.execute("SELECT id, user_id, message, timezone, due_at, created_at, recurrence FROM reminders")
+        ]
+        stored = self._db.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        next_id = max([int(stored[0]) if stored else 1] + [r.id + 1 for r in reminders])
+        return reminders, next_id
+
+    async def load_timezones(self):
+        rows = await self._run(lambda: self._db.execute("SELECT user_id, timezone FROM user_timezones").fetchall())
+        return dict(rows)
+
+    async def save_reminder(self, reminder):
+        await self._run(self._save_reminder, reminder.to_row())
+
+    def _save_reminder(self, row: tuple):
+        # IDs are never reused, so the high-water mark is stored alongside
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reminders (id, user_id, message, timezone, due_at, created_at, recurrence) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+            self._db.execute(
+                "INSERT INTO meta (key, value) VALUES ('next_id', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))",
+                (str(row[0] + 1),)
+            )
+
+    async def delete_reminders(self, reminder_ids):
+        await self._run(self._execute, "DELETE FROM reminders WHERE id = ?", [(i,) for i in reminder_ids])
+
+    async def set_timezone(self, user_id, timezone):
+        await self._run(
+            self._execute,
+            "INSERT OR REPLACE INTO user_timezones (user_id, timezone) VALUES (?, ?)",
+            [(user_id, timezone)]
+        )
+
+    def _execute(self, sql: str, rows: list):
+        with self._db:
+            self._db.executemany(sql, rows)
+
+def _read_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    """Write to a temporary file and rename it over the target so a crash never leaves half a file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def create_store() -> ReminderStore:
+    if REMINDER_STORE == "json":
+        return JsonReminderStore()
+    return SqliteReminderStore()
@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests allowed per provider, and per model unless MODEL_CONFIG overrides it
+PROVIDER_CONCURRENCY = {
+    "openrouter": int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "16")),
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+}
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv("DEFAULT_MODEL_CONCURRENCY", "4"))
+# Each queue position update edits a Discord message, so a waiter gets at most one per interval
+QUEUE_UPDATE_INTERVAL = float(os.getenv("QUEUE_UPDATE_INTERVAL", "3"))
+
+def _parse_weights(raw: str) -> Dict[int, float]:
+    """Parse "guild_id:weight,guild_id:weight" into a dict"""
+    weights = {}
+    for item in raw.split(","):
+        if ":" not in item:
+            continue
+        guild_id, weight = item.split(":", 1)
+        try:
+            weights[int(guild_id)] = float(weight)
+        except ValueError:
+            logger.warning("Ignoring invalid guild weight: %s", item)
+    return weights
+
+GUILD_WEIGHTS = _parse_weights(os.getenv("SCHEDULER_GUILD_WEIGHTS", ""))
+
+class _Waiter:
+    __slots__ = (
+        "model", "provider", "model_limit", "guild_tag", "user_tag", "start_tag", "seq", "enqueued_at", "future",
+        "on_queue_update", "position", "shown_position", "notified_at", "update_handle", "notify_task",
+    )
+
+    def __init__(self, model, provider, model_limit, guild_tag, user_tag, start_tag, seq, future, on_queue_update):
+        self.model = model
+        self.provider = provider
+        self.model_limit = model_limit
+        self.guild_tag = guild_tag
+        self.user_tag = user_tag
+        self.start_tag = start_tag
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.on_queue_update = on_queue_update
+        self.position = None
+        self.shown_position = None
+        self.notified_at = float("-inf")
+        self.update_handle = None
+        self.notify_task = None
+
+    def sort_key(self):
+        return (self.guild_tag, self.user_tag, self.seq)
+
+class RequestScheduler:
+    """Admission control in front of the LLM providers.
+
+    Requests run immediately while their model and provider are under their
+    concurrency limits. Otherwise they queue and are admitted in start-time
+    fair queuing order, first across guilds (weighted by GUILD_WEIGHTS), then
+    across users within a guild, so one busy guild or user can't starve the rest.
+    """
+
+    def __init__(self, provider_limits: Dict[str, int] = None, default_model_limit: int = DEFAULT_MODEL_CONCURRENCY, guild_weights: Dict[int, float] = None,
+                 update_interval: float = QUEUE_UPDATE_INTERVAL):
+        self.provider_limits = provider_limits if provider_limits is not None else dict(PROVIDER_CONCURRENCY)
+        self.default_model_limit = default_model_limit
+        self.update_interval = update_interval
+        self.guild_weights = guild_weights if guild_weights is not None else dict(GUILD_WEIGHTS)
+        self._active_models = defaultdict(int)
+        self._active_providers = defaultdict(int)
+        self._waiting = []
+        self._virtual_time = 0.0
+        self._guild_finish = defaultdict(float)
+        self._user_finish = defaultdict(float)
+        self._seq = itertools.count()
+        self._notify_tasks = set()
+        self.queue_updates = 0
+        self.admitted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        model: str,
+        provider: str,
+        guild_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        model_limit: Optional[int] = None,
+        on_queue_update: Optional[Callable[[int], Awaitable[None]]] = None
+    ):
+        model_limit = model_limit or self.default_model_limit
+        waiter = self._make_waiter(model, provider, model_limit, guild_id, user_id, on_queue_update)
+        if not self._waiting and self._has_capacity(waiter):
+            self._admit(waiter, waited=0.0)
+        else:
+            await self._enqueue(waiter)
+        try:
+            yield
+        finally:
+            self._release(model, provider)
+
+    def _make_waiter(self, model, provider, model_limit, guild_id, user_id, on_queue_update) -> _Waiter:
+        # DMs count as their own "guild" per user
+        guild_key = guild_id if guild_id is not None else ("dm", user_id)
+        weight = self.guild_weights.get(guild_id, 1.0) if guild_id is not None else 1.0
+        start_tag = max(self._virtual_time, self._guild_finish[guild_key])
+        guild_tag = start_tag + 1.0 / weight
+        self._guild_finish[guild_key] = guild_tag
+        user_tag = max(self._virtual_time, self._user_finish[user_id]) + 1.0
+        self._user_finish[user_id] = user_tag
+        future = asyncio.get_running_loop().create_future()
+        return _Waiter(model, provider, model_limit, guild_tag, user_tag, start_tag, next(self._seq), future, on_queue_update)
+
+    def _has_capacity(self, waiter: _Waiter) -> bool:
+        provider_limit = self.provider_limits.get(waiter.provider, self.default_model_limit)
+        return (
+            self._active_models[waiter.model] < waiter.model_limit
+            and self._active_providers[waiter.provider] < provider_limit
+        )
+
+    def _admit(self, waiter: _Waiter, waited: float) -> None:
+        self._active_models[waiter.model] += 1
+        self._active_providers[waiter.provider] += 1
+        self._virtual_time = max(self._virtual_time, waiter.start_tag)
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waiter.update_handle is not None:
+            waiter.update_handle.cancel()
+            waiter.update_handle = None
+        # A position update still in flight would land on top of the reply
+        if waiter.notify_task is not None and not waiter.notify_task.done():
+            waiter.notify_task.cancel()
+        if not waiter.future.done():
+            waiter.future.set_result(None)
+
+    async def _enqueue(self, waiter: _Waiter) -> None:
+        self._waiting.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        logger.info("Request for %s queued (%s)", waiter.model, self.stats())
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we were cancelled; give the slot back
+                self._release(waiter.model, waiter.provider)
+            elif waiter in self._waiting:
+                self._waiting.remove(waiter)
+                self._dispatch()
+            raise
+        logger.info("Request for %s admitted after %.2fs in queue", waiter.model, time.monotonic() - waiter.enqueued_at)
+
+    def _release(self, model: str, provider: str) -> None:
+        self._active_models[model] -= 1
+        self._active_providers[provider] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit queued requests in fair order, skipping ones whose model is at its limit"""
+        self._waiting.sort(key=_Waiter.sort_key)
+        remaining = []
+        for waiter in self._waiting:
+            if waiter.future.done():
+                # Cancelled but not yet unwound; admitting it would leak the slot
+                continue
+            if self._has_capacity(waiter):
+                self._admit(waiter, waited=time.monotonic() - waiter.enqueued_at)
+            else:
+                remaining.append(waiter)
+        self._waiting = remaining
+        for position, waiter in enumerate(remaining, start=1):
+            waiter.position = position
+            if waiter.on_queue_update is not None:
+                self._update_position(waiter)
+        if not self._waiting:
+            self._prune()
+
+    def _update_position(self, waiter: _Waiter) -> None:
+        """Tell a waiter its position, at most once per update_interval.
+
+        Changes inside the interval are coalesced into one deferred update with the latest position.
+        """
+        if waiter.position == waiter.shown_position or waiter.update_handle is not None:
+            return
+        delay = waiter.notified_at + self.update_interval - time.monotonic()
+        if delay > 0:
+            waiter.update_handle = asyncio.get_running_loop().call_later(delay, self._deferred_update, waiter)
+            return
+        waiter.shown_position = waiter.position
+        waiter.notified_at = time.monotonic()
+        self._notify(waiter)
+
+    def _deferred_update(self, waiter: _Waiter) -> None:
+        waiter.update_handle = None
+        # Admitted or cancelled waiters no longer need updates
+        if not waiter.future.done():
+            self._update_position(waiter)
+
+    def _notify(self, waiter: _Waiter) -> None:
+        self.queue_updates += 1
+        task = asyncio.create_task(waiter.on_queue_update(waiter.position))
+        waiter.notify_task = task
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._on_notify_done)
+
+    def _on_notify_done(self, task: asyncio.Task) -> None:
+        self._notify_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Queue position update failed: %s", task.exception())
+
+    def _prune(self) -> None:
+        # Finish tags at or below the virtual time no longer affect ordering
+        for finish in (self._guild_finish, self._user_finish):
+            for key in [k for k, tag in finish.items() if tag <= self._virtual_time]:
+                del finish[key]
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._waiting),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_wait": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            "max_wait": round(self.max_wait, 3),
+            "queue_updates": self.queue_updates,
+            "active_providers": dict(self._active_providers),
+        }
@@ -0,0 +1,131 @@
+import time
+import asyncio
+import logging
+import email.utils
+from typing import Optional
+import openai
+from tenacity.stop import stop_base
+from tenacity.wait import wait_base
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: transport failures, timeouts, 429s and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+# Errors that suggest the provider itself is unhealthy and count towards the circuit breaker
+PROVIDER_FAILURES = (
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is temporarily unavailable (retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Fails fast after repeated provider failures, then lets a single probe through
+    once ``reset_timeout`` has passed to decide whether to close again."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def before_call(self) -> None:
+        if self.state == "closed":
+            return
+        elapsed = time.monotonic() - self.opened_at
+        if self.state == "open" and elapsed >= self.reset_timeout:
+            self.state = "half_open"
+            self._probing = False
+        # A probe that never reported back (e.g. was cancelled) is replaced after reset_timeout
+        probe_stale = self._probing and time.monotonic() - self._probe_started >= self.reset_timeout
+        if self.state == "half_open" and (not self._probing or probe_stale):
+            self._probing = True
+            self._probe_started = time.monotonic()
+            logger.info("Circuit for %s half-open, sending probe request", self.name)
+            return
+        raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit for %s closed", self.name)
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit for %s opened after %d failure(s)", self.name, self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Read the Retry-After (or retry-after-ms) header from an API error, if present"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class wait_retry_after(wait_base):
+    """Tenacity wait strategy that honors Retry-After, falling back to another strategy"""
+
+    def __init__(self, fallback: wait_base, max_wait: float):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        delay = retry_after_seconds(exc) if exc is not None else None
+        if delay is None:
+            delay = self.fallback(retry_state)
+        return min(delay, self.max_wait)
+
+class stop_at_deadline(stop_base):
+    """Tenacity stop strategy that gives up when, after the upcoming backoff, less than
+    ``min_attempt`` seconds would remain before ``deadline`` (a time.monotonic() value; None means no deadline)"""
+
+    def __init__(self, deadline: Optional[float], min_attempt: float):
+        self.deadline = deadline
+        self.min_attempt = min_attempt
+
+    def __call__(self, retry_state) -> bool:
+        if self.deadline is None:
+            return False
+        left = self.deadline - time.monotonic() - retry_state.upcoming_sleep
+        return left < self.min_attempt
@@ -0,0 +1,110 @@
+import math
+import re
+import logging
+from collections import Counter
+from typing import Dict, List
+from query_extractor import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Snippets whose word 3-grams overlap more than this are treated as the same result
+NEAR_DUPLICATE_THRESHOLD = 0.6
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _tokens(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+def _estimate_tokens(text: str) -> int:
+    # Rough heuristic (~4 characters per token); good enough for budgeting
+    return (len(text) + 3) // 4
+
+def _shingles(words: List[str]) -> set:
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def dedupe(results: List[Dict]) -> List[Dict]:
+    """Drop results with a repeated URL or a near-identical snippet, keeping the first"""
+    kept = []
+    kept_shingles = []
+    seen_urls = set()
+    for result in results:
+        url = result.get("href") or result.get("url")
+        if url and url in seen_urls:
+            continue
+        shingles = _shingles(_WORD_RE.findall(f"{result.get('title', '')} {result.get('body', '')}".lower()))
+        if any(len(shingles & other) / max(1, len(shingles | other)) >= NEAR_DUPLICATE_THRESHOLD for other in kept_shingles):
+            continue
+        if url:
+            seen_urls.add(url)
+        kept.append(result)
+        kept_shingles.append(shingles)
+    return kept
+
+def bm25_scores(query_tokens: List[str], documents: List[List[str]]) -> List[float]:
+    if not documents:
+        return []
+    avg_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter()
+    for doc in documents:
+        document_frequency.update(set(doc))
+    n = len(documents)
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        score = 0.0
+        for token in set(query_tokens):
+            tf = frequencies.get(token)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - document_frequency[token] + 0.5) / (document_frequency[token] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+def any_relevant(prompt: str, search_query: str, results: List[Dict]) -> bool:
+    """Whether any result shares a term with the prompt or query (i.e. has a BM25 score above zero)"""
+    query_tokens = set(_tokens(f"{prompt} {search_query}"))
+    return any(query_tokens.intersection(_tokens(f"{r.get('title', '')} {r.get('body', '')}")) for r in results)
+
+def rank_results(prompt: str, search_query: str, results: List[Dict]) -> List[Dict]:
+    """De-duplicate results and order them by BM25 relevance to the prompt and query.
+
+    Results sharing no terms with either are dropped once anything else matches.
+    """
+    unique = dedupe(results)
+    query_tokens = _tokens(f"{prompt} {search_query}")
+    documents = [_tokens(f"{r.get('title', '')} {r.get('body', '')}") for r in unique]
+    scores = bm25_scores(query_tokens, documents)
+    ranked = sorted(zip(scores, range(len(unique))), key=lambda x: (-x[0], x[1]))
+    if ranked and ranked[0][0] > 0:
+        ranked = [item for item in ranked if item[0] > 0]
+    return [unique[idx] for _, idx in ranked]
+
+def build_context(prompt: str, search_query: str, results: List[Dict], token_budget: int) -> str:
+    """Rank results against the prompt and pack the best into a token budget.
+
+    Results are emitted in rank order; a result that doesn't fit is skipped so a
+    shorter, lower-ranked one can still use the remaining budget.
+    """
+    ranked = rank_results(prompt, search_query, results)
+    header = f"Search query: {search_query}\n\n"
+    budget = token_budget - _estimate_tokens(header)
+    lines = []
+    for result in ranked:
+        line = f"{len(lines) + 1} -- {result.get('title', '')}: {result.get('body', '')}\n\n"
+        cost = _estimate_tokens(line)
+        if cost > budget:
+            continue
+        lines.append(line)
+        budget -= cost
+    logger.info(
+        "Built search context from %d/%d results (%d relevant after de-duplication), ~%d tokens",
+        len(lines), len(results), len(ranked), token_budget - budget
+    )
+    if not lines:
+        return ""
+    return header + "".join(lines)
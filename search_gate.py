@@ -0,0 +1,151 @@
+import re
+import time
+import logging
+from typing import Dict, Optional, Tuple
+import query_extractor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.5
+MIN_THRESHOLD = 0.2
+MAX_THRESHOLD = 0.9
+# How far a single piece of feedback moves a guild's threshold
+LEARNING_RATE = 0.1
+# Switching search on by hand can pull a guild's threshold down by at most this much,
+# and the pull halves every EXPLICIT_HALF_LIFE seconds once people stop doing it
+EXPLICIT_MAX_DROP = 0.15
+EXPLICIT_HALF_LIFE = 24 * 3600.0
+
+_RECENCY_RE = re.compile(
+    r"\b(latest|current(ly)?|today|tonight|yesterday|tomorrow|now|recent(ly)?|news|this (week|month|year)|"
+    r"new|upcoming|price|prices|cost|weather|forecast|score|scores|standings|released?|release date|update[sd]?|"
+    r"stock|election|schedule|live|still|anymore|20[2-9]\d)\b",
+    re.IGNORECASE,
+)
+_FACTUAL_QUESTION_RE = re.compile(
+    r"^(who|when|where|which|what (is|are|was|were|did|does|happened)|how (much|many|old|long|far)|"
+    r"is there|are there|did|does|has|have|can i buy)\b",
+    re.IGNORECASE,
+)
+_SELF_CONTAINED_RE = re.compile(
+    r"\b(write|poem|story|joke|haiku|lyrics|rewrite|rephrase|translate|code|function|script|regex|refactor|"
+    r"debug|fix|summari[sz]e|draft|compose|roleplay|pretend|imagine|brainstorm|proofread|essay)\b",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"\d")
+
+def score_prompt(prompt: str) -> float:
+    """Rough 0-1 estimate of how much a prompt depends on information a model may not have"""
+    text = query_extractor.clean_prompt(prompt)
+    score = 0.0
+    if _RECENCY_RE.search(text):
+        score += 0.45
+    entities = sum(1 for term_score, _ in query_extractor.scored_terms(text) if term_score >= 3.0)
+    score += min(entities, 2) * 0.15
+    if _FACTUAL_QUESTION_RE.search(text):
+        score += 0.2
+    if text.rstrip().endswith("?"):
+        score += 0.1
+    if _NUMBER_RE.search(text):
+        score += 0.1
+    if _SELF_CONTAINED_RE.search(text):
+        score -= 0.4
+    return max(0.0, min(1.0, score))
+
+class SearchGate:
+    """Decides whether "auto" web search should run, with a threshold learned per guild.
+
+    The learned threshold only moves on automatic searches: one whose results are all
+    irrelevant raises it, and a useful one eases it back toward the default. Explicitly turning search on for a prompt scoring below the threshold adds a
+    temporary, capped discount on top, so a guild that always forces search on can't drag
+    the threshold down to MIN_THRESHOLD for everyone else.
+    """
+
+    def __init__(self, default_threshold: float = DEFAULT_THRESHOLD):
+        self.default_threshold = default_threshold
+        self.thresholds: Dict[int, float] = {}
+        self._explicit: Dict[int, Tuple[float, float]] = {}  # {guild_id: (drop, monotonic time set)}
+        self.searched = 0
+        self.skipped = 0
+        self._search_seconds = 0.0
+        self._timed_searches = 0
+
+    def threshold(self, guild_id: Optional[int]) -> float:
+        learned = self.thresholds.get(guild_id, self.default_threshold)
+        return max(MIN_THRESHOLD, learned - self._explicit_drop(guild_id))
+
+    def _explicit_drop(self, guild_id: Optional[int]) -> float:
+        if guild_id not in self._explicit:
+            return 0.0
+        drop, updated = self._explicit[guild_id]
+        return drop * 0.5 ** ((time.monotonic() - updated) / EXPLICIT_HALF_LIFE)
+
+    def decide(self, prompt: str, guild_id: Optional[int]) -> bool:
+        start = time.perf_counter()
+        score = score_prompt(prompt)
+        threshold = self.threshold(guild_id)
+        search = score >= threshold
+        if search:
+            self.searched += 1
+        else:
+            self.skipped += 1
+        logger.info(
+            "Search gate: guild=%s score=%.2f threshold=%.2f -> %s (%.0fus; ~%.1fs saved so far over %d skips)",
+            guild_id, score, threshold, "search" if search else "skip",
+            (time.perf_counter() - start) * 1e6, self.estimated_seconds_saved(), self.skipped
+        )
+        return search
+
+    def record_explicit(self, prompt: str, guild_id: Optional[int]) -> None:
+        """Search was switched on by hand; treat the prompt as one that needed it, up to EXPLICIT_MAX_DROP"""
+        score = score_prompt(prompt)
+        threshold = self.threshold(guild_id)
+        if score < threshold:
+            drop = min(EXPLICIT_MAX_DROP, self._explicit_drop(guild_id) + LEARNING_RATE * (threshold - score))
+            self._explicit[guild_id] = (drop, time.monotonic())
+
+    def record_hit(self, prompt: str, guild_id: Optional[int]) -> None:
+        """An automatic search found relevant results; relax a raised threshold back toward the default"""
+        learned = self.thresholds.get(guild_id, self.default_threshold)
+        target = min(score_prompt(prompt), self.default_threshold)
+        if learned > target:
+            self._set_threshold(guild_id, learned - LEARNING_RATE * (learned - target))
+
+    def record_miss(self, prompt: str, guild_id: Optional[int]) -> None:
+        """An automatic search returned only irrelevant results; demand a slightly higher score next time"""
+        score = score_prompt(prompt)
+        threshold = self.threshold(guild_id)
+        learned = self.thresholds.get(guild_id, self.default_threshold)
+        self._set_threshold(guild_id, learned + LEARNING_RATE * (max(score, threshold) + 0.1 - threshold))
+
+    def record_search_latency(self, seconds: float) -> None:
+        self._search_seconds += seconds
+        self._timed_searches += 1
+
+    def estimated_seconds_saved(self) -> float:
+        if not self._timed_searches:
+            return 0.0
+        return self.skipped * self._search_seconds / self._timed_searches
+
+    def _set_threshold(self, guild_id: Optional[int], value: float) -> None:
+        value = max(MIN_THRESHOLD, min(MAX_THRESHOLD, value))
+        logger.info(
+            "Search gate threshold for guild %s: %.2f -> %.2f", guild_id, self.thresholds.get(guild_id, self.default_threshold), value
+        )
+        self.thresholds[guild_id] = value
+
+    def snapshot(self) -> Dict[str, float]:
+        return {str(guild_id): value for guild_id, value in self.thresholds.items() if guild_id is not None}
+
+    def restore(self, thresholds: Dict[str, float]) -> None:
+        for guild_id, value in thresholds.items():
+            self.thresholds[int(guild_id)] = max(MIN_THRESHOLD, min(MAX_THRESHOLD, float(value)))
+
+    def stats(self) -> dict:
+        return {
+            "searched": self.searched,
+            "skipped": self.skipped,
+            "avg_search_latency": round(self._search_seconds / self._timed_searches, 3) if self._timed_searches else 0.0,
+            "estimated_seconds_saved": round(self.estimated_seconds_saved(), 1),
+            "guild_thresholds": len(self.thresholds),
+        }
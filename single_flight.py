@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution.
+
+    Work started by ``do`` is shielded from any one caller being cancelled, but is
+    cancelled once every caller waiting on it has gone away.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._in_flight = {}  # {key: asyncio.Future}
+        self._waiters = {}  # {future: number of callers awaiting it}
+        self.executions = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def get(self, key: Hashable) -> Optional[asyncio.Future]:
+        return self._in_flight.get(key)
+
+    def begin(self, key: Hashable) -> asyncio.Future:
+        """Register the caller as leader for ``key``; the caller must resolve the returned future"""
+        future = asyncio.get_running_loop().create_future()
+        self._track(key, future)
+        return future
+
+    async def wait(self, future: asyncio.Future) -> Any:
+        """Wait for another caller's execution to finish and share its result"""
+        self.shared += 1
+        logger.info("Sharing in-flight result (%s)", self.stats())
+        return await self._await_shared(future)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._in_flight.get(key)
+        if future is not None:
+            return await self.wait(future)
+        task = asyncio.ensure_future(factory())
+        self._track(key, task)
+        return await self._await_shared(task)
+
+    async def _await_shared(self, future: asyncio.Future) -> Any:
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # Shield so that one cancelled caller doesn't cancel the work for everyone else
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                # Nobody wants the result any more; stop work we started instead of letting it run on.
+                # Futures from begin() belong to a leader that isn't counted as a waiter, so they're left alone.
+                if isinstance(future, asyncio.Task) and not future.done():
+                    self.abandoned += 1
+                    future.cancel()
+
+    def _track(self, key: Hashable, future: asyncio.Future) -> None:
+        self.executions += 1
+        self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Mark the exception as retrieved; waiters (if any) re-raise it themselves
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,64 @@
+import time
+import asyncio
+from types import SimpleNamespace
+import cogs.api_utils as api_utils
+from cogs.api_utils import APIUtils
+
+class _HungCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(3600)
+
+def _hung_client():
+    completions = _HungCompletions()
+    return completions, SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+def _patch_timeouts(monkeypatch):
+    monkeypatch.setattr(api_utils, "LLM_REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(api_utils, "LLM_FIRST_CHUNK_TIMEOUT", 0.2)
+    monkeypatch.setattr(api_utils, "LLM_MIN_ATTEMPT_TIME", 0.1)
+
+def test_hung_provider_times_out_within_budget_and_trips_breaker(monkeypatch):
+    _patch_timeouts(monkeypatch)
+    monkeypatch.setattr(api_utils, "LLM_MAX_ATTEMPTS", 10)
+
+    async def run():
+        cog = APIUtils(bot=None)
+        completions, cog.OAICLIENT = _hung_client()
+        started = time.monotonic()
+        try:
+            await cog.send_request("model", "hello", timeout=1.5)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("expected a timeout")
+        return time.monotonic() - started, completions.calls, cog
+
+    elapsed, calls, cog = asyncio.run(run())
+    # Retries stop at the budget rather than running all ten attempts
+    assert elapsed < 2.5
+    assert 1 <= calls < 10
+    assert cog.breakers["model"].failures >= 1
+
+def test_caller_cancellation_counts_as_provider_failure(monkeypatch):
+    _patch_timeouts(monkeypatch)
+    monkeypatch.setattr(api_utils, "LLM_REQUEST_TIMEOUT", 60)
+
+    async def run():
+        cog = APIUtils(bot=None)
+        completions, cog.OAICLIENT = _hung_client()
+        try:
+            await asyncio.wait_for(cog.send_request("model", "hello"), 0.2)
+        except asyncio.TimeoutError:
+            pass
+        # Let the abandoned request unwind
+        await asyncio.sleep(0.05)
+        return cog
+
+    cog = asyncio.run(run())
+    assert cog.in_flight.stats()["abandoned"] == 1
+    assert cog.in_flight.stats()["in_flight"] == 0
+    assert cog.breakers["model"].failures == 1
@@ -0,0 +1,100 @@
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import aiohttp
+import pytest
+from page_fetcher import PageFetcher
+
+SENTENCE = "This sentence is long enough to count as readable article text. "
+ARTICLE = (
+    "<html><head><script>var tracking = 'should never appear in the output at all';</script></head><body>"
+    "<nav>Home About Contact Subscribe to our newsletter today</nav>"
+    f"<article><h1>Title</h1><p>{SENTENCE * 5}</p><p>{SENTENCE * 3}</p></article>"
+    "<footer>Copyright notice and other links that are not content</footer></body></html>"
+).encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        try:
+            if self.path == "/article":
+                self._send(200, "text/html; charset=utf-8", ARTICLE)
+            elif self.path == "/huge":
+                # Far more than the cap, sent without a Content-Length so only the reader can stop it
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.end_headers()
+                for _ in range(2000):
+                    self.wfile.write(f"<p>{SENTENCE * 40}</p>".encode())
+            elif self.path == "/slow":
+                time.sleep(2)
+                self._send(200, "text/html", ARTICLE)
+            elif self.path == "/pdf":
+                self._send(200, "application/pdf", b"%PDF-1.4" + b"\0" * 1024)
+            else:
+                self._send(404, "text/html", b"<p>Not found</p>")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def _fetch(coro_factory, **kwargs):
+    async def run():
+        fetcher = PageFetcher(concurrency=4, cache_size=16, cache_ttl=60, **{"max_bytes": 1 << 20, **kwargs})
+        async with aiohttp.ClientSession() as session:
+            return await coro_factory(fetcher, session), fetcher
+    return asyncio.run(run())
+
+def test_extracts_article_text_without_boilerplate(base_url):
+    text, _ = _fetch(lambda f, s: f.fetch(s, base_url + "/article", 5))
+    assert text.startswith(SENTENCE.strip())
+    assert "tracking" not in text and "Copyright" not in text and "newsletter" not in text
+
+def test_oversize_page_is_truncated_at_max_bytes(base_url):
+    started = time.perf_counter()
+    text, fetcher = _fetch(lambda f, s: f.fetch(s, base_url + "/huge", 5), max_bytes=64 * 1024)
+    assert fetcher.truncated == 1
+    assert 0 < len(text) <= 64 * 1024
+    assert time.perf_counter() - started < 2
+
+def test_slow_page_is_dropped_when_budget_runs_out(base_url):
+    started = time.perf_counter()
+    pages, fetcher = _fetch(lambda f, s: f.fetch_many(s, [base_url + "/article", base_url + "/slow"], 0.5))
+    assert list(pages) == [base_url + "/article"]
+    assert fetcher.dropped == 1
+    assert time.perf_counter() - started < 1.5
+
+@pytest.mark.parametrize("path", ["/pdf", "/missing"])
+def test_non_html_and_error_pages_are_skipped(base_url, path):
+    text, fetcher = _fetch(lambda f, s: f.fetch(s, base_url + path, 5))
+    assert text == ""
+    assert fetcher.cache.get(base_url + path) is None
+
+def test_repeat_fetches_are_served_from_cache(base_url):
+    async def twice(fetcher, session):
+        first = await fetcher.fetch(session, base_url + "/article", 5)
+        return first, await fetcher.fetch(session, base_url + "/article", 5)
+
+    hits_before = _Handler.hits.get("/article", 0)
+    (first, second), _ = _fetch(twice)
+    assert first == second
+    assert _Handler.hits.get("/article", 0) - hits_before == 1
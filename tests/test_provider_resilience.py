@@ -0,0 +1,181 @@
+import json
+import time
+import asyncio
+import threading
+import email.utils
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openai
+import pytest
+import cogs.api_utils as api_utils
+import generic_chat
+from cogs.api_utils import APIUtils
+from resilience import CircuitOpenError
+
+def _completion(model):
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": f"pong from {model}"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+    }
+
+class _MockProvider(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions that plays back a scripted list of responses per model.
+
+    An action is ("ok",), ("hang",) or (status, headers); the last action repeats once the rest are used.
+    """
+    protocol_version = "HTTP/1.1"
+    script = {}
+    hits = []
+    release = threading.Event()
+
+    def do_POST(self):
+        model = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["model"]
+        _MockProvider.hits.append((model, time.monotonic()))
+        actions = _MockProvider.script.get(model, [("ok",)])
+        action = actions.pop(0) if len(actions) > 1 else actions[0]
+        try:
+            if action[0] == "hang":
+                _MockProvider.release.wait(30)
+                return
+            if action[0] == "ok":
+                self._send(200, {}, _completion(model))
+            else:
+                status, headers = action
+                self._send(status, headers, {"error": {"message": f"scripted {status}", "type": "test"}})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send(self, status, headers, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockProvider)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    _MockProvider.release.set()
+    server.shutdown()
+
+@pytest.fixture
+def provider(base_url, monkeypatch):
+    _MockProvider.script = {}
+    _MockProvider.hits = []
+    monkeypatch.setattr(api_utils, "LLM_MIN_ATTEMPT_TIME", 0.5)
+
+    def make_cog():
+        cog = APIUtils(bot=None)
+        cog.OAICLIENT = openai.AsyncOpenAI(
+            base_url=base_url, api_key="test", http_client=cog._build_http_client(), max_retries=0
+        )
+        return cog
+    return make_cog
+
+def _gaps(model):
+    times = [at for m, at in _MockProvider.hits if m == model]
+    return [b - a for a, b in zip(times, times[1:])]
+
+@pytest.mark.parametrize("kind, low, high", [
+    ("seconds", 0.25, 0.9),
+    ("ms", 0.25, 0.9),
+    # HTTP-dates have whole-second precision, so two seconds ahead means a wait of one to two seconds
+    ("date", 0.5, 2.5),
+])
+def test_429_waits_for_retry_after_then_succeeds(provider, kind, low, high):
+    headers = {
+        "seconds": {"Retry-After": "0.3"},
+        "ms": {"retry-after-ms": "300"},
+        "date": {"Retry-After": email.utils.formatdate(time.time() + 2, usegmt=True)},
+    }[kind]
+    _MockProvider.script = {"model": [(429, headers), ("ok",)]}
+
+    async def run():
+        cog = provider()
+        try:
+            return await cog.send_request("model", "hello"), cog
+        finally:
+            await cog.OAICLIENT.close()
+
+    (content, _), cog = asyncio.run(run())
+    assert content == "pong from model"
+    [gap] = _gaps("model")
+    assert low <= gap <= high
+    # Rate limiting isn't a sign the provider is down
+    assert cog.breakers["model"].failures == 0
+
+def test_5xx_is_retried_until_the_deadline_gives_up(provider, monkeypatch):
+    monkeypatch.setattr(api_utils, "LLM_MAX_ATTEMPTS", 10)
+    _MockProvider.script = {"model": [(503, {})]}
+
+    async def run():
+        cog = provider()
+        started = time.monotonic()
+        try:
+            with pytest.raises(openai.InternalServerError):
+                await cog.send_request("model", "hello", timeout=2.5)
+            return time.monotonic() - started, cog
+        finally:
+            await cog.OAICLIENT.close()
+
+    elapsed, cog = asyncio.run(run())
+    attempts = len(_gaps("model")) + 1
+    # Exponential backoff of 1s, 2s, ... leaves room for two attempts in 2.5s, not ten
+    assert 2 <= attempts < 10
+    assert elapsed < 2.5
+    assert cog.breakers["model"].failures == 1
+
+def test_breaker_opens_after_repeated_failures(provider, monkeypatch):
+    monkeypatch.setattr(api_utils, "LLM_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(api_utils, "LLM_BREAKER_THRESHOLD", 3)
+    _MockProvider.script = {"model": [(500, {})]}
+
+    async def run():
+        cog = provider()
+        try:
+            for _ in range(3):
+                with pytest.raises(openai.InternalServerError):
+                    await cog.send_request("model", "hello")
+            with pytest.raises(CircuitOpenError):
+                await cog.send_request("model", "hello")
+            return cog
+        finally:
+            await cog.OAICLIENT.close()
+
+    cog = asyncio.run(run())
+    assert cog.breakers["model"].state == "open"
+    # The fourth request failed fast without reaching the provider
+    assert len(_MockProvider.hits) == 3
+
+@pytest.mark.parametrize("primary", [[(500, {})], [("hang",)]])
+def test_chat_falls_back_when_the_primary_model_fails(provider, monkeypatch, primary):
+    monkeypatch.setattr(api_utils, "LLM_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(generic_chat, "CHAT_DEADLINE", 3.0)
+    monkeypatch.setattr(generic_chat, "CHAT_FALLBACK_RESERVE", 1.5)
+    _MockProvider.script = {"primary": primary}
+
+    async def run():
+        cog = provider()
+        try:
+            return await generic_chat.perform_chat_query(
+                "hello", cog, SimpleNamespace(guild=None), model="primary", reply_footer="primary",
+                fallback_model="backup"
+            )
+        finally:
+            await cog.OAICLIENT.close()
+
+    result, elapsed, footer = asyncio.run(run())
+    assert result == "pong from backup"
+    assert "Fallback: backup" in footer
+    # A hung primary is abandoned when its budget runs out, leaving the reserve for the fallback
+    assert elapsed < 3.0
@@ -0,0 +1,52 @@
+import pytest
+from query_extractor import MAX_QUERY_TERMS, clean_prompt, extract_search_query, needs_llm_extraction
+from cogs.ddg_search import _query_variants
+
+GOLDEN = [
+    ("alice: What is the latest version of Python 3.13 released?", "latest version Python 3.13 released"),
+    ("Who won the 2022 FIFA World Cup final?", "won 2022 FIFA World Cup final"),
+    ('can you explain how the "borrow checker" works in Rust', '"borrow checker" works Rust'),
+    ("<@123456> what's the weather in New York City today", "weather New York City today"),
+    ("check https://example.com/foo and tell me about GPU prices", "check GPU prices"),
+    ("bob: is it true that Elon Musk bought Twitter in 2022", "true Elon Musk bought Twitter 2022"),
+    ("how do I install numpy on ubuntu", "install numpy ubuntu"),
+    ("How tall is Mount Everest?", "tall Mount Everest"),
+    ("hello thanks", ""),
+]
+
+@pytest.mark.parametrize("prompt, expected", GOLDEN)
+def test_golden_queries(prompt, expected):
+    assert extract_search_query(prompt) == expected
+
+def test_query_keeps_highest_scoring_terms_in_prompt_order():
+    prompt = "tell me about apples bananas cherries dates figs grapes kiwis lemons mangoes and the 2024 harvest"
+    query = extract_search_query(prompt)
+    assert len(query.split()) == MAX_QUERY_TERMS
+    # The year outranks the short plain words, and the kept terms stay in prompt order
+    assert "2024" in query
+    words = prompt.split()
+    positions = [words.index(term) for term in query.split()]
+    assert positions == sorted(positions)
+
+def test_clean_prompt_strips_prefix_mentions_and_urls():
+    assert clean_prompt("carol: <@!42> see https://x.y/z now").split() == ["see", "now"]
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("what about that one?", True),
+    ("hello thanks", True),
+    (" ".join(["word"] * 61), True),
+    ("How tall is Mount Everest?", False),
+    ("Who won the 2022 FIFA World Cup final?", False),
+])
+def test_needs_llm_extraction(prompt, expected):
+    assert needs_llm_extraction(prompt, extract_search_query(prompt)) is expected
+
+@pytest.mark.parametrize("query, expected", [
+    ("weather New York City today", ["weather New York City today"]),
+    ('"latest Python release"', ["latest Python release"]),
+    ('  "latest Python release" ', ["latest Python release"]),
+    ('"borrow checker" works Rust', ['"borrow checker" works Rust', "borrow checker works Rust"]),
+    ('"rust" borrow "checker"', ['"rust" borrow "checker"', "rust borrow checker"]),
+])
+def test_query_variants(query, expected):
+    assert _query_variants(query) == expected
@@ -0,0 +1,58 @@
+import time
+import asyncio
+from types import SimpleNamespace
+from reminder_delivery import ReminderDelivery
+from reminder_store import Reminder
+
+class _FakeBot:
+    """Users whose DM channels record what was sent, optionally slowly"""
+
+    def __init__(self, slow_users=(), delay=0.0):
+        self.sent = []
+        self.slow_users = set(slow_users)
+        self.delay = delay
+
+    def get_user(self, user_id):
+        async def send(embed):
+            if user_id in self.slow_users:
+                await asyncio.sleep(self.delay)
+            self.sent.append((user_id, embed, time.monotonic()))
+        return SimpleNamespace(dm_channel=SimpleNamespace(send=send))
+
+def _reminder(id, user_id):
+    return Reminder(id, user_id, f"reminder {id}", "UTC", time.time(), time.time())
+
+def test_each_users_reminders_are_delivered_in_order():
+    async def run():
+        bot = _FakeBot()
+        delivery = ReminderDelivery(bot, lambda reminder, catch_up: reminder.id, workers=3)
+        delivery.start()
+        for i in range(30):
+            delivery.submit(_reminder(i, user_id=i % 5))
+        await delivery.stop()
+        return bot, delivery
+
+    bot, delivery = asyncio.run(run())
+    assert delivery.delivered == 30
+    for user_id in range(5):
+        ids = [embed for uid, embed, _ in bot.sent if uid == user_id]
+        assert ids == sorted(ids) and len(ids) == 6
+
+def test_slow_user_does_not_hold_up_users_on_other_workers():
+    async def run():
+        # Users 0 and 1 land on different shards of two workers
+        bot = _FakeBot(slow_users={0}, delay=0.3)
+        delivery = ReminderDelivery(bot, lambda reminder, catch_up: reminder.id, workers=2)
+        delivery.start()
+        started = time.monotonic()
+        for i in range(3):
+            delivery.submit(_reminder(i, user_id=0))
+        for i in range(3, 6):
+            delivery.submit(_reminder(i, user_id=1))
+        await delivery.stop()
+        return bot, started
+
+    bot, started = asyncio.run(run())
+    fast = [at for uid, _, at in bot.sent if uid == 1]
+    assert len(fast) == 3
+    assert max(fast) - started < 0.2
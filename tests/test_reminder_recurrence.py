@@ -0,0 +1,73 @@
+from datetime import datetime
+import pytest
+import pytz
+from reminder_recurrence import describe_rule, next_occurrence, parse_rule
+
+TIMEZONE = "America/New_York"
+_TZ = pytz.timezone(TIMEZONE)
+
+def occurrences(rule, start, count):
+    """The next ``count`` occurrences after a local wall-clock time, as local ISO strings"""
+    after = _TZ.localize(start).timestamp()
+    found = []
+    for _ in range(count):
+        after = next_occurrence(rule, TIMEZONE, after)
+        found.append(datetime.fromtimestamp(after, pytz.UTC).astimezone(_TZ).isoformat())
+    return found
+
+def test_daily_stays_at_9am_across_spring_forward():
+    rule = parse_rule("daily", _TZ.localize(datetime(2025, 3, 7, 9, 0)))
+    assert rule == "daily 09:00"
+    assert occurrences(rule, datetime(2025, 3, 7, 12, 0), 3) == [
+        "2025-03-08T09:00:00-05:00", "2025-03-09T09:00:00-04:00", "2025-03-10T09:00:00-04:00",
+    ]
+
+def test_daily_stays_at_9am_across_fall_back():
+    assert occurrences("daily 09:00", datetime(2025, 10, 31, 12, 0), 3) == [
+        "2025-11-01T09:00:00-04:00", "2025-11-02T09:00:00-05:00", "2025-11-03T09:00:00-05:00",
+    ]
+
+def test_skipped_and_repeated_wall_clock_times():
+    # 2:30am doesn't exist on the spring-forward day and 1:30am happens twice on the fall-back day
+    assert occurrences("daily 02:30", datetime(2025, 3, 8, 12, 0), 2) == ["2025-03-09T03:30:00-04:00", "2025-03-10T02:30:00-04:00"]
+    assert occurrences("daily 01:30", datetime(2025, 11, 1, 12, 0), 2) == ["2025-11-02T01:30:00-04:00", "2025-11-03T01:30:00-05:00"]
+
+def test_monthly_on_the_31st_uses_the_last_day_of_shorter_months():
+    rule = parse_rule("monthly", _TZ.localize(datetime(2025, 1, 31, 9, 0)))
+    assert rule == "monthly 31 09:00"
+    assert occurrences(rule, datetime(2025, 1, 31, 10, 0), 3) == [
+        "2025-02-28T09:00:00-05:00", "2025-03-31T09:00:00-04:00", "2025-04-30T09:00:00-04:00",
+    ]
+
+def test_weekly_with_a_list_of_days():
+    rule = parse_rule("weekly mon, thu", _TZ.localize(datetime(2025, 6, 10, 9, 0)))
+    assert rule == "weekly mon,thu 09:00"
+    assert describe_rule(rule) == "every Mon, Thu at 09:00 AM"
+    assert occurrences(rule, datetime(2025, 6, 10, 12, 0), 3) == [
+        "2025-06-12T09:00:00-04:00", "2025-06-16T09:00:00-04:00", "2025-06-19T09:00:00-04:00",
+    ]
+
+def test_cron_day_of_month_and_day_of_week_match_either():
+    # The 13th of July 2025 is a Sunday, so "the 13th or any Friday" adds it between the Fridays
+    assert occurrences("cron 0 9 13 * 5", datetime(2025, 7, 1, 0, 0), 4) == [
+        "2025-07-04T09:00:00-04:00", "2025-07-11T09:00:00-04:00", "2025-07-13T09:00:00-04:00", "2025-07-18T09:00:00-04:00",
+    ]
+
+def test_cron_that_never_matches_gives_up():
+    rule = parse_rule("cron 0 9 30 2 *", _TZ.localize(datetime(2025, 1, 1, 9, 0)))
+    with pytest.raises(ValueError, match="no upcoming occurrence"):
+        next_occurrence(rule, TIMEZONE, _TZ.localize(datetime(2025, 1, 1)).timestamp())
+
+@pytest.mark.parametrize("text", ["cron * * * * *", "cron */2 * * * *", "cron 0,1 9 * * *", "cron 58,2 23,0 * * *"])
+def test_rules_firing_too_often_are_rejected(text):
+    with pytest.raises(ValueError, match="at least 5 minutes apart"):
+        parse_rule(text, _TZ.localize(datetime(2025, 1, 1, 9, 0)), min_interval=300)
+
+@pytest.mark.parametrize("text", ["cron */5 * * * *", "cron 0 9 * * 1-5", "daily"])
+def test_rules_at_or_above_the_minimum_interval_are_accepted(text):
+    assert parse_rule(text, _TZ.localize(datetime(2025, 1, 1, 9, 0)), min_interval=300)
+
+@pytest.mark.parametrize("text", ["hourly", "weekly funday", "cron 0 9 * *", "cron 61 * * * *"])
+def test_invalid_rules_raise(text):
+    with pytest.raises(ValueError):
+        parse_rule(text, _TZ.localize(datetime(2025, 1, 1, 9, 0)))
@@ -0,0 +1,88 @@
+import os
+import json
+import asyncio
+import pytest
+import reminder_store
+from reminder_store import WriteBehindFile
+
+def test_changes_within_delay_are_coalesced_into_one_write(tmp_path):
+    path = str(tmp_path / "reminders.json")
+    data = {"count": 0}
+
+    async def run():
+        writer = WriteBehindFile(path, lambda: dict(data), delay=0.05)
+        for _ in range(50):
+            data["count"] += 1
+            writer.mark_dirty()
+        await asyncio.sleep(0.2)
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.flushes == 1
+    assert writer.dirty == 0
+    with open(path) as f:
+        assert json.load(f) == {"count": 50}
+
+def test_write_goes_through_a_temp_file_and_rename(tmp_path, monkeypatch):
+    path = str(tmp_path / "reminders.json")
+    renames = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        # The temp file is complete before it takes the target's place
+        with open(src) as f:
+            renames.append((src, dst, json.load(f)))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(reminder_store.os, "replace", replace)
+
+    async def run():
+        writer = WriteBehindFile(path, lambda: {"ok": True}, delay=60)
+        writer.mark_dirty()
+        await writer.flush()
+
+    asyncio.run(run())
+    assert renames == [(path + ".tmp", path, {"ok": True})]
+    assert os.listdir(tmp_path) == ["reminders.json"]
+
+def test_failed_write_keeps_old_file_and_stays_dirty(tmp_path):
+    path = str(tmp_path / "reminders.json")
+    with open(path, "w") as f:
+        json.dump({"version": 1}, f)
+
+    async def run():
+        # Not JSON serializable, so the dump fails part way through the temp file
+        writer = WriteBehindFile(path, lambda: {"version": 2, "bad": object()}, delay=60)
+        writer.mark_dirty()
+        with pytest.raises(TypeError):
+            await writer.flush()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.dirty == 1
+    with open(path) as f:
+        assert json.load(f) == {"version": 1}
+
+def test_close_flushes_pending_changes_without_waiting_for_the_delay(tmp_path):
+    path = str(tmp_path / "timezones.json")
+
+    async def run():
+        writer = WriteBehindFile(path, lambda: {"1": "UTC"}, delay=3600)
+        writer.mark_dirty()
+        await asyncio.wait_for(writer.close(), 1)
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.flushes == 1
+    with open(path) as f:
+        assert json.load(f) == {"1": "UTC"}
+
+def test_store_base_requires_the_persistence_methods(tmp_path):
+    class Partial(reminder_store.ReminderStore):
+        async def load_reminders(self):
+            return [], 1
+
+    with pytest.raises(TypeError):
+        Partial()
+    reminder_store.JsonReminderStore(str(tmp_path / "r.json"), str(tmp_path / "t.json"))
+    reminder_store.SqliteReminderStore(str(tmp_path / "r.db"))
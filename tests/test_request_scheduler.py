@@ -0,0 +1,128 @@
+import asyncio
+from request_scheduler import RequestScheduler
+
+def test_queue_position_updates_are_throttled_per_waiter():
+    async def run():
+        scheduler = RequestScheduler(provider_limits={"openai": 1}, default_model_limit=1, update_interval=0.2)
+        updates = {}
+
+        async def request(i):
+            async def on_update(position):
+                updates.setdefault(i, []).append(position)
+            async with scheduler.slot("model", "openai", guild_id=i, user_id=i, on_queue_update=on_update):
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request(i) for i in range(30)))
+        return scheduler, updates
+
+    scheduler, updates = asyncio.run(run())
+    # The queue drains in ~0.3s, so each waiter sees its first position and at most a couple of later ones
+    assert updates
+    assert all(len(positions) <= 3 for positions in updates.values())
+    assert scheduler.queue_updates == sum(len(p) for p in updates.values())
+    assert scheduler.queue_updates < 29 * 30 // 2
+
+def test_changes_within_interval_are_coalesced_into_latest_position():
+    async def run():
+        scheduler = RequestScheduler(provider_limits={"openai": 1}, default_model_limit=1, update_interval=0.1)
+        seen = []
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("model", "openai", guild_id=1, user_id=1):
+                await release.wait()
+
+        async def queued(guild_id, on_update=None):
+            async with scheduler.slot("model", "openai", guild_id=guild_id, user_id=guild_id, on_queue_update=on_update):
+                pass
+
+        async def record(position):
+            seen.append(position)
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        ahead = [asyncio.create_task(queued(2)), asyncio.create_task(queued(3))]
+        await asyncio.sleep(0)
+        watched = asyncio.create_task(queued(4, record))
+        await asyncio.sleep(0.01)
+        # Two requests ahead give up, moving the watched one from 3rd to 1st inside one interval
+        for task in ahead:
+            task.cancel()
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        before_interval = list(seen)
+        await asyncio.sleep(0.15)
+        release.set()
+        await asyncio.gather(first, watched, *ahead, return_exceptions=True)
+        return before_interval, seen, scheduler
+
+    before_interval, seen, scheduler = asyncio.run(run())
+    assert before_interval == [3]
+    assert seen == [3, 1]
+    assert scheduler.stats()["active_providers"] == {"openai": 0}
+
+def test_cancelled_waiter_is_not_admitted():
+    async def run():
+        scheduler = RequestScheduler(provider_limits={"openai": 1}, default_model_limit=1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("model", "openai", guild_id=1, user_id=1):
+                await release.wait()
+
+        async def queued(guild_id):
+            async with scheduler.slot("model", "openai", guild_id=guild_id, user_id=guild_id):
+                pass
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(queued(2))
+        await asyncio.sleep(0)
+        survivor = asyncio.create_task(queued(3))
+        await asyncio.sleep(0)
+        # The slot frees up before the cancelled request has unwound
+        release.set()
+        cancelled.cancel()
+        await asyncio.wait_for(asyncio.gather(first, survivor), 1)
+        await asyncio.gather(cancelled, return_exceptions=True)
+        return scheduler
+
+    assert asyncio.run(run()).stats()["active_providers"] == {"openai": 0}
+
+def test_pending_position_update_is_cancelled_on_admission():
+    async def run():
+        scheduler = RequestScheduler(provider_limits={"openai": 1}, default_model_limit=1)
+        release = asyncio.Event()
+        started = asyncio.Event()
+        outcome = []
+
+        async def holder():
+            async with scheduler.slot("model", "openai", guild_id=1, user_id=1):
+                await release.wait()
+
+        async def slow_update(position):
+            # Stands in for a Discord edit that is still in flight when the slot frees up
+            started.set()
+            try:
+                await asyncio.sleep(1)
+                outcome.append("edited")
+            except asyncio.CancelledError:
+                outcome.append("cancelled")
+                raise
+
+        async def queued():
+            async with scheduler.slot("model", "openai", guild_id=2, user_id=2, on_queue_update=slow_update):
+                outcome.append("admitted")
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(queued())
+        await started.wait()
+        release.set()
+        await asyncio.gather(first, waiting)
+        await asyncio.sleep(0)
+        return outcome, scheduler
+
+    outcome, scheduler = asyncio.run(run())
+    assert outcome == ["cancelled", "admitted"]
+    assert not scheduler._notify_tasks
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+import search_gate
+from cogs.ddg_search import DuckDuckGo
+from search_gate import DEFAULT_THRESHOLD, EXPLICIT_HALF_LIFE, EXPLICIT_MAX_DROP, SearchGate, score_prompt
+
+LOW_SCORE_PROMPT = "write me a poem about autumn leaves"
+EMPTY_SEARCH_PROMPT = "who is the current mayor of Springfield?"
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_gate.time, "monotonic", lambda: now[0])
+    return now
+
+def test_explicit_searches_cannot_drag_threshold_below_cap(clock):
+    gate = SearchGate()
+    assert score_prompt(LOW_SCORE_PROMPT) < DEFAULT_THRESHOLD - EXPLICIT_MAX_DROP
+    for _ in range(200):
+        gate.record_explicit(LOW_SCORE_PROMPT, 1)
+    assert gate.threshold(1) == pytest.approx(DEFAULT_THRESHOLD - EXPLICIT_MAX_DROP)
+    # Nothing is persisted from explicit use, and other guilds are unaffected
+    assert gate.snapshot() == {}
+    assert gate.threshold(2) == DEFAULT_THRESHOLD
+
+def test_explicit_discount_decays_over_time(clock):
+    gate = SearchGate()
+    for _ in range(200):
+        gate.record_explicit(LOW_SCORE_PROMPT, 1)
+    clock[0] += EXPLICIT_HALF_LIFE
+    assert gate.threshold(1) == pytest.approx(DEFAULT_THRESHOLD - EXPLICIT_MAX_DROP / 2)
+    clock[0] += 20 * EXPLICIT_HALF_LIFE
+    assert gate.threshold(1) == pytest.approx(DEFAULT_THRESHOLD)
+
+def test_auto_misses_raise_the_learned_threshold(clock):
+    gate = SearchGate()
+    gate.record_miss(EMPTY_SEARCH_PROMPT, 1)
+    assert gate.threshold(1) > DEFAULT_THRESHOLD
+    assert float(gate.snapshot()["1"]) == gate.threshold(1)
+
+def test_useful_auto_searches_ease_a_raised_threshold_back_to_default(clock):
+    gate = SearchGate()
+    for _ in range(5):
+        gate.record_miss(EMPTY_SEARCH_PROMPT, 1)
+    raised = gate.threshold(1)
+    for _ in range(50):
+        gate.record_hit(EMPTY_SEARCH_PROMPT, 1)
+    assert DEFAULT_THRESHOLD <= gate.threshold(1) < raised
+    assert gate.threshold(1) == pytest.approx(DEFAULT_THRESHOLD, abs=0.01)
+
+def _cog_with(results, query="springfield mayor"):
+    cog = DuckDuckGo(bot=None)
+
+    async def extract(_):
+        return query
+
+    async def search(_):
+        return results
+
+    cog.extract_search_query = extract
+    cog.search = search
+    return cog
+
+RELEVANT = [{"title": "Springfield mayor", "body": "The mayor of Springfield is Joe Quimby.", "href": "https://a"}]
+IRRELEVANT = [{"title": "Cooking pasta", "body": "Boil water and add salt before the noodles.", "href": "https://b"}]
+
+@pytest.mark.parametrize("results, query, learn, moved", [
+    ([], "springfield mayor", True, 0),            # rate limited or failed backends
+    (RELEVANT, "", True, 0),                       # query extraction failed
+    (IRRELEVANT, "springfield mayor", False, 0),   # explicit "on" never trains the learned threshold
+    (IRRELEVANT, "springfield mayor", True, 1),
+])
+def test_only_auto_searches_with_results_train_the_gate(clock, results, query, learn, moved):
+    cog = _cog_with(results, query)
+    asyncio.run(cog.build_web_context(EMPTY_SEARCH_PROMPT, 1, learn=learn))
+    assert len(cog.gate.snapshot()) == moved
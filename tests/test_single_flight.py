@@ -0,0 +1,61 @@
+import asyncio
+from single_flight import SingleFlight
+
+def test_cancelling_one_caller_keeps_work_running_for_the_others():
+    async def run():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        return calls, result, flights
+
+    calls, result, flights = asyncio.run(run())
+    assert (calls, result) == (1, "done")
+    assert flights.abandoned == 0
+
+def test_work_is_cancelled_once_every_caller_has_gone():
+    async def run():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(run())
+    assert flights.abandoned == 1
+    assert flights.get("key") is None
+
+def test_begin_futures_are_not_cancelled_by_waiters_leaving():
+    async def run():
+        flights = SingleFlight()
+        future = flights.begin("key")
+        waiter = asyncio.create_task(flights.wait(future))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        return future
+
+    future = asyncio.run(run())
+    assert not future.done()
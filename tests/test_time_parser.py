@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import pytest
+import pytz
+from time_parser import localize, parse_clock, parse_time
+
+TIMEZONE = "America/New_York"
+_TZ = pytz.timezone(TIMEZONE)
+# A Wednesday afternoon in summer time
+NOW = _TZ.localize(datetime(2025, 6, 11, 14, 0))
+
+GOLDEN = [
+    ("in 90 min", "2025-06-11T15:30:00-04:00"),
+    ("2h30m", "2025-06-11T16:30:00-04:00"),
+    ("1.5h", "2025-06-11T15:30:00-04:00"),
+    ("in 1 hour and 30 minutes", "2025-06-11T15:30:00-04:00"),
+    ("in 2 days", "2025-06-13T14:00:00-04:00"),
+    ("in a day", "2025-06-12T14:00:00-04:00"),
+    ("in 3 weeks", "2025-07-02T14:00:00-04:00"),
+    ("in 1 month", "2025-07-11T14:00:00-04:00"),
+    ("at 5pm", "2025-06-11T17:00:00-04:00"),
+    ("at 9am", "2025-06-12T09:00:00-04:00"),
+    ("noon", "2025-06-12T12:00:00-04:00"),
+    ("midnight", "2025-06-12T00:00:00-04:00"),
+    ("tomorrow", "2025-06-12T09:00:00-04:00"),
+    ("tomorrow 9am", "2025-06-12T09:00:00-04:00"),
+    ("  Tomorrow   9AM ", "2025-06-12T09:00:00-04:00"),
+    ("5pm tomorrow", "2025-06-12T17:00:00-04:00"),
+    ("tonight", "2025-06-11T20:00:00-04:00"),
+    ("next week", "2025-06-18T09:00:00-04:00"),
+    ("friday", "2025-06-13T09:00:00-04:00"),
+    ("wednesday 3pm", "2025-06-11T15:00:00-04:00"),
+    ("next wednesday", "2025-06-18T09:00:00-04:00"),
+    ("2025-12-31 14:30", "2025-12-31T14:30:00-05:00"),
+]
+
+@pytest.mark.parametrize("text, expected", GOLDEN)
+def test_golden_corpus(text, expected):
+    assert parse_time(text, TIMEZONE, NOW).isoformat() == expected
+
+@pytest.mark.parametrize("text", ["whenever", "today", "25:00", "13pm", "in 1.5 months", ""])
+def test_unparseable_input_returns_none(text):
+    assert parse_time(text, TIMEZONE, NOW) is None
+
+# Clocks go forward at 2am on 2025-03-09 and back at 2am on 2025-11-02
+DST_CASES = [
+    (datetime(2025, 3, 8, 10, 0), "tomorrow 10am", "2025-03-09T10:00:00-04:00"),
+    (datetime(2025, 3, 8, 10, 0), "in 1 day", "2025-03-09T10:00:00-04:00"),
+    (datetime(2025, 3, 8, 10, 0), "in 24 hours", "2025-03-09T11:00:00-04:00"),
+    (datetime(2025, 3, 8, 10, 0), "tomorrow 2:30am", "2025-03-09T03:30:00-04:00"),
+    (datetime(2025, 11, 1, 10, 0), "tomorrow 10am", "2025-11-02T10:00:00-05:00"),
+    (datetime(2025, 11, 1, 10, 0), "in 1 day", "2025-11-02T10:00:00-05:00"),
+    (datetime(2025, 11, 1, 10, 0), "in 24 hours", "2025-11-02T09:00:00-05:00"),
+    (datetime(2025, 11, 1, 10, 0), "tomorrow 1:30am", "2025-11-02T01:30:00-04:00"),
+]
+
+@pytest.mark.parametrize("now, text, expected", DST_CASES)
+def test_dst_transitions(now, text, expected):
+    assert parse_time(text, TIMEZONE, _TZ.localize(now)).isoformat() == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("17:30", (17, 30)), ("5pm", (17, 0)), ("5:30 p.m.", (17, 30)), ("12am", (0, 0)), ("noon", (12, 0)),
+])
+def test_parse_clock(text, expected):
+    assert parse_clock(text) == expected
+
+@pytest.mark.parametrize("zone", ["America/New_York", "Australia/Lord_Howe", "Pacific/Apia"])
+def test_localize_fast_path_matches_pytz(zone):
+    # Half-hour DST shifts, and Samoa skipping 30 December 2011
+    tz = pytz.timezone(zone)
+    start = datetime(2011, 1, 1)
+    for day in range(0, 3 * 365):
+        for hour in (0, 1, 2, 3, 12):
+            naive = start + timedelta(days=day, hours=hour, minutes=30)
+            try:
+                expected = tz.localize(naive, is_dst=None)
+            except pytz.AmbiguousTimeError:
+                expected = tz.localize(naive, is_dst=True)
+            except pytz.NonExistentTimeError:
+                expected = tz.normalize(tz.localize(naive, is_dst=False))
+            result = localize(tz, naive)
+            assert (result, result.tzinfo) == (expected, expected.tzinfo), naive
@@ -0,0 +1,169 @@
+import re
+import calendar
+import logging
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Callable, List, Optional, Pattern, Tuple
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# "tomorrow", "friday", "next week" and bare dates without a time mean 9am
+DEFAULT_HOUR = 9
+TONIGHT_HOUR = 20
+
+_WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "mon": 0, "tue": 1, "tues": 1, "wed": 2, "thu": 3, "thur": 3, "thurs": 3, "fri": 4, "sat": 5, "sun": 6,
+}
+
+_CLOCK = r"(?P<time>noon|midday|midnight|\d{1,2}(?::\d{2})?\s*[ap]\.?m\.?|\d{1,2}:\d{2})"
+_DAY = (
+    r"(?P<day>today|tonight|tomorrow|tmrw|next week|(?:(?P<next>next|this|on)\s+)?(?P<weekday>"
+    + "|".join(sorted(_WEEKDAYS, key=len, reverse=True)) + "))"
+)
+_UNIT = r"(?:mo(?:nths?)?|m(?:in(?:ute)?s?)?|h(?:(?:ou)?rs?)?|d(?:ays?)?|w(?:(?:ee)?ks?)?)"
+_DURATION_PART = rf"(?:\d+(?:\.\d+)?\s*|an?\s+){_UNIT}"
+
+_CLOCK_RE = re.compile(r"^(?:(?P<word>noon|midday|midnight)|(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?:(?P<ampm>[ap])\.?m\.?)?)$")
+_DURATION_RE = re.compile(rf"^(?:in\s+)?(?:{_DURATION_PART}(?:\s*,\s*|\s+and\s+|\s*))+$")
+_DURATION_PART_RE = re.compile(rf"(\d+(?:\.\d+)?|\ban?(?=\s))\s*({_UNIT})")
+_DATE_RE = re.compile(rf"^(?P<date>\d{{4}}-\d{{1,2}}-\d{{1,2}})(?:\s+(?:at\s+)?{_CLOCK})?$")
+_DAY_TIME_RE = re.compile(rf"^(?:{_DAY})?\s*(?:(?:at|@)\s*)?(?:{_CLOCK})?$")
+_TIME_DAY_RE = re.compile(rf"^(?:(?:at|@)\s*)?{_CLOCK}\s+(?:on\s+)?{_DAY}$")
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str):
+    """pytz.timezone() with the lookup memoized; raises pytz.UnknownTimeZoneError"""
+    return pytz.timezone(name)
+
+@lru_cache(maxsize=1024)
+def _steady_tzinfo(tz, day: date):
+    """The pytz tzinfo in force all through ``day`` when no UTC offset change falls near it, else None"""
+    start = datetime.combine(day, time()).replace(tzinfo=tz)
+    before = tz.fromutc(start - timedelta(days=1))
+    after = tz.fromutc(start + timedelta(days=2))
+    return before.tzinfo if before.tzinfo is after.tzinfo else None
+
+def localize(tz, naive: datetime) -> datetime:
+    """Attach ``tz`` to a wall-clock time: ambiguous times take the first occurrence,
+    times skipped by a DST jump move forward by the size of the jump"""
+    # pytz.localize() checks every offset the zone has ever used; most days only ever had one
+    steady = _steady_tzinfo(tz, naive.date())
+    if steady is not None:
+        return naive.replace(tzinfo=steady)
+    try:
+        return tz.localize(naive, is_dst=None)
+    except pytz.AmbiguousTimeError:
+        return tz.localize(naive, is_dst=True)
+    except pytz.NonExistentTimeError:
+        return tz.normalize(tz.localize(naive, is_dst=False))
+
+def parse_clock(text: str) -> Tuple[int, int]:
+    """Hour and minute from "17:30", "5pm", "5:30 pm", "noon" or "midnight"; raises ValueError"""
+    match = _CLOCK_RE.match(" ".join(text.lower().split()))
+    if not match:
+        raise ValueError(f"Unrecognised time '{text}'")
+    if match.group("word"):
+        return (0, 0) if match.group("word") == "midnight" else (12, 0)
+    hour, minute = int(match.group("hour")), int(match.group("minute") or 0)
+    if match.group("ampm"):
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Unrecognised time '{text}'")
+        hour = hour % 12 + (12 if match.group("ampm") == "p" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Unrecognised time '{text}'")
+    return hour, minute
+
+def parse_time(text: str, timezone: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Parse a reminder time like "in 90 min", "2h30m", "at 5pm", "tomorrow 9:30", "next friday",
+    "next week" or "2025-12-31 14:30" into an aware datetime in ``timezone``, or None.
+
+    The result can be in the past (e.g. "today at 8am" in the afternoon); callers decide what to do.
+    """
+    tz = get_timezone(timezone)
+    now = now.astimezone(tz) if now is not None else datetime.now(tz)
+    text = " ".join(text.lower().split())
+    for pattern, handler in _GRAMMAR:
+        match = pattern.match(text)
+        if match:
+            try:
+                return handler(match, now, tz)
+            except (ValueError, OverflowError) as e:
+                logger.debug("Could not resolve time '%s': %s", text, e)
+                return None
+    return None
+
+def _relative(match, now: datetime, tz) -> datetime:
+    minutes = days = 0.0
+    months = 0
+    for amount, unit in _DURATION_PART_RE.findall(match.group(0)):
+        amount = float(amount) if amount[0].isdigit() else 1.0
+        if unit.startswith("mo"):
+            if not amount.is_integer():
+                raise ValueError("Months must be a whole number")
+            months += int(amount)
+        elif unit[0] == "m":
+            minutes += amount
+        elif unit[0] == "h":
+            minutes += amount * 60
+        elif unit[0] == "d":
+            days += amount
+        else:
+            days += amount * 7
+    # Days, weeks and months keep the wall-clock time across DST; hours and minutes are exact
+    target = now
+    if months or days:
+        target = localize(tz, _add_months(now.replace(tzinfo=None), months) + timedelta(days=days))
+    if not minutes:
+        return target
+    return tz.normalize(target + timedelta(minutes=minutes))
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    month = dt.month - 1 + months
+    year, month = dt.year + month // 12, month % 12 + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+def _on_date(match, now: datetime, tz) -> datetime:
+    date = datetime.strptime(match.group("date"), "%Y-%m-%d").date()
+    hour, minute = parse_clock(match.group("time")) if match.group("time") else (DEFAULT_HOUR, 0)
+    return localize(tz, datetime.combine(date, time(hour, minute)))
+
+def _on_day(match, now: datetime, tz) -> Optional[datetime]:
+    day, clock = match.group("day"), match.group("time")
+    if not day and not clock:
+        return None
+    hour, minute = parse_clock(clock) if clock else (DEFAULT_HOUR, 0)
+    passed = (hour, minute) <= (now.hour, now.minute)
+    date = now.date()
+    if day is None:
+        # A bare time means its next occurrence
+        if passed:
+            date += timedelta(days=1)
+    elif day == "today":
+        if not clock:
+            return None
+    elif day == "tonight":
+        if not clock:
+            hour, minute = TONIGHT_HOUR, 0
+        elif hour < 12:
+            hour += 12
+    elif day in ("tomorrow", "tmrw"):
+        date += timedelta(days=1)
+    elif day == "next week":
+        date += timedelta(days=7)
+    else:
+        days_ahead = (_WEEKDAYS[match.group("weekday")] - date.weekday()) % 7
+        # "Friday" on a Friday means today unless that time has gone; "next Friday" always means next week
+        if days_ahead == 0 and (match.group("next") == "next" or passed):
+            days_ahead = 7
+        date += timedelta(days=days_ahead)
+    return localize(tz, datetime.combine(date, time(hour, minute)))
+
+# Tried in order; the first pattern that matches decides the result
+_GRAMMAR: List[Tuple[Pattern, Callable]] = [
+    (_DURATION_RE, _relative),
+    (_DATE_RE, _on_date),
+    (_DAY_TIME_RE, _on_day),
+    (_TIME_DAY_RE, _on_day),
+]
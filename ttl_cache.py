@@ -0,0 +1,84 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float, name: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self._entries = OrderedDict()  # {key: (expires_at, value)}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> List[list]:
+        """Live entries as [key, wall-clock expiry, value], oldest first, for persisting"""
+        now_mono = time.monotonic()
+        now_wall = time.time()
+        return [
+            [key, now_wall + (expires_at - now_mono), value]
+            for key, (expires_at, value) in self._entries.items()
+            if expires_at > now_mono
+        ]
+
+    def restore(self, entries: List[list]) -> int:
+        """Load entries produced by snapshot(), skipping ones that expired meanwhile"""
+        now_mono = time.monotonic()
+        now_wall = time.time()
+        restored = 0
+        for key, expires_wall, value in entries:
+            remaining = expires_wall - now_wall
+            if remaining <= 0:
+                continue
+            self._entries[key] = (now_mono + min(remaining, self.ttl), value)
+            self._entries.move_to_end(key)
+            restored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return restored
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }